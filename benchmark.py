@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+⏱️ YTWAV - Benchmark przepustowości (offline)
+Mierzy pliki/min, MB/s i czasy etapów bez dostępu do sieci.
+
+Syntetyczne audio generuje FFmpeg (źródło lavfi), pliki serwuje lokalny
+serwer HTTP, a zastępczy extractor yt-dlp (plugin) mapuje linki
+https://www.youtube.com/watch?v=<ID> na te pliki. Dzięki temu mierzony jest
+prawdziwy kod: `YTWavDownloader.download_audio` w procesie oraz wsadowe
+`main()` uruchamiane jako osobny proces CLI. Serwer obsługuje zapytania
+Range i opcjonalnie dławi każde połączenie (--conn-rate), co pokazuje zysk
+z pobierania długich plików kilkoma połączeniami (--connections). Scenariusz `startup` mierzy
+czas uruchomienia: `ytdl_wav.py --help`, `maintenance.py --stats` oraz
+czas do pojawienia się okna GUI.
+
+Wynik (JSON) można zapisać i porównać z poprzednim przebiegiem:
+  python3 benchmark.py --files 8 --jobs 1,2,4 --output bench.json
+  python3 benchmark.py --compare bench.json --tolerance 0.2
+
+Autor: Senior Python Developer
+Licencja: MIT
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import List
+
+from ytwav_segments import DEFAULT_CONNECTIONS
+from ytwav_testserver import RangeHandler
+
+
+PROJECT_DIR = Path(__file__).resolve().parent
+
+# Zastępczy extractor - yt-dlp ładuje pluginy przed wbudowanymi extractorami
+STAND_IN_EXTRACTOR = '''
+import os
+
+from yt_dlp.extractor.common import InfoExtractor
+
+
+class YTWavBenchIE(InfoExtractor):
+    """Zastępczy extractor benchmarku: ID filmu -> plik z lokalnego serwera."""
+    _VALID_URL = r'https?://(?:www\\.)?youtube\\.com/watch\\?v=(?P<id>ytwavb[0-9]{5})'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        return {
+            'id': video_id,
+            'title': f'bench {video_id}',
+            'url': f"{os.environ['YTWAV_BENCH_BASE_URL']}/{video_id}.m4a",
+            'ext': 'm4a',
+            'vcodec': 'none',
+            'acodec': 'aac',
+            'duration': int(os.environ.get('YTWAV_BENCH_DURATION', '0')) or None,
+        }
+'''
+
+
+class MediaServer:
+    """Lokalny serwer HTTP z katalogiem syntetycznych plików audio."""
+
+    def __init__(self, directory: Path, rate: int = 0):
+        handler = partial(type('BenchHandler', (RangeHandler,), {'rate': rate}), directory=str(directory))
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="ytwav-bench-http", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def video_id(index: int) -> str:
+    """11-znakowe ID rozpoznawane przez zastępczy extractor."""
+    return f"ytwavb{index:05d}"
+
+
+def generate_media(directory: Path, count: int, duration: int) -> int:
+    """Generuje `count` plików m4a (sinus lavfi). Zwraca łączny rozmiar w bajtach."""
+    directory.mkdir(parents=True, exist_ok=True)
+    total = 0
+    for index in range(count):
+        target = directory / f"{video_id(index)}.m4a"
+        if not target.exists():
+            subprocess.run([
+                'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+                '-f', 'lavfi', '-i', f"sine=frequency={220 + 20 * index}:duration={duration}:sample_rate=44100",
+                '-ac', '2', '-c:a', 'aac', '-b:a', '192k', '-movflags', '+faststart',
+                str(target)
+            ], check=True)
+        total += target.stat().st_size
+    return total
+
+
+def install_extractor(plugin_root: Path):
+    """Zapisuje plugin yt-dlp z zastępczym extractorem."""
+    package = plugin_root / 'yt_dlp_plugins' / 'extractor'
+    package.mkdir(parents=True, exist_ok=True)
+    (package / 'ytwav_bench.py').write_text(STAND_IN_EXTRACTOR, encoding='utf-8')
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def stage_latency(jsonl_path: Path) -> dict:
+    """Statystyki czasów etapów z pliku metryk JSON Lines (--metrics-jsonl)."""
+    per_stage = {}
+    if not jsonl_path.exists():
+        return {}
+    for line in jsonl_path.read_text(encoding='utf-8').splitlines():
+        record = json.loads(line)
+        for stage, seconds in record['stages_s'].items():
+            per_stage.setdefault(stage, []).append(seconds)
+        per_stage.setdefault('total', []).append(record['duration_s'])
+    return {
+        stage: {
+            'mean': round(statistics.mean(values), 4),
+            'p50': round(percentile(values, 0.5), 4),
+            'p95': round(percentile(values, 0.95), 4),
+            'max': round(max(values), 4),
+        }
+        for stage, values in sorted(per_stage.items())
+    }
+
+
+def summarize(scenario: str, profile: str, mode: str, jobs: int, connections: int, files: int,
+              ok: int, wall: float, source_bytes: int, output_bytes: int, jsonl_path: Path) -> dict:
+    return {
+        'scenario': scenario,
+        'profile': profile,
+        'mode': mode,
+        'jobs': jobs,
+        'connections': connections,
+        'files': files,
+        'ok': ok,
+        'wall_s': round(wall, 3),
+        'files_per_min': round(ok / wall * 60, 2) if wall else None,
+        'source_mb_per_s': round(source_bytes / wall / 1e6, 3) if wall else None,
+        'output_mb_per_s': round(output_bytes / wall / 1e6, 3) if wall else None,
+        'stages': stage_latency(jsonl_path),
+    }
+
+
+def output_size(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.glob('*.wav'))
+
+
+def bench_download_audio(urls: List[str], profile: str, mode: str, connections: int, work: Path,
+                         source_bytes: int) -> dict:
+    """Sekwencyjne `download_audio` na jednym (ciepłym) downloaderze w tym procesie."""
+    from ytdl_wav import YTWavDownloader
+    from ytwav_metrics import MetricsRecorder
+    from ytwav_net import RateLimiter
+
+    sample_rate, channels, bit_depth = (int(part) for part in profile.split(':'))
+    out_dir = work / f"api-{profile.replace(':', '-')}-{mode}-c{connections}"
+    jsonl_path = out_dir.with_suffix('.jsonl')
+    # Zimny cache metadanych dla każdego scenariusza
+    os.environ['YTWAV_CACHE_DIR'] = str(out_dir.with_suffix('.cache'))
+    downloader = YTWavDownloader(
+        output_dir=str(out_dir),
+        sample_rate=sample_rate,
+        channels=channels,
+        bit_depth=bit_depth,
+        stream=(mode == 'stream'),
+        use_archive=False,
+        rate_limiter=RateLimiter(rate=1000.0, burst=1000),
+        metrics=MetricsRecorder(jsonl_path=str(jsonl_path)),
+        connections=connections
+    )
+    started = time.perf_counter()
+    ok = sum(1 for url in urls if downloader.download_audio(url))
+    wall = time.perf_counter() - started
+    downloader.close_sessions()
+    return summarize('download_audio', profile, mode, 1, connections, len(urls), ok, wall,
+                     source_bytes, output_size(out_dir), jsonl_path)
+
+
+def bench_batch_main(urls: List[str], profile: str, mode: str, jobs: int, connections: int,
+                     work: Path, env: dict, source_bytes: int) -> dict:
+    """Wsadowe `main()` jako osobny proces CLI (--list) z `jobs` wątkami."""
+    sample_rate, channels, bit_depth = profile.split(':')
+    out_dir = work / f"cli-{profile.replace(':', '-')}-{mode}-j{jobs}-c{connections}"
+    jsonl_path = out_dir.with_suffix('.jsonl')
+    list_file = out_dir.with_suffix('.txt')
+    list_file.write_text('\n'.join(urls) + '\n', encoding='utf-8')
+    cmd = [
+        sys.executable, str(PROJECT_DIR / 'ytdl_wav.py'),
+        '--list', str(list_file), '-o', str(out_dir),
+        '--sr', sample_rate, '--ch', channels, '--bit', bit_depth,
+        '--jobs', str(jobs), '--per-host', str(jobs), '--convert-jobs', str(jobs),
+        '--no-archive', '--rate', '1000', '--metrics-jsonl', str(jsonl_path),
+        '--connections', str(connections),
+    ]
+    if mode == 'stream':
+        cmd.append('--stream')
+    env = dict(env, YTWAV_CACHE_DIR=str(out_dir.with_suffix('.cache')))
+    started = time.perf_counter()
+    result = subprocess.run(cmd, env=env, cwd=str(work), capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    ok = len(list(out_dir.glob('*.wav'))) if result.returncode == 0 else 0
+    return summarize('batch_main', profile, mode, jobs, connections, len(urls), ok, wall,
+                     source_bytes, output_size(out_dir), jsonl_path)
+
+
+# Czas do narysowania pierwszego okna GUI (wypisuje znacznik czasu)
+GUI_FIRST_WINDOW = """
+import sys, time
+sys.path.insert(0, {project!r})
+import ytwav_gui
+app = ytwav_gui.YTWavGUI()
+app.root.update()
+print(time.time())
+app.on_close()
+"""
+
+
+def bench_startup(work: Path, runs: int) -> dict:
+    """Czasy uruchomienia procesów (mediana i minimum z `runs` prób)."""
+    commands = {
+        'cli_help': [sys.executable, str(PROJECT_DIR / 'ytdl_wav.py'), '--help'],
+        'cli_bad_args': [sys.executable, str(PROJECT_DIR / 'ytdl_wav.py'), '--bit', '8'],
+        'maintenance_stats': [sys.executable, str(PROJECT_DIR / 'maintenance.py'), '--stats'],
+        'gui_first_window': [sys.executable, '-c', GUI_FIRST_WINDOW.format(project=str(PROJECT_DIR))],
+    }
+    startup_dir = work / 'startup'
+    startup_dir.mkdir(exist_ok=True)
+    timings = {}
+    for name, cmd in commands.items():
+        samples = []
+        for _ in range(runs):
+            started = time.time()
+            result = subprocess.run(cmd, cwd=str(startup_dir), capture_output=True, text=True)
+            if name == 'gui_first_window':
+                # Bez ekranu (np. serwer CI) okna nie da się utworzyć
+                if result.returncode != 0 or not result.stdout.strip():
+                    samples = []
+                    break
+                samples.append(float(result.stdout.split()[-1]) - started)
+            else:
+                samples.append(time.time() - started)
+        timings[name] = {
+            'median_s': round(statistics.median(samples), 4),
+            'min_s': round(min(samples), 4),
+        } if samples else None
+    return {'scenario': 'startup', 'runs': runs, 'timings': timings}
+
+
+def tool_versions() -> dict:
+    versions = {'python': platform.python_version(), 'platform': platform.platform()}
+    try:
+        import yt_dlp
+        versions['yt_dlp'] = yt_dlp.version.__version__
+    except ImportError:
+        versions['yt_dlp'] = None
+    try:
+        first_line = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout.splitlines()[0]
+        versions['ffmpeg'] = first_line.split(' ')[2]
+    except (OSError, IndexError):
+        versions['ffmpeg'] = None
+    return versions
+
+
+def compare(results: List[dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Porównuje pliki/min z poprzednim wynikiem. Zwraca listę regresji."""
+    baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+    # Wyniki sprzed opcji --connections to pobieranie jednym połączeniem
+    key = lambda r: (r['scenario'], r['profile'], r['mode'], r['jobs'], r.get('connections', 1))
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if not old or not old['files_per_min'] or result['files_per_min'] is None:
+            continue
+        change = result['files_per_min'] / old['files_per_min'] - 1
+        if change < -tolerance:
+            regressions.append(f"{'/'.join(str(part) for part in key(result))}: "
+                               f"{old['files_per_min']} -> {result['files_per_min']} pliki/min ({change:+.0%})")
+    return regressions
+
+
+def compare_startup(startup: dict, baseline_path: str, tolerance: float) -> List[str]:
+    """Porównuje mediany czasów uruchomienia z poprzednim wynikiem."""
+    baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8')).get('startup')
+    if not startup or not baseline:
+        return []
+    regressions = []
+    for name, timing in startup['timings'].items():
+        old = baseline['timings'].get(name)
+        if not timing or not old:
+            continue
+        change = timing['median_s'] / old['median_s'] - 1
+        if change > tolerance:
+            regressions.append(f"startup/{name}: {old['median_s']}s -> {timing['median_s']}s ({change:+.0%})")
+    return regressions
+
+
+def parse_list(value: str) -> List[str]:
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark przepustowości YTWAV")
+    parser.add_argument("--files", type=int, default=6, help="Liczba syntetycznych plików (domyślnie: 6)")
+    parser.add_argument("--duration", type=int, default=30, help="Długość pliku w sekundach (domyślnie: 30)")
+    parser.add_argument("--jobs", default="1,2,4", help="Poziomy współbieżności wsadu (domyślnie: 1,2,4)")
+    parser.add_argument("--profiles", default="48000:2:16,48000:2:24",
+                        help="Profile wyjściowe sr:ch:bit (domyślnie: 48000:2:16,48000:2:24)")
+    parser.add_argument("--modes", default="file,stream", help="Tryby: file, stream (domyślnie: oba)")
+    parser.add_argument("--connections", default=str(DEFAULT_CONNECTIONS),
+                        help=f"Maks. liczby połączeń na plik (domyślnie: {DEFAULT_CONNECTIONS})")
+    parser.add_argument("--conn-rate", type=int, default=0,
+                        help="Limit serwera na jedno połączenie w KB/s (domyślnie: 0 = bez limitu)")
+    parser.add_argument("--scenarios", default="download_audio,batch_main,startup",
+                        help="Scenariusze: download_audio, batch_main, startup (domyślnie: wszystkie)")
+    parser.add_argument("--startup-runs", type=int, default=5,
+                        help="Liczba prób na pomiar czasu uruchomienia (domyślnie: 5)")
+    parser.add_argument("--output", help="Zapisz wynik JSON do pliku (domyślnie: stdout)")
+    parser.add_argument("--compare", help="Poprzedni wynik JSON do porównania")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Dopuszczalny spadek pliki/min przy --compare (domyślnie: 0.2)")
+    parser.add_argument("--keep", action="store_true", help="Nie usuwaj katalogu roboczego")
+    args = parser.parse_args()
+
+    scenarios = parse_list(args.scenarios)
+    work = Path(tempfile.mkdtemp(prefix="ytwav-bench-"))
+    media_dir = work / 'media'
+    plugin_root = work / 'plugins'
+
+    print(f"⏱️ Generuję {args.files} plików x {args.duration}s w {work}", file=sys.stderr)
+    source_bytes = generate_media(media_dir, args.files, args.duration)
+    install_extractor(plugin_root)
+    urls = [f"https://www.youtube.com/watch?v={video_id(index)}" for index in range(args.files)]
+
+    results = []
+    with MediaServer(media_dir, rate=args.conn_rate * 1024) as server:
+        # Zastępczy extractor - także dla procesów potomnych
+        os.environ['YTWAV_BENCH_BASE_URL'] = server.base_url
+        os.environ['YTWAV_BENCH_DURATION'] = str(args.duration)
+        sys.path.insert(0, str(plugin_root))
+        sys.path.insert(0, str(PROJECT_DIR))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(plugin_root), str(PROJECT_DIR),
+                                                          env.get('PYTHONPATH')]))
+
+        for profile in parse_list(args.profiles):
+            for mode in parse_list(args.modes):
+                for connections in (int(value) for value in parse_list(args.connections)):
+                    if 'download_audio' in scenarios:
+                        results.append(bench_download_audio(urls, profile, mode, connections, work,
+                                                            source_bytes))
+                        print(f"  download_audio {profile} {mode} c={connections}: "
+                              f"{results[-1]['files_per_min']} pliki/min", file=sys.stderr)
+                    if 'batch_main' in scenarios:
+                        for jobs in (int(value) for value in parse_list(args.jobs)):
+                            results.append(bench_batch_main(urls, profile, mode, jobs, connections, work,
+                                                            env, source_bytes))
+                            print(f"  batch_main {profile} {mode} j={jobs} c={connections}: "
+                                  f"{results[-1]['files_per_min']} pliki/min", file=sys.stderr)
+
+    startup = bench_startup(work, args.startup_runs) if 'startup' in scenarios else None
+    if startup:
+        for name, timing in startup['timings'].items():
+            value = f"{timing['median_s']}s" if timing else "n/d (brak ekranu)"
+            print(f"  startup {name}: {value}", file=sys.stderr)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': tool_versions(),
+        'media': {'files': args.files, 'duration_s': args.duration, 'source_bytes': source_bytes,
+                  'conn_rate_kbps': args.conn_rate},
+        'results': results,
+        'startup': startup,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + '\n', encoding='utf-8')
+        print(f"💾 Wyniki zapisane do {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if not args.keep:
+        shutil.rmtree(work, ignore_errors=True)
+
+    exit_code = 0
+    if any(result['ok'] < result['files'] for result in results):
+        print("❌ Część plików nie została przetworzona", file=sys.stderr)
+        exit_code = 1
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        regressions += compare_startup(startup, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"📉 Regresja: {regression}", file=sys.stderr)
+        if regressions:
+            exit_code = 1
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
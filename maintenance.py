@@ -4,14 +4,22 @@
 Automatyczne monitorowanie, aktualizacje i diagnostyka
 """
 
+import importlib.metadata
+import os
 import subprocess
 import sys
 import json
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
-import yt_dlp
-import requests
+
+# yt-dlp i requests są importowane dopiero w metodach, które ich potrzebują,
+# dzięki czemu np. --stats startuje bez ładowania ciężkich modułów
+from ytdl_wav import extract_video_id, load_yt_dlp, profile_requirements
+from ytwav_caps import get_capabilities
+from ytwav_store import MetadataCache, SuccessMetrics
 
 # Konfiguracja logowania
 logging.basicConfig(
@@ -24,14 +32,57 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+DEFAULT_TEST_URLS = [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",  # Rick Roll - zawsze dostępny
+    "https://www.youtube.com/watch?v=9bZkp7q19f0",  # Gangnam Style
+]
+# Łączny limit czasu wszystkich sprawdzeń (sekundy)
+DEFAULT_DEADLINE = 60.0
+# Limit pojedynczego zapytania sieciowego - krótszy z nim i pozostałego czasu
+PROBE_TIMEOUT = 10.0
+
+
+def run_parallel(tasks: dict, timeout: float) -> dict:
+    """Uruchamia funkcje z `tasks` równolegle i czeka na nie najwyżej `timeout` s.
+
+    Zwraca {nazwa: wynik} tylko dla zadań, które zdążyły. Wątki są typu
+    daemon, więc zawieszona sonda sieciowa nie blokuje zakończenia procesu.
+    """
+    results = {}
+    finished = threading.Condition()
+
+    def run(name, func):
+        try:
+            value = func()
+        except Exception as e:
+            logger.error(f"[ERROR] Sprawdzenie {name} nieudane: {e}")
+            value = None
+        with finished:
+            results[name] = value
+            finished.notify_all()
+
+    for name, func in tasks.items():
+        threading.Thread(target=run, args=(name, func), name=f"ytwav-check-{name}", daemon=True).start()
+    deadline = time.monotonic() + timeout
+    with finished:
+        while len(results) < len(tasks):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            finished.wait(remaining)
+        return dict(results)
+
+
 class YTDownloaderMaintenance:
-    def __init__(self):
+    def __init__(self, test_urls=None, deadline=DEFAULT_DEADLINE):
         self.logger = logger  # Przypisanie globalnego loggera
-        self.test_urls = [
-            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",  # Rick Roll - zawsze dostępny
-            "https://www.youtube.com/watch?v=9bZkp7q19f0",  # Gangnam Style
-        ]
+        # Adresy testowe: argument, zmienna YTWAV_TEST_URLS (po przecinku) albo domyślne.
+        # Można wskazać lokalny serwer plików - obsłuży go generyczny extractor yt-dlp
+        env_urls = [url.strip() for url in os.environ.get('YTWAV_TEST_URLS', '').split(',') if url.strip()]
+        self.test_urls = list(test_urls or env_urls or DEFAULT_TEST_URLS)
+        self.deadline = deadline
         self.status_file = Path("maintenance_status.json")
+        self._metrics = None
     
     def safe_title(self, title):
         """Bezpieczne formatowanie tytułu dla konsoli"""
@@ -41,14 +92,19 @@ class YTDownloaderMaintenance:
         safe = title.encode('ascii', errors='ignore').decode('ascii')
         return safe if safe else "Tytuł z znakami specjalnymi"
         
-    def check_ytdlp_version(self):
+    def check_ytdlp_version(self, timeout=PROBE_TIMEOUT):
         """Sprawdza aktualną i najnowszą wersję yt-dlp"""
         try:
-            # Aktualna wersja
-            current = yt_dlp.version.__version__
+            import requests
+            
+            # Aktualna wersja (z metadanych pakietu - bez importu yt-dlp)
+            try:
+                current = importlib.metadata.version("yt-dlp")
+            except importlib.metadata.PackageNotFoundError:
+                current = load_yt_dlp().version.__version__
             
             # Najnowsza wersja z PyPI
-            response = requests.get("https://pypi.org/pypi/yt-dlp/json", timeout=10)
+            response = requests.get("https://pypi.org/pypi/yt-dlp/json", timeout=timeout)
             latest = response.json()["info"]["version"]
             
             logger.info(f"yt-dlp: aktualna={current}, najnowsza={latest}")
@@ -80,63 +136,130 @@ class YTDownloaderMaintenance:
             logger.error(f"[ERROR] Wyjątek podczas aktualizacji: {e}")
             return False
     
-    def test_download_capability(self):
-        """Testuje możliwość pobierania z YouTube"""
-        success_count = 0
-        total_tests = len(self.test_urls)
+    def test_url(self, index, url, cache, use_cache=True, timeout=PROBE_TIMEOUT):
+        """Pojedynczy test ekstrakcji metadanych. Zwraca True przy sukcesie."""
+        cache_key = extract_video_id(url) or f"url:{url}"
+        
+        if use_cache:
+            cached = cache.get_metadata(cache_key)
+            if cached and cached.get('title'):
+                logger.info(f"[OK] Test {index} OK (cache): {self.safe_title(cached['title'])}")
+                return True
         
+        try:
+            ydl_opts = {
+                'quiet': True,
+                'no_warnings': True,
+                'extract_flat': False,
+                'skip_download': True,  # Tylko test, bez pobierania
+                'socket_timeout': timeout,
+            }
+            
+            with load_yt_dlp().YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False)
+                if info and info.get('title'):
+                    cache.put_metadata(cache_key, MetadataCache.summarize(info))
+                    safe_title = self.safe_title(info.get('title'))
+                    logger.info(f"[OK] Test {index} OK: {safe_title}")
+                    return True
+                logger.warning(f"[WARN] Test {index} - brak informacji o filmie")
+                    
+        except Exception as e:
+            logger.error(f"[ERROR] Test {index} nieudany: {e}")
+        return False
+    
+    def download_tasks(self, cache, use_cache=True, timeout=PROBE_TIMEOUT):
+        """Zadania dla run_parallel: jeden test na adres, klucze "test:N"."""
+        total_tests = len(self.test_urls)
+        tasks = {}
         for i, url in enumerate(self.test_urls, 1):
             logger.info(f"Test {i}/{total_tests}: {url}")
-            
-            try:
-                ydl_opts = {
-                    'quiet': True,
-                    'no_warnings': True,
-                    'extract_flat': False,
-                    'skip_download': True,  # Tylko test, bez pobierania
-                }
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    if info and info.get('title'):
-                        safe_title = self.safe_title(info.get('title'))
-                        logger.info(f"[OK] Test {i} OK: {safe_title}")
-                        success_count += 1
-                    else:
-                        logger.warning(f"[WARN] Test {i} - brak informacji o filmie")
-                        
-            except Exception as e:
-                logger.error(f"[ERROR] Test {i} nieudany: {e}")
+            tasks[f"test:{i}"] = lambda i=i, url=url: self.test_url(i, url, cache, use_cache, timeout)
+        return tasks
+    
+    def summarize_download_tests(self, results, cache):
+        """Wynik testów pobierania z (być może częściowych) wyników run_parallel."""
+        total_tests = len(self.test_urls)
+        finished = [results[key] for key in results if key.startswith("test:")]
+        success_count = sum(1 for ok in finished if ok)
+        timed_out = total_tests - len(finished)
+        if timed_out:
+            logger.warning(f"[TIMEOUT] {timed_out} test(y) bez wyniku przed upływem limitu")
         
-        success_rate = (success_count / total_tests) * 100
+        success_rate = (success_count / total_tests) * 100 if total_tests else 0.0
         logger.info(f"Wynik testów: {success_count}/{total_tests} ({success_rate:.1f}%)")
+        cache_stats = cache.stats()
+        logger.info(f"Cache metadanych: {cache_stats['hits']} trafień, {cache_stats['misses']} chybień")
+        # Spóźnione testy mogą jeszcze pisać do cache - zamykamy go tylko po komplecie
+        if not timed_out:
+            cache.close()
         
+        if success_rate >= 80:
+            status = "OK"
+        else:
+            status = "TIMEOUT" if timed_out else "PROBLEM"
         return {
             "success_count": success_count,
             "total_tests": total_tests,
+            "timed_out": timed_out,
             "success_rate": success_rate,
-            "status": "OK" if success_rate >= 80 else "PROBLEM"
+            "status": status
         }
     
-    def check_ffmpeg(self):
-        """Sprawdza dostępność FFmpeg"""
+    def test_download_capability(self, use_cache=True):
+        """Testuje możliwość pobierania z YouTube
+        
+        Przy use_cache=True świeże metadane z trwałego cache są traktowane
+        jak udany test (bez ruchu sieciowego). Pełne utrzymanie wyłącza cache,
+        bo ma wykryć rzeczywiste problemy z extractorem.
+        
+        Adresy są testowane równolegle pod limitem self.deadline; test bez
+        wyniku w tym czasie liczy się jako nieudany (pole "timed_out").
+        """
+        cache = MetadataCache()
+        probe_timeout = max(1.0, min(PROBE_TIMEOUT, self.deadline))
+        results = run_parallel(self.download_tasks(cache, use_cache, probe_timeout), self.deadline)
+        return self.summarize_download_tests(results, cache)
+    
+    def run_tests(self, use_cache=True):
+        """Testy pobierania i sprawdzenie FFmpeg pod jednym limitem self.deadline (--test-only).
+
+        Zwraca (download_test, ffmpeg_status); FFmpeg bez wyniku w czasie
+        ma status TIMEOUT - bez ponownego sondowania poza limitem.
+        """
+        cache = MetadataCache()
+        probe_timeout = max(1.0, min(PROBE_TIMEOUT, self.deadline))
+        results = run_parallel({
+            "ffmpeg": self.check_ffmpeg,
+            **self.download_tasks(cache, use_cache, probe_timeout),
+        }, self.deadline)
+        return self.summarize_download_tests(results, cache), results.get("ffmpeg") or {"status": "TIMEOUT"}
+    
+    def check_ffmpeg(self, refresh=False):
+        """Sprawdza FFmpeg i obsługę formatów PCM (wspólny rejestr możliwości, z cache)"""
         try:
-            result = subprocess.run(
-                ["ffmpeg", "-version"], 
-                capture_output=True, 
-                text=True, 
-                timeout=10
-            )
-            if result.returncode == 0:
-                version_line = result.stdout.split('\n')[0]
-                logger.info(f"[OK] FFmpeg OK: {version_line}")
-                return {"status": "OK", "version": version_line}
-            else:
-                logger.error("[ERROR] FFmpeg nie odpowiada")
-                return {"status": "ERROR", "error": "No response"}
-        except FileNotFoundError:
-            logger.error("[ERROR] FFmpeg nie znaleziony")
-            return {"status": "NOT_FOUND", "error": "FFmpeg not installed"}
+            capabilities = get_capabilities()
+            toolchain = capabilities.get(refresh=refresh)
+            ffmpeg = toolchain['ffmpeg']
+            if toolchain.get('probe_error'):
+                logger.error(f"[ERROR] FFmpeg nie odpowiada: {toolchain['probe_error']}")
+                return {"status": "ERROR", "error": toolchain['probe_error']}
+            if ffmpeg is None:
+                logger.error("[ERROR] FFmpeg nie znaleziony")
+                return {"status": "NOT_FOUND", "error": "FFmpeg not installed"}
+            missing = capabilities.missing(profile_requirements([(48000, 2, 16), (48000, 2, 24)]),
+                                           muxers=['wav'])
+            if missing:
+                logger.error(f"[ERROR] FFmpeg bez wymaganych funkcji: {', '.join(missing)}")
+                return {"status": "ERROR", "version": ffmpeg['version'], "missing": missing}
+            result = {"status": "OK", "version": ffmpeg['version'], "path": ffmpeg['path']}
+            # tee/hash służą tylko deduplikacji - bez nich downloader działa, wyłączając ją
+            optional_missing = capabilities.missing([], muxers=['tee', 'hash'])
+            if optional_missing:
+                logger.warning(f"[WARN] FFmpeg bez {', '.join(optional_missing)} - deduplikacja treści wyłączona")
+                result["optional_missing"] = optional_missing
+            logger.info(f"[OK] FFmpeg OK: {ffmpeg['version']}")
+            return result
         except Exception as e:
             logger.error(f"[ERROR] Błąd sprawdzania FFmpeg: {e}")
             return {"status": "ERROR", "error": str(e)}
@@ -159,47 +282,41 @@ class YTDownloaderMaintenance:
             logger.error(f"Błąd odczytu statusu: {e}")
         return {}
     
+    def metrics_store(self):
+        """Magazyn metryk sukcesu (SQLite, otwierany przy pierwszym użyciu).
+
+        Liczniki zapisane wcześniej w pliku statusu są przenoszone raz,
+        gdy magazyn jest jeszcze pusty.
+        """
+        if self._metrics is None:
+            self._metrics = SuccessMetrics()
+            legacy = self.load_status().get('metrics')
+            if legacy and self._metrics.is_empty():
+                self._metrics.import_totals(legacy)
+                logger.info("Przeniesiono metryki sukcesu z pliku statusu do magazynu SQLite")
+        return self._metrics
+
     def update_success_metrics(self, success: bool, error_type: str = None):
-        """Aktualizuje metryki sukcesu pobierania."""
-        status = self.load_status()
-        
-        if 'metrics' not in status:
-            status['metrics'] = {
-                'total_attempts': 0,
-                'successful_downloads': 0,
-                'failed_downloads': 0,
-                'error_types': {},
-                'success_rate': 0.0
-            }
-        
-        metrics = status['metrics']
-        metrics['total_attempts'] += 1
-        
-        if success:
-            metrics['successful_downloads'] += 1
-        else:
-            metrics['failed_downloads'] += 1
-            if error_type:
-                metrics['error_types'][error_type] = metrics['error_types'].get(error_type, 0) + 1
-        
-        # Oblicz wskaźnik sukcesu
-        if metrics['total_attempts'] > 0:
-            metrics['success_rate'] = (metrics['successful_downloads'] / metrics['total_attempts']) * 100
-        
-        metrics['last_updated'] = datetime.now().isoformat()
-        self.save_status(status)
-        
+        """Aktualizuje metryki sukcesu pobierania (atomowy przyrost liczników).
+
+        Zwraca zaktualizowane liczniki łączne w dawnym kształcie słownika
+        'metrics' (last_updated jako tekst ISO).
+        """
+        store = self.metrics_store()
+        store.record(success, error_type)
+        metrics = store.totals()
+        if metrics['last_updated']:
+            metrics['last_updated'] = datetime.fromtimestamp(metrics['last_updated']).isoformat()
         return metrics
 
     def show_success_statistics(self):
         """Wyświetla statystyki sukcesu pobierania."""
-        status = self.load_status()
+        metrics = self.metrics_store().stats()
         
-        if 'metrics' not in status:
+        if not metrics['total_attempts']:
             self.logger.info("Brak danych statystycznych")
             return
         
-        metrics = status['metrics']
         self.logger.info("=== STATYSTYKI SUKCESU POBIERANIA ===")
         self.logger.info(f"Łączna liczba prób: {metrics['total_attempts']}")
         self.logger.info(f"Udane pobierania: {metrics['successful_downloads']}")
@@ -211,47 +328,73 @@ class YTDownloaderMaintenance:
             for error_type, count in metrics['error_types'].items():
                 self.logger.info(f"  - {error_type}: {count}")
         
-        if 'last_updated' in metrics:
-            self.logger.info(f"Ostatnia aktualizacja: {metrics['last_updated']}")
+        labels = {'hour': "Ostatnia godzina", 'day': "Ostatnie 24 h"}
+        for name, window in metrics['windows'].items():
+            line = (f"{labels[name]}: {window['total_attempts']} prób, "
+                    f"{window['success_rate']:.1f}% sukcesu")
+            if window['error_types']:
+                errors = ', '.join(f"{error_type}: {count}" for error_type, count in window['error_types'].items())
+                line += f" (błędy: {errors})"
+            self.logger.info(line)
+        
+        if metrics['last_updated']:
+            self.logger.info(f"Ostatnia aktualizacja: {datetime.fromtimestamp(metrics['last_updated']).isoformat()}")
 
     def run_maintenance(self, auto_update=True):
-        """Główna funkcja utrzymania systemu"""
+        """Główna funkcja utrzymania systemu
+        
+        Sprawdzenie wersji yt-dlp, FFmpeg i testy pobierania biegną równolegle
+        pod wspólnym limitem self.deadline - całość trwa tyle, co najwolniejsza
+        sonda. Sprawdzenie, które nie zdążyło, ma status TIMEOUT. Aktualizacja
+        yt-dlp nie jest sondą: rusza dopiero po sprawdzeniach, z własnym limitem.
+        """
         logger.info("[MAINTENANCE] Rozpoczynam utrzymanie systemu YT Downloader")
+        started = time.monotonic()
         
         status = {
             "timestamp": datetime.now().isoformat(),
+            "deadline": self.deadline,
             "checks": {}
         }
         
-        # 1. Sprawdź wersję yt-dlp
-        logger.info("[1/4] Sprawdzam wersję yt-dlp...")
-        ytdlp_info = self.check_ytdlp_version()
+        # 1. Wersja yt-dlp, FFmpeg i testy pobierania - równolegle
+        logger.info(f"[1/3] Sprawdzam yt-dlp, FFmpeg i pobieranie z YouTube (limit {self.deadline:.0f}s)...")
+        probe_timeout = max(1.0, min(PROBE_TIMEOUT, self.deadline))
+        cache = MetadataCache()
+        results = run_parallel({
+            "ytdlp_version": lambda: self.check_ytdlp_version(timeout=probe_timeout),
+            "ffmpeg": lambda: self.check_ffmpeg(refresh=True),
+            **self.download_tasks(cache, use_cache=False, timeout=probe_timeout),
+        }, self.deadline)
+        
+        ytdlp_info = results.get("ytdlp_version", {"status": "TIMEOUT"})
+        ffmpeg_status = results.get("ffmpeg") or {"status": "TIMEOUT"}
+        download_test = self.summarize_download_tests(results, cache)
         status["checks"]["ytdlp_version"] = ytdlp_info
+        status["checks"]["ffmpeg"] = ffmpeg_status
+        status["checks"]["download_test"] = download_test
+        status["elapsed"] = round(time.monotonic() - started, 3)
         
         # 2. Aktualizuj jeśli potrzeba
         if auto_update and ytdlp_info and ytdlp_info.get("needs_update"):
-            logger.info("[2/4] Aktualizuję yt-dlp...")
+            logger.info("[2/3] Aktualizuję yt-dlp...")
             update_success = self.update_ytdlp()
             status["checks"]["ytdlp_update"] = {"success": update_success}
         
-        # 3. Sprawdź FFmpeg
-        logger.info("[3/4] Sprawdzam FFmpeg...")
-        ffmpeg_status = self.check_ffmpeg()
-        status["checks"]["ffmpeg"] = ffmpeg_status
-        
-        # 4. Testuj pobieranie
-        logger.info("[4/4] Testuję pobieranie z YouTube...")
-        download_test = self.test_download_capability()
-        status["checks"]["download_test"] = download_test
-        
-        # 5. Zapisz status
+        # 3. Zapisz status (stare metryki z pliku trafiają najpierw do magazynu)
+        logger.info("[3/3] Zapisuję status...")
+        self.metrics_store()
         self.save_status(status)
         
-        # 6. Podsumowanie
+        # 4. Podsumowanie
         logger.info("[SUMMARY] PODSUMOWANIE UTRZYMANIA:")
-        logger.info(f"   yt-dlp: {ytdlp_info.get('current', 'nieznana') if ytdlp_info else 'błąd'}")
+        if ytdlp_info and "current" in ytdlp_info:
+            logger.info(f"   yt-dlp: {ytdlp_info['current']}")
+        else:
+            logger.info(f"   yt-dlp: {ytdlp_info.get('status', 'błąd') if ytdlp_info else 'błąd'}")
         logger.info(f"   FFmpeg: {ffmpeg_status['status']}")
         logger.info(f"   Testy pobierania: {download_test['status']} ({download_test['success_rate']:.1f}%)")
+        logger.info(f"   Czas sprawdzeń: {status['elapsed']:.1f}s")
         
         # Zwróć ogólny status
         overall_status = "OK"
@@ -274,10 +417,19 @@ def main():
                        help="Tylko testy, bez aktualizacji")
     parser.add_argument("--stats", action="store_true",
                        help="Pokaż statystyki sukcesu")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Testy bez trwałego cache metadanych")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE,
+                       help=f"Łączny limit czasu sprawdzeń w sekundach (domyślnie {DEFAULT_DEADLINE:.0f})")
+    parser.add_argument("--test-url", action="append", dest="test_urls", metavar="URL",
+                       help="Adres testowy zamiast domyślnych (można podać wiele razy; "
+                            "także zmienna YTWAV_TEST_URLS)")
     
     args = parser.parse_args()
+    if args.deadline <= 0:
+        parser.error("--deadline musi być dodatnie")
     
-    maintenance = YTDownloaderMaintenance()
+    maintenance = YTDownloaderMaintenance(test_urls=args.test_urls, deadline=args.deadline)
     
     if args.stats:
         # Pokaż statystyki
@@ -285,8 +437,7 @@ def main():
         maintenance.show_success_statistics()
     elif args.test_only:
         # Tylko testy
-        download_test = maintenance.test_download_capability()
-        ffmpeg_status = maintenance.check_ffmpeg()
+        download_test, ffmpeg_status = maintenance.run_tests(use_cache=not args.no_cache)
         print(f"Testy pobierania: {download_test['status']}")
         print(f"FFmpeg: {ffmpeg_status['status']}")
     else:
@@ -2,22 +2,31 @@
 """
 🧪 Test zoptymalizowanego systemu obronnego
 Testuje nowe strategie retry i zbiera metryki
+
+Pobiera prawdziwe filmy z YouTube. Pod pytest test jest pomijany, chyba że
+ustawiono YTWAV_NETWORK_TESTS=1; jako skrypt działa zawsze i zapisuje
+wyniki do test_results.json.
 """
 
+import os
 import sys
 import time
-from pathlib import Path
-from ytdl_wav import YTDownloader
-from maintenance import YTDownloaderMaintenance
 
-def test_optimized_defense():
-    """Testuje zoptymalizowany system obronny."""
+# Zmienna włączająca testy wymagające sieci i YouTube
+NETWORK_ENV = 'YTWAV_NETWORK_TESTS'
+
+
+def run_optimized_defense():
+    """Testuje zoptymalizowany system obronny. Zwraca listę wyników przypadków."""
+    # Import w funkcji - samo zebranie testów przez pytest nie tworzy maintenance.log
+    from ytdl_wav import YTWavDownloader
+    from maintenance import YTDownloaderMaintenance
     
     print("🧪 TESTOWANIE ZOPTYMALIZOWANEGO SYSTEMU OBRONNEGO")
     print("=" * 60)
     
     # Inicjalizacja
-    downloader = YTDownloader()
+    downloader = YTWavDownloader()
     maintenance = YTDownloaderMaintenance()
     
     # URLs do testowania (różne poziomy trudności)
@@ -126,9 +135,20 @@ def test_optimized_defense():
     
     return results
 
+
+def test_optimized_defense():
+    """Wszystkie przypadki testowe pobierają się bez błędu (wymaga sieci)."""
+    if os.environ.get(NETWORK_ENV) != '1':
+        import pytest
+        pytest.skip(f"test sieciowy (YouTube) - uruchom z {NETWORK_ENV}=1")
+    results = run_optimized_defense()
+    failed = [f"{r['test_case']['url']}: {r['error_type']}" for r in results if not r['success']]
+    assert not failed, f"Nieudane pobrania: {failed}"
+
+
 if __name__ == "__main__":
     try:
-        results = test_optimized_defense()
+        results = run_optimized_defense()
         print("\n🎉 Test zakończony pomyślnie!")
         
         # Zapisz wyniki do pliku
@@ -0,0 +1,6 @@
+"""Moduły projektu leżą w katalogu głównym repozytorium - udostępnij je testom."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
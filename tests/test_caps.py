@@ -0,0 +1,39 @@
+"""Testy rejestru możliwości: binarka FFmpeg, która nie odpowiada."""
+
+import ytwav_caps
+from ytwav_caps import ToolchainCapabilities
+
+
+def test_failed_probe_is_reported_and_not_cached(tmp_path, monkeypatch):
+    broken = tmp_path / 'ffmpeg'
+    broken.write_text('#!/bin/sh\nexit 1\n')
+    broken.chmod(0o755)
+    monkeypatch.setattr(ytwav_caps.shutil, 'which', lambda name: str(broken))
+    capabilities = ToolchainCapabilities(tmp_path / 'toolchain.json')
+
+    result = capabilities.get()
+    assert result['ffmpeg'] is None
+    assert str(broken) in result['probe_error']
+    problems = capabilities.missing([], muxers=['wav'])
+    assert problems != ['ffmpeg'] and 'działający ffmpeg' in problems[0]
+    assert not (tmp_path / 'toolchain.json').exists()
+
+    # Po naprawie binarki kolejne sprawdzenie sonduje ponownie
+    monkeypatch.setattr(ytwav_caps, 'PROBE_RETRY_INTERVAL', 0.0)
+    capabilities._retry_at = 0.0
+    monkeypatch.setattr(ytwav_caps, 'probe_ffmpeg', lambda binary: {
+        'version': 'ffmpeg version test', 'encoders': [], 'muxers': ['wav'],
+        'sample_formats': {}, 'wav_rf64': True,
+    })
+    result = capabilities.get()
+    assert result['probe_error'] is None
+    assert result['ffmpeg']['version'] == 'ffmpeg version test'
+    assert capabilities.missing([], muxers=['wav']) == []
+    assert (tmp_path / 'toolchain.json').exists()
+
+
+def test_missing_binary_is_not_a_probe_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(ytwav_caps.shutil, 'which', lambda name: None)
+    capabilities = ToolchainCapabilities(tmp_path / 'toolchain.json')
+    assert capabilities.get()['probe_error'] is None
+    assert capabilities.missing([]) == ['ffmpeg']
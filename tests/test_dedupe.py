@@ -0,0 +1,79 @@
+"""Testy deduplikacji treści: skrót PCM z muxera tee, dowiązania i unieważnianie indeksu."""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import ytdl_wav
+from ytdl_wav import YTWavDownloader, read_wav_header
+
+pytestmark = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="brak ffmpeg")
+
+
+@pytest.fixture
+def make_downloader(tmp_path, monkeypatch):
+    monkeypatch.setenv('YTWAV_CACHE_DIR', str(tmp_path / 'cache'))
+    # Bez reflinków (Btrfs/APFS) - hardlink daje sprawdzalny wspólny i-węzeł
+    monkeypatch.setattr(ytdl_wav, 'reflink', lambda source, target: (_ for _ in ()).throw(OSError()))
+
+    def make(**kwargs):
+        return YTWavDownloader(output_dir=str(tmp_path / 'out'), use_cache=False, use_archive=False,
+                               **kwargs)
+
+    return make
+
+
+def source(downloader, name: str, lavfi: str = 'sine=frequency=440:duration=1') -> 'os.PathLike':
+    path = downloader.output_dir / name
+    subprocess.run(['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-f', 'lavfi', '-i', lavfi,
+                    '-c:a', 'flac', str(path)], check=True)
+    return path
+
+
+def test_tee_hash_is_built_only_with_dedupe(make_downloader, tmp_path):
+    partial = tmp_path / 'a.wav.part'
+    cmd = make_downloader().build_ffmpeg_cmd('in.m4a', [partial], duration=60)
+    assert cmd[cmd.index('-f', cmd.index('-i')) + 1] == 'tee'
+    assert '[f=hash:hash=sha256]' in cmd[-1]
+
+    cmd = make_downloader(dedupe=False).build_ffmpeg_cmd('in.m4a', [partial], duration=60)
+    assert 'tee' not in cmd and cmd[-1] == str(partial)
+
+
+def test_same_audio_in_same_profile_becomes_a_link(make_downloader):
+    downloader = make_downloader(sample_rate=16000, channels=1)
+    first = downloader.transcode(source(downloader, 'a.flac'))
+    second = downloader.transcode(source(downloader, 'b.flac'))
+    assert first.name == 'a.wav' and second.name == 'b.wav'
+    assert os.path.samefile(first, second)
+    assert not list(downloader.output_dir.glob('*.sha256'))
+
+
+def test_same_pcm_in_different_profiles_is_not_linked(make_downloader):
+    # Cisza 16000 Hz mono i 8000 Hz stereo: identyczne bajty PCM, inny nagłówek fmt
+    downloader = make_downloader(profiles=[(16000, 1, 16), (8000, 2, 16)])
+    output = downloader.transcode(source(downloader, 'a.flac', 'anullsrc=r=48000:cl=stereo:d=1'))
+    mono, stereo = downloader.profile_outputs(output)
+    assert mono.stat().st_size == stereo.stat().st_size
+    assert not os.path.samefile(mono, stereo)
+    assert (read_wav_header(mono)['channels'], read_wav_header(stereo)['channels']) == (1, 2)
+
+
+def test_changed_file_is_dropped_from_index(make_downloader):
+    downloader = make_downloader(sample_rate=16000, channels=1)
+    first = downloader.transcode(source(downloader, 'a.flac'))
+    with open(first, 'ab') as f:
+        f.write(b'\0\0')
+
+    second = downloader.transcode(source(downloader, 'b.flac'))
+    assert not os.path.samefile(first, second)
+    # Indeks wskazuje teraz na nowy plik - kolejny duplikat dowiązuje się do niego
+    third = downloader.transcode(source(downloader, 'c.flac'))
+    assert os.path.samefile(second, third)
+
+    second.unlink()
+    third.unlink()
+    fourth = downloader.transcode(source(downloader, 'd.flac'))
+    assert fourth.exists() and os.stat(fourth).st_nlink == 1
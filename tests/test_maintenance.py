@@ -0,0 +1,64 @@
+"""Testy skryptu utrzymania: sprawdzenie FFmpeg i metryki sukcesu."""
+
+import json
+from datetime import datetime
+
+import pytest
+
+
+class FakeCapabilities:
+    """Rejestr możliwości z zadanym zestawem enkoderów i muxerów."""
+
+    def __init__(self, muxers):
+        self.ffmpeg = {
+            'version': 'ffmpeg version test', 'path': '/usr/bin/ffmpeg',
+            'encoders': ['pcm_s16le', 'pcm_s24le'],
+            'sample_formats': {'pcm_s16le': ['s16'], 'pcm_s24le': ['s32']},
+            'muxers': muxers,
+        }
+
+    def get(self, refresh=False):
+        return {'ffmpeg': self.ffmpeg, 'probe_error': None}
+
+    def missing(self, requirements, muxers=()):
+        from ytwav_caps import ToolchainCapabilities
+
+        return ToolchainCapabilities.missing(self, requirements, muxers)
+
+
+@pytest.fixture
+def maintenance(tmp_path, monkeypatch):
+    # Moduł przy imporcie otwiera maintenance.log w bieżącym katalogu
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('YTWAV_CACHE_DIR', str(tmp_path / 'cache'))
+    import maintenance
+
+    return maintenance
+
+
+@pytest.mark.parametrize('muxers, status, optional', [
+    (['wav', 'tee', 'hash'], 'OK', None),
+    (['wav'], 'OK', ['muxer tee', 'muxer hash']),
+    (['tee', 'hash'], 'ERROR', None),
+])
+def test_tee_and_hash_are_optional(maintenance, monkeypatch, muxers, status, optional):
+    monkeypatch.setattr(maintenance, 'get_capabilities', lambda: FakeCapabilities(muxers))
+    result = maintenance.YTDownloaderMaintenance().check_ffmpeg()
+    assert result['status'] == status
+    assert result.get('optional_missing') == optional
+
+
+def test_legacy_metrics_are_imported_once(maintenance, tmp_path):
+    legacy = {'total_attempts': 3, 'successful_downloads': 2, 'failed_downloads': 1,
+              'error_types': {'HTTP 403': 1}, 'success_rate': 66.7, 'last_updated': '2024-01-01T00:00:00'}
+    (tmp_path / 'maintenance_status.json').write_text(json.dumps({'metrics': legacy}), encoding='utf-8')
+
+    first = maintenance.YTDownloaderMaintenance()
+    metrics = first.update_success_metrics(False, 'HTTP 403')
+    assert (metrics['total_attempts'], metrics['failed_downloads']) == (4, 2)
+    assert metrics['error_types'] == {'HTTP 403': 2}
+    datetime.fromisoformat(metrics['last_updated'])
+
+    # Plik statusu nadal ma stary klucz - drugi start nie importuje go ponownie
+    second = maintenance.YTDownloaderMaintenance()
+    assert second.update_success_metrics(True)['total_attempts'] == 5
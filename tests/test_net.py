@@ -0,0 +1,147 @@
+"""Testy limitera zapytań (sztuczny zegar), walidacji opcji liczbowych CLI i klasyfikacji błędów."""
+
+import argparse
+import errno
+import random
+
+import pytest
+
+from ytwav_net import (ENVIRONMENT_MARKERS, PERMANENT_MARKERS, THROTTLE_MARKERS, BackoffPolicy,
+                       RateLimiter, classify_error, get_rate_limiter)
+
+
+class FakeClock:
+    """Zegar testowy: czas płynie tylko przez sleep() i advance()."""
+
+    def __init__(self):
+        self.time = 100.0
+        self.sleeps = []
+
+    def now(self) -> float:
+        return self.time
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        if seconds > 0:
+            self.time += seconds
+
+    def advance(self, seconds: float):
+        self.time += seconds
+
+
+def make_limiter(**kwargs) -> RateLimiter:
+    clock = FakeClock()
+    backoff = BackoffPolicy(base=4.0, cap=120.0, rng=random.Random(0))
+    return RateLimiter(clock=clock, backoff=backoff, **kwargs)
+
+
+def test_burst_passes_without_waiting_then_paces():
+    limiter = make_limiter(rate=2.0, burst=3)
+    assert [limiter.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.reserve() == pytest.approx(0.5)
+    assert limiter.reserve() == pytest.approx(1.0)
+
+
+def test_tokens_refill_with_time_up_to_burst():
+    limiter = make_limiter(rate=1.0, burst=3)
+    for _ in range(3):
+        limiter.acquire()
+    limiter.clock.advance(2.0)
+    assert [limiter.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert limiter.reserve() == pytest.approx(1.0)
+
+    # Długa przerwa nie daje więcej niż `burst` żetonów
+    limiter = make_limiter(rate=1.0, burst=2)
+    limiter.clock.advance(60.0)
+    assert [limiter.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert limiter.reserve() == pytest.approx(1.0)
+
+
+def test_throttle_cools_down_all_callers_and_recovers_additively():
+    limiter = make_limiter(rate=1.0, burst=3, increase=0.1, min_rate=0.05)
+    expected_delay = BackoffPolicy(base=4.0, cap=120.0, rng=random.Random(0)).delay(1)
+
+    delay = limiter.on_throttle()
+    assert delay == pytest.approx(expected_delay)
+    assert limiter.rate == pytest.approx(0.5)
+    # Każdy kolejny wątek czeka do końca wspólnej pauzy
+    assert limiter.reserve() >= delay
+    limiter.clock.advance(delay)
+    assert limiter.reserve() < delay
+
+    limiter.on_throttle()
+    assert limiter.rate == pytest.approx(0.25)
+    assert limiter.throttle_count == 2
+
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(0.35)
+    assert limiter.throttle_streak == 0
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(1.0)
+
+
+def test_rate_never_drops_below_minimum():
+    limiter = make_limiter(rate=1.0, min_rate=0.2)
+    for _ in range(10):
+        limiter.on_throttle()
+    assert limiter.rate == pytest.approx(0.2)
+
+
+@pytest.mark.parametrize('rate', [0, 0.0, -1.0, float('nan')])
+def test_non_positive_rate_is_rejected(rate):
+    with pytest.raises(ValueError):
+        RateLimiter(rate=rate)
+    with pytest.raises(ValueError):
+        get_rate_limiter(rate)
+
+
+@pytest.mark.parametrize('value', ['0', '-2', 'nan', 'abc'])
+def test_cli_rate_must_be_positive(value):
+    from ytdl_wav import positive_float
+
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_float(value)
+    assert positive_float('0.5') == 0.5
+
+
+@pytest.mark.parametrize('value', ['0', '-1', '1.5', 'abc'])
+def test_cli_counts_must_be_positive_integers(value):
+    from ytdl_wav import positive_int
+
+    with pytest.raises(argparse.ArgumentTypeError):
+        positive_int(value)
+    assert positive_int('4') == 4
+
+
+@pytest.mark.parametrize('markers, expected', [
+    (ENVIRONMENT_MARKERS, 'environment'),
+    (THROTTLE_MARKERS, 'throttled'),
+    (PERMANENT_MARKERS, 'permanent'),
+])
+def test_every_marker_selects_its_class(markers, expected):
+    for marker in markers:
+        assert classify_error(f"ERROR: [youtube] abc: {marker.upper()}") == expected, marker
+
+
+@pytest.mark.parametrize('message, expected', [
+    ("ERROR: [youtube] dQw4w9WgXcQ: Video unavailable. This video does not exist.", 'permanent'),
+    ("ERROR: unable to download video data: HTTP Error 429: Too Many Requests", 'throttled'),
+    ("ERROR: unable to write data: [Errno 28] No space left on device", 'environment'),
+    ("[Errno 2] No such file or directory: directory does not exist", 'transient'),
+    ("ERROR: temp file does not exist", 'transient'),
+    ("Read timed out.", 'transient'),
+])
+def test_messages_are_classified(message, expected):
+    assert classify_error(message) == expected
+
+
+def test_exception_chain_and_errno_are_classified():
+    try:
+        try:
+            raise OSError(errno.ENOSPC, "disk")
+        except OSError as e:
+            raise RuntimeError("ERROR: unable to write") from e
+    except RuntimeError as wrapped:
+        assert classify_error(wrapped) == 'environment'
+    assert classify_error(ValueError("something odd"), default='permanent') == 'permanent'
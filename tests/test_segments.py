@@ -0,0 +1,199 @@
+"""Testy pobierania wielosegmentowego na lokalnym serwerze HTTP z obsługą Range."""
+
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ytwav_segments
+from ytwav_net import BackoffPolicy
+from ytwav_segments import (RangeNotSupported, Segment, SegmentedDownload, open_range,
+                            plan_connections, probe_size)
+from ytwav_testserver import RangeHandler
+
+pytestmark = pytest.mark.skipif(not ytwav_segments.SEGMENTED_SUPPORTED, reason="brak os.pwrite")
+
+MiB = 1024 * 1024
+
+
+class NoRangeHandler(SimpleHTTPRequestHandler):
+    """Serwer ignorujący Range - zawsze cały plik z kodem 200."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        try:
+            super().copyfile(source, outputfile)
+        except (BrokenPipeError, ConnectionResetError):
+            # Klient rozłącza się po odpowiedzi 200 (RangeNotSupported) - zgodnie z testem
+            pass
+
+
+class DroppingHandler(RangeHandler):
+    """Serwer Range, który zrywa połączenie po 1/4 pierwszej odpowiedzi na zakres.
+
+    Przejęcie (steal) zostawia bieżącemu połączeniu co najmniej połowę
+    reszty zakresu, więc zerwanie po 1/4 zawsze wymaga wznowienia.
+    """
+
+    def copyfile(self, source, outputfile):
+        with self.server.lock:
+            drop = self.remaining is not None and self.remaining > 3 and not self.server.dropped
+            self.server.dropped = self.server.dropped or drop
+        if not drop:
+            super().copyfile(source, outputfile)
+            return
+        try:
+            outputfile.write(source.read(self.remaining // 4))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture
+def media(tmp_path):
+    data = os.urandom(6 * MiB + 12345)
+    (tmp_path / 'source.m4a').write_bytes(data)
+    return tmp_path, data
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(handler, directory):
+        httpd = ThreadingHTTPServer(('127.0.0.1', 0), partial(handler, directory=str(directory)))
+        httpd.lock = threading.Lock()
+        httpd.dropped = False
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        host, port = httpd.server_address[:2]
+        return httpd, f"http://{host}:{port}/source.m4a"
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def download(url, target, size, connections, **kwargs):
+    kwargs.setdefault('backoff', BackoffPolicy(base=0.01, cap=0.05))
+    return SegmentedDownload(url, {}, target, size, connections, **kwargs)
+
+
+def test_plan_connections():
+    assert plan_connections(None, 4) == 1
+    assert plan_connections(100 * MiB, 1) == 1
+    assert plan_connections(3 * MiB, 4) == 1
+    assert plan_connections(9 * MiB, 4) == 2
+    assert plan_connections(100 * MiB, 4) == 4
+
+
+def test_range_download_matches_source(media, serve):
+    directory, data = media
+    _, url = serve(RangeHandler, directory)
+    with open_range(url, {}, 10, 20) as response:
+        assert response.status == 206
+        assert response.read() == data[10:20]
+    size = probe_size(url, {})
+    assert size == len(data)
+
+    job = download(url, directory / 'out.m4a', size, 4)
+    job.run()
+    assert (directory / 'out.m4a').read_bytes() == data
+    assert job.downloaded == size
+    assert not list(directory.glob('*.seg'))
+
+
+def test_server_without_range_raises_range_not_supported(media, serve):
+    directory, _ = media
+    _, url = serve(NoRangeHandler, directory)
+    with pytest.raises(RangeNotSupported):
+        probe_size(url, {})
+    with pytest.raises(RangeNotSupported):
+        download(url, directory / 'out.m4a', 6 * MiB, 2).run()
+    assert not (directory / 'out.m4a').exists()
+    assert not list(directory.glob('*.seg'))
+
+
+def test_dropped_connection_resumes_from_last_written_byte(media, serve):
+    directory, data = media
+    httpd, url = serve(DroppingHandler, directory)
+    requested = []
+
+    def opener(url, headers, start, end):
+        requested.append((start, end))
+        return open_range(url, headers, start, end)
+
+    job = download(url, directory / 'out.m4a', len(data), 2, opener=opener)
+    job.run()
+    assert httpd.dropped
+    assert job.segment_retries >= 1
+    assert (directory / 'out.m4a').read_bytes() == data
+    # Ponowienie zaczyna się w środku zakresu, nie od jego początku
+    starts = {start for start, _ in requested}
+    assert any(start not in (0, len(data) // 2) for start in starts)
+
+
+def test_steal_splits_largest_remaining_segment():
+    job = SegmentedDownload('http://unused', {}, '/nonexistent', 8 * MiB, 2)
+    job._segments = job.initial_segments()
+    first, second = job._segments
+    first.pos = first.end
+    second.pos = second.start + MiB
+    stolen = job.steal()
+    assert stolen is not None and job.splits == 1
+    assert second.end == stolen.start == second.pos + (4 * MiB - MiB) // 2
+    assert stolen.end == 8 * MiB
+
+    # Zbyt mała reszta nie jest dzielona
+    small = SegmentedDownload('http://unused', {}, '/nonexistent', 8 * MiB, 1)
+    small._segments = [Segment(0, ytwav_segments.SPLIT_MIN_SIZE)]
+    assert small.steal() is None
+
+
+def test_slow_connection_work_is_stolen(media, serve):
+    directory, data = media
+    _, url = serve(RangeHandler, directory)
+
+    class Slow:
+        def __init__(self, response):
+            self.response = response
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.response.close()
+
+        def read(self, amount):
+            time.sleep(0.05)
+            return self.response.read(amount)
+
+    def opener(url, headers, start, end):
+        response = open_range(url, headers, start, end)
+        return Slow(response) if start == 0 else response
+
+    job = download(url, directory / 'out.m4a', len(data), 2, opener=opener)
+    job.run()
+    assert job.splits >= 1
+    assert (directory / 'out.m4a').read_bytes() == data
+
+
+def test_cancel_from_progress_callback_removes_partial_file(media, serve):
+    directory, data = media
+    _, url = serve(type('Throttled', (RangeHandler,), {'rate': 2 * MiB}), directory)
+
+    class Cancelled(Exception):
+        pass
+
+    def cancel(done, total):
+        raise Cancelled
+
+    with pytest.raises(Cancelled):
+        download(url, directory / 'out.m4a', len(data), 2, on_progress=cancel).run()
+    assert not (directory / 'out.m4a').exists()
+    assert not list(directory.glob('*.seg'))
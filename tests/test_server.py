@@ -0,0 +1,73 @@
+"""Testy ochrony lokalnego API usługi przed zapytaniami z przeglądarki."""
+
+import http.client
+import json
+import threading
+
+import pytest
+
+from ytwav_server import DownloadService, make_server
+
+
+@pytest.fixture
+def api(tmp_path):
+    service = DownloadService(str(tmp_path / 'queue.sqlite'), output_root=str(tmp_path / 'root'))
+    httpd = make_server(service, port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+
+    def call(method, path, body=None, headers=None):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        data = json.loads(response.read() or b'null')
+        conn.close()
+        return response.status, data
+
+    yield call, service
+    httpd.shutdown()
+    httpd.server_close()
+    service.store.close()
+
+
+def post_jobs(call, options, headers=None):
+    body = json.dumps({'urls': ['https://youtu.be/dQw4w9WgXcQ'], 'options': options})
+    return call('POST', '/jobs', body, {'Content-Type': 'application/json', **(headers or {})})
+
+
+def test_simple_cross_origin_post_is_rejected(api):
+    call, service = api
+    body = json.dumps({'urls': ['https://youtu.be/dQw4w9WgXcQ']})
+    # Formularz/fetch bez preflight CORS: text/plain
+    assert call('POST', '/jobs', body, {'Content-Type': 'text/plain'})[0] == 415
+    assert post_jobs(call, {}, {'Origin': 'https://evil.example'})[0] == 403
+    assert post_jobs(call, {}, {'Origin': 'null'})[0] == 403
+    assert service.store.counts() == {}
+
+
+def test_foreign_host_header_is_rejected(api):
+    call, _ = api
+    # DNS rebinding: strona pod własną domeną wskazującą na 127.0.0.1
+    assert call('GET', '/health', headers={'Host': 'evil.example:8757'})[0] == 403
+    assert call('GET', '/health', headers={'Host': 'localhost:8757'})[0] == 200
+    assert call('GET', '/health', headers={'Origin': 'http://127.0.0.1:8757'})[0] == 200
+
+
+@pytest.mark.parametrize('out', ['wav_out', '../wav_out', 42, ['/tmp'], '/etc/ytwav', '{root}/../escape'])
+def test_output_outside_root_is_rejected(api, tmp_path, out):
+    call, service = api
+    if isinstance(out, str):
+        out = out.format(root=service.output_root)
+    status, data = post_jobs(call, {'out': out})
+    assert status == 400, data
+    assert 'out' in data['error']
+
+
+def test_output_dir_inside_root(tmp_path):
+    service = DownloadService(str(tmp_path / 'queue.sqlite'), output_root=str(tmp_path))
+    assert service.output_dir(None) == str(tmp_path.resolve() / 'wav_out')
+    assert service.output_dir(str(tmp_path / 'a' / '..' / 'b')) == str(tmp_path.resolve() / 'b')
+    (tmp_path / 'link').symlink_to('/')
+    with pytest.raises(ValueError):
+        service.output_dir(str(tmp_path / 'link' / 'etc'))
+    service.store.close()
@@ -0,0 +1,111 @@
+"""Testy magazynów SQLite: indeks treści audio i metryki sukcesu."""
+
+import sqlite3
+import threading
+import types
+
+import pytest
+
+import ytwav_store
+from ytwav_store import ContentIndex, SuccessMetrics
+
+
+def test_same_pcm_in_other_profile_is_not_a_duplicate(tmp_path):
+    index = ContentIndex(tmp_path / 'content.sqlite')
+    mono = tmp_path / 'mono.wav'
+    stereo = tmp_path / 'stereo.wav'
+    # Ta sama cisza: 16000 Hz mono i 8000 Hz stereo dają identyczne bajty PCM
+    mono.write_bytes(b'\0' * 64000)
+    stereo.write_bytes(b'\0' * 64000)
+
+    index.add('abc', '16000:1:16', mono)
+    assert index.lookup('abc', '8000:2:16') is None
+    index.add('abc', '8000:2:16', stereo)
+    # Wpis drugiego profilu nie nadpisuje pierwszego
+    assert index.lookup('abc', '16000:1:16') == mono
+    assert index.lookup('abc', '8000:2:16') == stereo
+
+
+def test_index_keyed_by_hash_alone_is_rebuilt(tmp_path):
+    db_path = tmp_path / 'content.sqlite'
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute("CREATE TABLE content (hash TEXT PRIMARY KEY, profile TEXT NOT NULL, "
+                     "path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+                     "added_at REAL NOT NULL)")
+        conn.execute("INSERT INTO content VALUES ('abc', '16000:1:16', '/x.wav', 1, 1, 0)")
+    conn.close()
+
+    index = ContentIndex(db_path)
+    assert index.lookup('abc', '16000:1:16') is None
+    path = tmp_path / 'a.wav'
+    path.write_bytes(b'data')
+    index.add('abc', '16000:1:16', path)
+    index.add('abc', '8000:2:16', path)
+    assert index.lookup('abc', '8000:2:16') == path
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Sterowany czas dla ytwav_store (time.time)."""
+    fake = types.SimpleNamespace(now=1_700_000_000.0)
+    monkeypatch.setattr(ytwav_store, 'time', types.SimpleNamespace(time=lambda: fake.now))
+    return fake
+
+
+def test_concurrent_records_from_two_connections_are_not_lost(tmp_path):
+    # Dwa obiekty na jednym pliku - jak dwa procesy (CLI i skrypt utrzymania)
+    stores = [SuccessMetrics(tmp_path / 'metrics.sqlite') for _ in range(2)]
+
+    def work(store, n):
+        for i in range(50):
+            store.record(i % 5 != 0, 'HTTP 403' if n % 2 else 'timeout')
+
+    threads = [threading.Thread(target=work, args=(stores[n % 2], n)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    totals = stores[0].totals()
+    assert totals['total_attempts'] == 400
+    assert totals['successful_downloads'] == 320
+    assert totals['error_types'] == {'HTTP 403': 40, 'timeout': 40}
+    assert totals['success_rate'] == pytest.approx(80.0)
+    # Jeden wiersz na (wynik, typ błędu), niezależnie od liczby zdarzeń
+    with sqlite3.connect(str(tmp_path / 'metrics.sqlite')) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM metric_totals").fetchone()[0] == 3
+    conn.close()
+
+
+def test_old_buckets_are_compacted_but_totals_stay(tmp_path, clock):
+    store = SuccessMetrics(tmp_path / 'metrics.sqlite', retention=3 * 3600, compact_interval=3600)
+    store.record(False, 'HTTP 429')
+    clock.now += 2 * 3600
+    store.record(True)
+    assert store.window(3600)['total_attempts'] == 1
+    assert store.window(24 * 3600)['total_attempts'] == 2
+
+    clock.now += 2 * 3600
+    store.record(True)
+    # Pierwszy kubełek jest starszy niż retention - usunięty przy okresowym porządkowaniu
+    assert store.window(24 * 3600)['total_attempts'] == 2
+    assert store.compact() == 0
+    totals = store.totals()
+    assert (totals['total_attempts'], totals['failed_downloads']) == (3, 1)
+    assert totals['error_types'] == {'HTTP 429': 1}
+    assert totals['last_updated'] == clock.now
+    assert set(store.stats()['windows']) == {'hour', 'day'}
+
+
+def test_legacy_totals_are_imported_with_untyped_failures(tmp_path):
+    store = SuccessMetrics(tmp_path / 'metrics.sqlite')
+    assert store.is_empty()
+    store.import_totals({'total_attempts': 10, 'successful_downloads': 6, 'failed_downloads': 4,
+                         'error_types': {'HTTP 403': 3}, 'success_rate': 60.0})
+    assert not store.is_empty()
+    totals = store.totals()
+    assert (totals['total_attempts'], totals['successful_downloads'], totals['failed_downloads']) == \
+        (10, 6, 4)
+    assert totals['error_types'] == {'HTTP 403': 3}
+    # Import nie dotyka okien czasowych - to nie są nowe zdarzenia
+    assert store.window(3600)['total_attempts'] == 0
@@ -0,0 +1,46 @@
+"""Testy bezpiecznika extractora współdzielonego przez wsady."""
+
+import pytest
+
+from ytwav_update import ExtractorBroken, ExtractorGuard
+
+
+def open_guard(updater=lambda: False) -> ExtractorGuard:
+    guard = ExtractorGuard(updater, threshold=2, cooldown=300, clock=lambda: 0.0)
+    for _ in range(2):
+        guard.release(False, guard.acquire())
+    return guard
+
+
+def test_reset_closes_breaker_when_idle():
+    guard = open_guard()
+    with pytest.raises(ExtractorBroken):
+        guard.acquire()
+    assert guard.reset()
+    assert guard.acquire() is False
+
+
+def test_reset_waits_for_urls_of_another_batch():
+    guard = open_guard()
+    guard.open = False
+    trial = guard.acquire()
+    guard.open = True
+    # URL innego wsadu jest w toku - stan bezpiecznika zostaje
+    assert not guard.reset()
+    assert guard.open
+    guard.release(None, trial)
+    assert guard.reset()
+
+
+def test_reset_keeps_successful_update_and_retries_failed_one():
+    guard = open_guard(updater=lambda: True)
+    guard.request_update()
+    assert guard.wait_update()
+    assert guard.reset()
+    assert guard.updated
+
+    failed = open_guard(updater=lambda: False)
+    failed.request_update()
+    assert not failed.wait_update()
+    assert failed.reset()
+    assert failed.update_state is None
@@ -0,0 +1,70 @@
+"""Testy rozpoznawania linków YouTube i usuwania duplikatów w loaderze URL-i."""
+
+import pytest
+
+from ytdl_wav import YTWavDownloader, canonical_url, parse_youtube_url
+
+VIDEO = 'dQw4w9WgXcQ'
+PLAYLIST = 'PLrAXtmErZgOeiKm4sgNOknGvNjby9efdf'
+
+
+@pytest.mark.parametrize('url, expected', [
+    (f'https://www.youtube.com/watch?v={VIDEO}', ('video', VIDEO)),
+    (f'https://youtu.be/{VIDEO}', ('video', VIDEO)),
+    (f'youtu.be/{VIDEO}?t=42', ('video', VIDEO)),
+    (f'https://m.youtube.com/watch?v={VIDEO}&feature=share', ('video', VIDEO)),
+    (f'https://music.youtube.com/watch?v={VIDEO}&si=abc', ('video', VIDEO)),
+    (f'https://WWW.YouTube.com/watch?v={VIDEO}', ('video', VIDEO)),
+    (f'https://www.youtube.com/shorts/{VIDEO}', ('video', VIDEO)),
+    (f'https://www.youtube.com/embed/{VIDEO}?start=10', ('video', VIDEO)),
+    (f'https://www.youtube-nocookie.com/embed/{VIDEO}', ('video', VIDEO)),
+    (f'https://www.youtube.com/live/{VIDEO}', ('video', VIDEO)),
+    # Film z parametrem list to film, nie playlista
+    (f'https://www.youtube.com/watch?v={VIDEO}&list={PLAYLIST}', ('video', VIDEO)),
+    (f'https://www.youtube.com/playlist?list={PLAYLIST}', ('playlist', PLAYLIST)),
+    (f'https://music.youtube.com/playlist?list={PLAYLIST}', ('playlist', PLAYLIST)),
+    (f'https://www.youtube.com/watch?list={PLAYLIST}', ('playlist', PLAYLIST)),
+    ('https://www.youtube.com/@LofiGirl', ('channel', '@LofiGirl/videos')),
+    ('https://www.youtube.com/@LofiGirl/streams', ('channel', '@LofiGirl/streams')),
+    ('https://www.youtube.com/channel/UCSJ4gkVC6NrvII8umztf0Ow/about',
+     ('channel', 'channel/UCSJ4gkVC6NrvII8umztf0Ow/videos')),
+])
+def test_youtube_links_are_recognised(url, expected):
+    assert parse_youtube_url(url) == expected
+
+
+@pytest.mark.parametrize('url', [
+    f'https://youtube.com.evil.tld/watch?v={VIDEO}',
+    f'https://evilyoutube.com/watch?v={VIDEO}',
+    f'https://youtu.be.evil.tld/{VIDEO}',
+    f'https://evil.tld/youtube.com/watch?v={VIDEO}',
+    f'https://evil.tld/?u=https://www.youtube.com/watch?v={VIDEO}',
+    f'ftp://www.youtube.com/watch?v={VIDEO}',
+    'https://www.youtube.com/watch?v=short',
+    f'https://www.youtube.com/watch?v={VIDEO}x',
+    'https://www.youtube.com/playlist?list=notaplaylist',
+    'https://www.youtube.com/feed/trending',
+    '',
+])
+def test_other_links_are_rejected(url):
+    assert parse_youtube_url(url) is None
+
+
+def test_duplicates_differing_only_in_parameters_are_dropped(tmp_path, monkeypatch):
+    monkeypatch.setenv('YTWAV_CACHE_DIR', str(tmp_path / 'cache'))
+    downloader = YTWavDownloader(output_dir=str(tmp_path / 'out'), use_cache=False, use_archive=False,
+                                 dedupe=False)
+    url_list = tmp_path / 'urls.txt'
+    url_list.write_text('\n'.join([
+        '# komentarz',
+        f'https://youtu.be/{VIDEO}?t=42',
+        f'https://m.youtube.com/watch?v={VIDEO}&feature=share',
+        f'https://music.youtube.com/watch?v={VIDEO}&list={PLAYLIST}&index=3',
+        f'https://www.youtube.com/shorts/{VIDEO}',
+        f'https://music.youtube.com/playlist?list={PLAYLIST}&si=x',
+        f'https://youtube.com.evil.tld/watch?v={VIDEO}',
+        '',
+    ]), encoding='utf-8')
+
+    urls = downloader.load_all_urls(f'https://www.youtube.com/watch?v={VIDEO}&pp=1', str(url_list))
+    assert urls == [canonical_url('video', VIDEO), canonical_url('playlist', PLAYLIST)]
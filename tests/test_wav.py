@@ -0,0 +1,94 @@
+"""Testy parsera nagłówków WAV/RF64 i weryfikacji wyjść względem profili."""
+
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+from ytdl_wav import WAVE_FORMAT_EXTENSIBLE, WAVE_FORMAT_PCM, YTWavDownloader, read_wav_header
+
+# GUID KSDATAFORMAT_SUBTYPE_PCM bez pierwszych 2 bajtów (identyfikatora formatu)
+PCM_GUID_TAIL = b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+
+
+def fmt_chunk(sr: int, ch: int, bits: int, extensible: bool = False) -> bytes:
+    block_align = ch * bits // 8
+    fields = struct.pack('<HHIIHH', WAVE_FORMAT_EXTENSIBLE if extensible else WAVE_FORMAT_PCM,
+                         ch, sr, sr * block_align, block_align, bits)
+    if extensible:
+        fields += struct.pack('<HHI', 22, bits, 0) + struct.pack('<H', WAVE_FORMAT_PCM) + PCM_GUID_TAIL
+    return b'fmt ' + struct.pack('<I', len(fields)) + fields
+
+
+def riff_wav(sr: int, ch: int, bits: int, frames: int, extensible: bool = False) -> bytes:
+    data = b'\0' * (frames * ch * bits // 8)
+    body = b'WAVE' + fmt_chunk(sr, ch, bits, extensible) + b'data' + struct.pack('<I', len(data)) + data
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def rf64_wav(sr: int, ch: int, bits: int, frames: int) -> bytes:
+    data = b'\0' * (frames * ch * bits // 8)
+    fmt = fmt_chunk(sr, ch, bits)
+    riff_size = 4 + (8 + 28) + len(fmt) + 8 + len(data)
+    ds64 = b'ds64' + struct.pack('<I', 28) + struct.pack('<QQQI', riff_size, len(data), frames, 0)
+    # W RF64 pola 32-bitowe mają wartość 0xFFFFFFFF, prawdziwe rozmiary są w ds64
+    return (b'RF64' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE' + ds64 + fmt
+            + b'data' + struct.pack('<I', 0xFFFFFFFF) + data)
+
+
+@pytest.mark.parametrize('data, expected', [
+    (riff_wav(48000, 2, 16, 100), ('RIFF', 48000, 2, 16, 4, 100)),
+    (riff_wav(44100, 2, 24, 100, extensible=True), ('RIFF', 44100, 2, 24, 6, 100)),
+    (riff_wav(16000, 1, 24, 7), ('RIFF', 16000, 1, 24, 3, 7)),
+    (rf64_wav(48000, 2, 24, 50), ('RF64', 48000, 2, 24, 6, 50)),
+])
+def test_header_is_parsed(tmp_path, data, expected):
+    path = tmp_path / 'a.wav'
+    path.write_bytes(data)
+    header = read_wav_header(path)
+    assert header['format'] == WAVE_FORMAT_PCM
+    assert (header['container'], header['sample_rate'], header['channels'], header['bits'],
+            header['block_align'], header['frames']) == expected
+
+
+@pytest.mark.parametrize('data', [
+    riff_wav(48000, 2, 16, 100)[:-10],             # ucięty plik
+    riff_wav(48000, 2, 24, 100)[:-3],              # dane nie są wielokrotnością ramki
+    rf64_wav(48000, 2, 16, 10).replace(b'ds64', b'junk'),
+    b'RIFX' + riff_wav(48000, 2, 16, 1)[4:],
+])
+def test_damaged_header_is_rejected(tmp_path, data):
+    path = tmp_path / 'a.wav'
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        read_wav_header(path)
+
+
+def test_verify_outputs_reports_profile_mismatch(tmp_path, monkeypatch):
+    monkeypatch.setenv('YTWAV_CACHE_DIR', str(tmp_path / 'cache'))
+    downloader = YTWavDownloader(output_dir=str(tmp_path / 'out'), use_cache=False, use_archive=False,
+                                 profiles=[(48000, 2, 24), (16000, 1, 16)])
+    good24, good16 = tmp_path / 'a.wav', tmp_path / 'b.wav'
+    good24.write_bytes(rf64_wav(48000, 2, 24, 10))
+    good16.write_bytes(riff_wav(16000, 1, 16, 10))
+    assert downloader.verify_outputs([good24, good16]) is None
+
+    # 16 bitów zamiast 24 - np. FFmpeg bez pcm_s24le
+    good24.write_bytes(riff_wav(48000, 2, 16, 10))
+    problem = downloader.verify_outputs([good24, good16])
+    assert problem.startswith('a.wav') and '(1, 48000, 2, 24, 6)' in problem
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="brak ffmpeg")
+def test_24_bit_conversion_writes_packed_samples(tmp_path, monkeypatch):
+    monkeypatch.setenv('YTWAV_CACHE_DIR', str(tmp_path / 'cache'))
+    downloader = YTWavDownloader(output_dir=str(tmp_path / 'out'), use_cache=False, use_archive=False,
+                                 sample_rate=44100, channels=2, bit_depth=24, dedupe=False)
+    source = downloader.output_dir / 'a.flac'
+    subprocess.run(['ffmpeg', '-nostdin', '-loglevel', 'error', '-f', 'lavfi',
+                    '-i', 'sine=frequency=440:duration=1', '-c:a', 'flac', str(source)], check=True)
+    header = read_wav_header(downloader.transcode(source, duration=1))
+    assert (header['sample_rate'], header['channels'], header['bits'], header['block_align']) == \
+        (44100, 2, 24, 6)
+    assert header['frames'] == 44100
@@ -12,20 +12,336 @@ Licencja: MIT
 """
 
 import argparse
+import copy
+import importlib.util
+import json
 import os
 import sys
 import subprocess
-import shutil
 import logging
+import tempfile
+import queue
+import re
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, List
 from datetime import datetime
+from urllib.parse import urlparse, parse_qs
 
-try:
-    import yt_dlp
-except ImportError:
-    print("Błąd: Brak modułu yt-dlp. Zainstaluj: pip install yt-dlp")
-    sys.exit(1)
+from ytwav_store import MetadataCache, DownloadArchive, ContentIndex, BatchJournal
+from ytwav_net import RETRY_POLICIES, BackoffPolicy, RateLimiter, classify_error, get_rate_limiter
+from ytwav_metrics import MetricsRecorder, UrlMetrics, timed
+from ytwav_caps import get_capabilities
+from ytwav_sched import ORDERS, DiskBudget, estimate_output_size, format_size, order_jobs, parse_size
+from ytwav_update import WAIT_POLL_INTERVAL, WORKER_SCRIPT, ExtractorBroken, ExtractorGuard
+from ytwav_segments import (DEFAULT_CONNECTIONS, SEGMENTED_SUPPORTED, RangeNotSupported, SegmentError,
+                            SegmentedDownload, plan_connections, probe_size)
+
+# yt-dlp ładuje się kilkaset ms - importowany dopiero przy pierwszym użyciu,
+# więc --help, błędne argumenty czy okno GUI nie czekają na niego
+yt_dlp = None
+
+
+def load_yt_dlp():
+    """Importuje yt-dlp przy pierwszym użyciu i zwraca moduł."""
+    global yt_dlp
+    if yt_dlp is None:
+        import yt_dlp as module
+        yt_dlp = module
+    return yt_dlp
+
+
+def has_yt_dlp() -> bool:
+    """Czy yt-dlp jest zainstalowany (bez importowania go)."""
+    return importlib.util.find_spec('yt_dlp') is not None
+
+
+# Rozmiar porcji danych przekazywanych do FFmpeg w trybie strumieniowym
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Rotacja User-Agent dla kolejnych prób pobrania
+USER_AGENT_SUFFIXES = ['', ' Edg/120.0.0.0', ' Firefox/120.0', ' Safari/537.36', ' Chrome/120.0.0.0']
+
+# WAV mniejszy niż to (sam nagłówek) oznacza, że FFmpeg nic nie zdekodował
+MIN_WAV_SIZE = 4096
+
+# Głębia bitowa -> (enkoder FFmpeg, format próbek na wejściu enkodera)
+PCM_FORMATS = {
+    16: ('pcm_s16le', 's16'),
+    24: ('pcm_s24le', 's32'),  # Upakowane 3 bajty na próbkę (enkoder przyjmuje s32)
+}
+
+# Pola rozmiaru w nagłówku RIFF są 32-bitowe - większe pliki wymagają RF64
+WAV_SIZE_LIMIT = 0xFFFFFFFF
+# Zapas na niedokładną długość z metadanych (zaokrąglone sekundy, dopełnienie)
+WAV_SIZE_MARGIN = 1.05
+# ioctl FICLONE (Linux) - kopia copy-on-write współdzieląca bloki na dysku
+FICLONE = 0x40049409
+# Identyfikatory formatu w chunku fmt: PCM i WAVE_FORMAT_EXTENSIBLE
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+# ID filmu YouTube: 11 znaków z alfabetu base64url
+VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+# ID playlisty: znany prefiks (PL, UU, OLAK5uy_, RD...) + base64url
+PLAYLIST_ID_RE = re.compile(r'^(?:PL|UU|LL|FL|RD|OL|UL|EL)[0-9A-Za-z_-]{10,}$')
+# Ścieżki z ID filmu w drugim segmencie: /shorts/ID, /embed/ID, ...
+VIDEO_PATH_PREFIXES = ('shorts', 'embed', 'live', 'v', 'e')
+# Kanały: /channel/UC..., /@nazwa, /c/nazwa, /user/nazwa (+ opcjonalna zakładka)
+CHANNEL_ID_RE = re.compile(r'^UC[0-9A-Za-z_-]{22}$')
+CHANNEL_HANDLE_RE = re.compile(r'^@[\w.-]{3,100}$')
+CHANNEL_NAME_RE = re.compile(r'^[\w.-]{1,100}$')
+CHANNEL_TABS = ('videos', 'streams', 'shorts')
+
+
+class TranscodeError(Exception):
+    """Błąd konwersji FFmpeg - ponawianie pobierania tego nie naprawi."""
+
+
+class DownloadCancelled(Exception):
+    """Pobieranie przerwane na żądanie użytkownika."""
+
+
+def parse_youtube_url(url: str) -> Optional[tuple]:
+    """Rozpoznaje link YouTube bez zapytań sieciowych.
+    
+    Zwraca ('video', ID), ('playlist', ID) albo ('channel', ścieżka
+    z zakładką, np. '@nazwa/videos'), a None dla linków spoza YouTube
+    (host porównywany dokładnie, nie jako podciąg) lub z nieprawidłowym ID.
+    Link do filmu z parametrem `list` to film.
+    """
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https'):
+        return None
+    host = (parsed.hostname or '').lower()
+    query = parse_qs(parsed.query)
+    parts = parsed.path.strip('/').split('/')
+    
+    video_id = None
+    if host == 'youtu.be':
+        video_id = parts[0]
+    elif host in ('youtube.com', 'youtube-nocookie.com') or host.endswith(('.youtube.com', '.youtube-nocookie.com')):
+        if parts[0] == 'watch':
+            video_id = (query.get('v') or [None])[0]
+        elif len(parts) >= 2 and parts[0] in VIDEO_PATH_PREFIXES:
+            video_id = parts[1]
+        if video_id is None and parts[0] in ('watch', 'playlist'):
+            playlist_id = (query.get('list') or [None])[0]
+            if playlist_id and PLAYLIST_ID_RE.match(playlist_id):
+                return ('playlist', playlist_id)
+        if video_id is None:
+            channel = parse_channel_path(parts)
+            if channel:
+                return ('channel', channel)
+    else:
+        return None
+    
+    if video_id and VIDEO_ID_RE.match(video_id):
+        return ('video', video_id)
+    return None
+
+
+def parse_channel_path(parts: List[str]) -> Optional[str]:
+    """Ścieżka kanału z zakładką ('channel/UC.../videos') albo None."""
+    if parts[0].startswith('@') and CHANNEL_HANDLE_RE.match(parts[0]):
+        base, rest = parts[0], parts[1:]
+    elif len(parts) >= 2 and parts[0] == 'channel' and CHANNEL_ID_RE.match(parts[1]):
+        base, rest = f"channel/{parts[1]}", parts[2:]
+    elif len(parts) >= 2 and parts[0] in ('c', 'user') and CHANNEL_NAME_RE.match(parts[1]):
+        base, rest = f"{parts[0]}/{parts[1]}", parts[2:]
+    else:
+        return None
+    tab = rest[0] if rest and rest[0] in CHANNEL_TABS else 'videos'
+    return f"{base}/{tab}"
+
+
+def parse_item_ranges(spec: str) -> List[tuple]:
+    """Parsuje wybór pozycji playlisty, np. "1-50,60,100-" -> [(1, 50), (60, 60), (100, None)]."""
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        match = re.fullmatch(r'(\d+)(?:(-)(\d*))?', part)
+        if not match or int(match.group(1)) < 1:
+            raise ValueError(f"Nieprawidłowy zakres pozycji: {part!r}")
+        start = int(match.group(1))
+        if match.group(2) is None:
+            end = start
+        else:
+            end = int(match.group(3)) if match.group(3) else None
+        if end is not None and end < start:
+            raise ValueError(f"Nieprawidłowy zakres pozycji: {part!r}")
+        ranges.append((start, end))
+    return ranges
+
+
+def parse_profiles(spec: str) -> List[tuple]:
+    """Parsuje profile wyjściowe, np. "48000:2:16,16000:1:16" -> [(48000, 2, 16), (16000, 1, 16)]."""
+    profiles = []
+    for part in spec.split(','):
+        match = re.fullmatch(r'(\d+):([12]):(16|24)', part.strip())
+        if not match or not 8000 <= int(match.group(1)) <= 384000:
+            raise ValueError(f"Nieprawidłowy profil wyjściowy: {part.strip()!r} (format: sr:ch:bit)")
+        profile = tuple(int(value) for value in match.groups())
+        if profile not in profiles:
+            profiles.append(profile)
+    return profiles
+
+
+def positive_float(value: str) -> float:
+    """Typ argparse dla liczb większych od zera (np. --rate)."""
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"nieprawidłowa liczba: {value!r}")
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"wartość musi być większa od zera: {value!r}")
+    return number
+
+
+def positive_int(value: str) -> int:
+    """Typ argparse dla liczb całkowitych większych od zera (np. --jobs)."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"nieprawidłowa liczba całkowita: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"wartość musi być większa od zera: {value!r}")
+    return number
+
+
+def profile_requirements(profiles: List[tuple]) -> List[tuple]:
+    """Pary (enkoder, format próbek), których FFmpeg potrzebuje dla profili."""
+    return list(dict.fromkeys(PCM_FORMATS[bit] for _, _, bit in profiles if bit in PCM_FORMATS))
+
+
+def profile_label(sample_rate: int, channels: int, bit_depth: int) -> str:
+    """Nazwa podkatalogu profilu przy wielu profilach, np. "48000Hz_2ch_16bit"."""
+    return f"{sample_rate}Hz_{channels}ch_{bit_depth}bit"
+
+
+def canonical_url(kind: str, item_id: str) -> str:
+    """Kanoniczny link dla wyniku `parse_youtube_url`."""
+    if kind == 'playlist':
+        return f"https://www.youtube.com/playlist?list={item_id}"
+    if kind == 'channel':
+        return f"https://www.youtube.com/{item_id}"
+    return f"https://www.youtube.com/watch?v={item_id}"
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    """Wyciąga kanoniczne ID filmu z URL-a YouTube bez zapytań sieciowych."""
+    parsed = parse_youtube_url(url)
+    if parsed and parsed[0] == 'video':
+        return parsed[1]
+    return None
+
+
+def escape_tee_path(path: Path) -> str:
+    """Escapuje ścieżkę dla specyfikacji muxera `tee` FFmpeg (znaki \\ ' | [ ] :)."""
+    return re.sub(r"([\\'|\[\]:])", r"\\\1", str(path))
+
+
+def reflink(source: Path, target: Path):
+    """Tworzy `target` jako kopię copy-on-write `source` (APFS/Btrfs/XFS). Rzuca OSError."""
+    if sys.platform == 'darwin':
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(source), os.fsencode(target), 0) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return
+    try:
+        import fcntl
+    except ImportError as e:
+        raise OSError("reflink niedostępny na tej platformie") from e
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            target.unlink(missing_ok=True)
+            raise
+
+
+def link_file(existing: Path, target: Path) -> Optional[str]:
+    """Zastępuje `target` dowiązaniem do `existing` (atomowo przez plik tymczasowy).
+    
+    Najpierw reflink (niezależne pliki, wspólne bloki), potem hardlink
+    (ten sam i-węzeł). Zwraca użytą metodę albo None, gdy żadna nie
+    zadziałała (np. inny system plików) - wtedy `target` zostaje bez zmian.
+    """
+    temp = target.with_name(target.name + '.link')
+    for method, make in (('reflink', reflink), ('hardlink', os.link)):
+        temp.unlink(missing_ok=True)
+        try:
+            make(existing, temp)
+        except OSError:
+            continue
+        os.replace(temp, target)
+        return method
+    temp.unlink(missing_ok=True)
+    return None
+
+
+def read_wav_header(path: Path) -> dict:
+    """Czyta nagłówek WAV/RF64 i sprawdza jego spójność z rozmiarem pliku.
+    
+    Zwraca {'container', 'format', 'sample_rate', 'channels', 'bits',
+    'block_align', 'data_size', 'frames'}. Rzuca ValueError, gdy nagłówek
+    jest uszkodzony albo deklarowane rozmiary nie zgadzają się z plikiem.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        container, riff_size, wave = struct.unpack('<4sI4s', f.read(12))
+        if container not in (b'RIFF', b'RF64') or wave != b'WAVE':
+            raise ValueError("Brak nagłówka RIFF/RF64 WAVE")
+        header = {'container': container.decode('ascii')}
+        ds64 = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise ValueError("Brak chunka data")
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk)
+            if chunk_id == b'ds64':
+                ds64 = struct.unpack('<QQ', f.read(16))
+                f.seek(chunk_size - 16, os.SEEK_CUR)
+            elif chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                tag, channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    # Podformat to pierwsze 2 bajty GUID-u KSDATAFORMAT_SUBTYPE_*
+                    tag = struct.unpack('<H', fmt[24:26])[0]
+                header.update(format=tag, sample_rate=sample_rate, channels=channels,
+                              bits=bits, block_align=block_align)
+            elif chunk_id == b'data':
+                data_offset = f.tell()
+                break
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+    
+    if 'format' not in header:
+        raise ValueError("Brak chunka fmt")
+    if container == b'RF64':
+        if ds64 is None:
+            raise ValueError("Plik RF64 bez chunka ds64")
+        riff_size, data_size = ds64
+    else:
+        data_size = chunk_size
+    if riff_size + 8 != file_size:
+        raise ValueError(f"Rozmiar w nagłówku ({riff_size + 8} B) różni się od pliku ({file_size} B)")
+    if data_offset + data_size > file_size:
+        raise ValueError("Chunk data wykracza poza koniec pliku")
+    if not header['block_align'] or data_size % header['block_align']:
+        raise ValueError("Rozmiar danych nie jest wielokrotnością ramki próbek")
+    header.update(data_size=data_size, frames=data_size // header['block_align'])
+    return header
 
 
 class YTWavDownloader:
@@ -33,15 +349,56 @@ class YTWavDownloader:
     
     def __init__(self, output_dir: str = "wav_out", sample_rate: int = 48000, 
                  channels: int = 2, bit_depth: int = 16, keep_source: bool = False,
-                 retries: int = 5):
+                 retries: int = 5, stream: bool = False, use_cache: bool = True,
+                 use_archive: bool = True, archive_path: Optional[str] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 metrics: Optional[MetricsRecorder] = None,
+                 profiles: Optional[List[tuple]] = None, dedupe: bool = True,
+                 connections: int = DEFAULT_CONNECTIONS):
         self.output_dir = Path(output_dir)
-        self.sample_rate = sample_rate
-        self.channels = channels
-        self.bit_depth = bit_depth
+        # Profile wyjściowe (sr, ch, bit) - jedno pobranie i jedno dekodowanie na wszystkie;
+        # pierwszy profil jest główny (hinty, wynik zwracany przez transcode)
+        self.profiles = list(profiles) if profiles else [(sample_rate, channels, bit_depth)]
+        self.sample_rate, self.channels, self.bit_depth = self.profiles[0]
         self.keep_source = keep_source
         self.retries = retries
+        self.stream = stream
+        # Maks. liczba równoległych połączeń (zakresów bajtów) na długi plik; 1 - wyłączone
+        self.connections = max(1, connections)
+        self.metadata_cache = MetadataCache() if use_cache else None
+        
+        # Wspólne dla procesu tempo zapytań + backoff dla błędów przejściowych
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.retry_backoff = BackoffPolicy(base=1.0, cap=15.0)
+        # Czasy etapów, przepustowość i ponowienia dla każdego URL-a
+        self.metrics = metrics or MetricsRecorder()
         self.output_dir.mkdir(exist_ok=True)
         
+        # Archiwum ukończonych pobrań (ID filmu + profil wyjściowy)
+        self.archive = None
+        if use_archive:
+            self.archive = DownloadArchive(
+                Path(archive_path) if archive_path else self.output_dir / '.ytwav_archive.sqlite'
+            )
+        # Wynik sprawdzenia FFmpeg względem profili (liczony raz)
+        self._toolchain_ok = None
+        # Długości filmów z płaskiej ekstrakcji playlist (bez dodatkowych zapytań)
+        self.duration_hints = {}
+        # Indeks treści (SHA-256 PCM) - duplikaty stają się dowiązaniami
+        self.content_index = ContentIndex(self.output_dir / '.ytwav_content.sqlite') if dedupe else None
+        # Dziennik wsadów (tworzony przy pierwszym wsadzie)
+        self.journal = None
+        # Aktualizacja yt-dlp w tle (raz na wsad) i bezpiecznik extractora
+        self.extractor_guard = ExtractorGuard(self.auto_update_ytdlp)
+        
+        # Ciepłe sesje yt-dlp: (wątek, profil) -> YoutubeDL oraz cache zbudowanych opcji
+        self._sessions = {}
+        self._opts_cache = {}
+        self._sessions_lock = threading.Lock()
+        
+        # Callback postępu, flaga anulowania i pomiary bieżącego zadania (osobno dla wątku)
+        self._job = threading.local()
+        
         # Konfiguracja loggingu
         self.setup_logging()
         
@@ -64,17 +421,40 @@ class YTWavDownloader:
         
         if self.channels == 1:
             self.logger.info("Wymuszasz mono audio (1 kanał)")
+        
+        if self.stream and self.keep_source:
+            self.logger.warning("Tryb strumieniowy nie zapisuje pliku źródłowego - ignoruję --stream przy --keep-src")
             
-        self.logger.info(f"Konfiguracja: {self.sample_rate}Hz, {self.channels}ch, {self.bit_depth}bit")
+        if len(self.profiles) > 1:
+            labels = ', '.join(f"{sr}Hz/{ch}ch/{bit}bit" for sr, ch, bit in self.profiles)
+            self.logger.info(f"Konfiguracja: {len(self.profiles)} profile z jednego pobrania: {labels}")
+        else:
+            self.logger.info(f"Konfiguracja: {self.sample_rate}Hz, {self.channels}ch, {self.bit_depth}bit")
         
     def check_ffmpeg(self) -> bool:
-        """Sprawdza czy ffmpeg jest dostępny w systemie."""
-        if not shutil.which("ffmpeg"):
+        """Sprawdza czy ffmpeg jest dostępny i obsługuje wybrane profile.
+        
+        Korzysta ze wspólnego rejestru możliwości (sondowanie raz na wersję
+        binarki), a wynik zapamiętuje - kolejne wywołania nic nie kosztują.
+        """
+        if self._toolchain_ok is not None:
+            return self._toolchain_ok
+        capabilities = get_capabilities()
+        problems = capabilities.missing(profile_requirements(self.profiles), muxers=['wav'])
+        if problems == ['ffmpeg']:
             self.logger.error("FFmpeg nie jest zainstalowany lub niedostępny w PATH")
             self.logger.error("Instrukcje instalacji:")
             self.logger.error("  macOS: brew install ffmpeg")
-            return False
-        return True
+        elif capabilities.get()['ffmpeg'] is None:
+            self.logger.error(f"FFmpeg jest w PATH, ale nie odpowiada - brak: {', '.join(problems)}")
+        elif problems:
+            version = capabilities.get()['ffmpeg']['version']
+            self.logger.error(f"FFmpeg nie obsługuje wybranych profili - brak: {', '.join(problems)} ({version})")
+        elif self.content_index is not None and capabilities.missing([], muxers=['tee', 'hash']):
+            self.logger.warning("FFmpeg bez muxerów tee/hash - deduplikacja treści wyłączona")
+            self.content_index = None
+        self._toolchain_ok = not problems
+        return self._toolchain_ok
     
     def auto_update_ytdlp(self) -> bool:
         """Automatycznie aktualizuje yt-dlp do najnowszej wersji."""
@@ -83,7 +463,7 @@ class YTWavDownloader:
             import subprocess
             result = subprocess.run([
                 sys.executable, '-m', 'pip', 'install', '--upgrade', 'yt-dlp'
-            ], capture_output=True, text=True, timeout=60)
+            ], capture_output=True, text=True, timeout=300)
             
             if result.returncode == 0:
                 self.logger.info("yt-dlp zaktualizowany pomyślnie!")
@@ -96,7 +476,7 @@ class YTWavDownloader:
             return False
     
     def load_urls_from_file(self, file_path: Path) -> List[str]:
-        """Ładuje URL-e z pliku tekstowego."""
+        """Ładuje URL-e z pliku tekstowego (w postaci kanonicznej)."""
         urls = []
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
@@ -104,8 +484,9 @@ class YTWavDownloader:
                     line = line.strip()
                     # Pomijaj puste linie i komentarze
                     if line and not line.startswith('#'):
-                        if self.is_valid_youtube_url(line):
-                            urls.append(line)
+                        parsed = parse_youtube_url(line)
+                        if parsed:
+                            urls.append(canonical_url(*parsed))
                         else:
                             self.logger.warning(f"Linia {line_num}: Nieprawidłowy URL YouTube: {line}")
             self.logger.info(f"Załadowano {len(urls)} URL-ów z pliku {file_path}")
@@ -116,13 +497,19 @@ class YTWavDownloader:
         return urls
     
     def load_all_urls(self, single_url: Optional[str], list_file: Optional[str]) -> List[str]:
-        """Jednolity loader URL-ów - łączy single URL + --list."""
+        """Jednolity loader URL-ów - łączy single URL + --list.
+        
+        Zwraca kanoniczne linki bez duplikatów (ten sam film jako youtu.be,
+        m.youtube.com czy z parametrem &t= to jedno zadanie), w kolejności
+        pierwszego wystąpienia.
+        """
         urls = []
         
         # Załaduj z pojedynczego URL
         if single_url:
-            if self.is_valid_youtube_url(single_url):
-                urls.append(single_url)
+            parsed = parse_youtube_url(single_url)
+            if parsed:
+                urls.append(canonical_url(*parsed))
             else:
                 self.logger.error(f"Nieprawidłowy URL YouTube: {single_url}")
         
@@ -131,46 +518,43 @@ class YTWavDownloader:
             file_urls = self.load_urls_from_file(list_file)
             urls.extend(file_urls)
         
-        return urls
+        # Kanoniczne linki - duplikaty są identycznymi napisami
+        unique = list(dict.fromkeys(urls))
+        if len(unique) < len(urls):
+            self.logger.info(f"Pominięto {len(urls) - len(unique)} zduplikowanych URL-ów")
+        return unique
     
     def is_valid_youtube_url(self, url: str) -> bool:
-        """Sprawdza czy URL jest prawidłowym linkiem YouTube."""
-        youtube_domains = ['youtube.com', 'youtu.be', 'm.youtube.com', 'www.youtube.com']
-        return any(domain in url for domain in youtube_domains)
+        """Sprawdza czy URL jest prawidłowym linkiem YouTube (film, playlista lub kanał)."""
+        return parse_youtube_url(url) is not None
     
     def build_opts(self, out_dir: Path, sr: int, ch: int, bit: int, 
-                   keep_src: bool, retries: int) -> dict:
-        """Buduje opcje konfiguracyjne dla yt-dlp."""
-        # Określenie formatu sample dla FFmpeg
-        if bit == 16:
-            sample_fmt = "s16"
-        elif bit == 24:
-            sample_fmt = "s32"  # FFmpeg bezpieczny 24-bit PCM w kontenerze WAV
-        else:
-            raise ValueError(f"Nieobsługiwana głębia bitowa: {bit}")
+                   keep_src: bool, retries: int, profiles: Optional[List[tuple]] = None) -> dict:
+        """Buduje opcje konfiguracyjne dla yt-dlp (tylko etap pobierania).
+        
+        Konwersja do WAV nie jest już postprocesorem yt-dlp - wykonuje ją
+        osobny etap `transcode`, dzięki czemu pobieranie kolejnego pliku nie
+        czeka na zakończenie konwersji poprzedniego. `profiles` to lista
+        (sr, ch, bit) zastępująca pojedynczy profil - źródło jest pobierane
+        raz niezależnie od liczby profili.
+        """
+        # Walidacja parametrów konwersji już na etapie budowania opcji
+        for profile in profiles or [(sr, ch, bit)]:
+            self.build_ffmpeg_args(*profile)
         
         opts = {
             'format': 'bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best[height<=720]',
             'outtmpl': str(out_dir / '%(title).200B.%(ext)s'),
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'wav',
-                'preferredquality': '0'
-            }],
-            'postprocessor_args': [
-                '-ar', str(sr),
-                '-ac', str(ch),
-                '-sample_fmt', sample_fmt
-            ],
             'retries': retries,
             'fragment_retries': retries,
+            'continuedl': True,  # Wznawiaj niedokończone pliki .part
+            'noplaylist': True,  # watch?v=ID&list=... to jeden film, nie cała playlista
             'ignoreerrors': 'only_download',
             'windowsfilenames': True,
             'consoletitle': True,
             'noprogress': False,
             'no_warnings': False,  # Włączam ostrzeżenia aby zobaczyć co się dzieje
-            'sleep_interval': 1,  # Opóźnienie między requestami
-            'max_sleep_interval': 5,  # Maksymalne opóźnienie
+            # Tempo zapytań kontroluje wspólny RateLimiter, nie stałe pauzy yt-dlp
             'sleep_interval_subtitles': 0,
             'extractor_retries': 3,  # Dodatkowe próby dla extractora
             'http_headers': {
@@ -184,12 +568,23 @@ class YTWavDownloader:
             }
         }
         
-        # Zachowaj plik źródłowy jeśli wymagane
-        if not keep_src:
-            opts['keepvideo'] = False
-            
         return opts
     
+    def build_ffmpeg_args(self, sr: int, ch: int, bit: int) -> List[str]:
+        """Buduje argumenty wyjściowe FFmpeg dla konwersji do WAV PCM."""
+        # Określenie formatu sample dla FFmpeg
+        if bit not in PCM_FORMATS:
+            raise ValueError(f"Nieobsługiwana głębia bitowa: {bit}")
+        codec, sample_fmt = PCM_FORMATS[bit]
+        
+        return [
+            '-vn',
+            '-c:a', codec,
+            '-ar', str(sr),
+            '-ac', str(ch),
+            '-sample_fmt', sample_fmt
+        ]
+    
     def sanitize_filename(self, filename: str) -> str:
         """Czyści nazwę pliku z niedozwolonych znaków."""
         invalid_chars = '<>:"/\\|?*'
@@ -197,101 +592,1302 @@ class YTWavDownloader:
             filename = filename.replace(char, '_')
         return filename[:200]  # Ograniczenie długości
     
-    def download_audio(self, url: str, output_filename: Optional[str] = None) -> bool:
-        """Pobiera audio z YouTube i konwertuje do WAV PCM z inteligentnym retry."""
+    def profile_opts(self, profile: str) -> dict:
+        """Zwraca (z cache) bazowe opcje yt-dlp dla danego profilu.
         
-        if not self.check_ffmpeg():
-            return False
+        Profile: 'download' - pobieranie audio, 'info' - same metadane,
+        'flat' - płaskie (leniwe) rozwijanie playlist i kanałów.
+        Klucz cache zawiera bieżące ustawienia, więc zmiana np. sample rate
+        automatycznie tworzy nowy profil.
+        """
+        key = (profile, str(self.output_dir), tuple(self.profiles), self.keep_source, self.retries)
+        with self._sessions_lock:
+            opts = self._opts_cache.get(key)
+            if opts is None:
+                if profile == 'download':
+                    opts = self.build_opts(
+                        out_dir=self.output_dir,
+                        sr=self.sample_rate,
+                        ch=self.channels,
+                        bit=self.bit_depth,
+                        keep_src=self.keep_source,
+                        retries=self.retries,
+                        profiles=self.profiles
+                    )
+                elif profile == 'info':
+                    opts = {
+                        'quiet': True,
+                        'no_warnings': True,
+                    }
+                elif profile == 'flat':
+                    opts = {
+                        'quiet': True,
+                        'no_warnings': True,
+                        'extract_flat': 'in_playlist',
+                        'lazy_playlist': True,
+                    }
+                else:
+                    raise ValueError(f"Nieznany profil opcji: {profile}")
+                self._opts_cache[key] = opts
+            return key, opts
+    
+    def get_session(self, profile: str = 'download') -> 'yt_dlp.YoutubeDL':
+        """Zwraca ciepłą instancję YoutubeDL dla profilu (osobną dla każdego wątku).
         
-        # Różne strategie retry przeciwko blokowaniu - zoptymalizowane na podstawie obserwacji
-        retry_strategies = [
-            {'sleep_interval': 2, 'user_agent_suffix': ''},
-            {'sleep_interval': 5, 'user_agent_suffix': ' Edg/120.0.0.0'},
-            {'sleep_interval': 8, 'user_agent_suffix': ' Firefox/120.0'},
-            {'sleep_interval': 12, 'user_agent_suffix': ' Safari/537.36'},
-            {'sleep_interval': 15, 'user_agent_suffix': ' Chrome/120.0.0.0'},
-        ]
+        Instancja jest tworzona raz i używana ponownie dla kolejnych URL-i,
+        dzięki czemu połączenia HTTP i stan extractorów nie są odtwarzane.
+        YoutubeDL nie jest bezpieczny wątkowo, stąd klucz zawiera id wątku.
+        """
+        key, opts = self.profile_opts(profile)
+        session_key = (threading.get_ident(), key)
+        with self._sessions_lock:
+            ydl = self._sessions.get(session_key)
+        if ydl is None:
+            started = time.perf_counter()
+            load_yt_dlp()
+            ydl = yt_dlp.YoutubeDL(copy.deepcopy(opts))
+            ydl.add_progress_hook(self._progress_hook)
+            ydl.add_postprocessor_hook(self._postprocessor_hook)
+            self._capture_errors(ydl)
+            self.logger.debug(f"Nowa sesja yt-dlp ({profile}) w {time.perf_counter() - started:.3f}s")
+            with self._sessions_lock:
+                self._sessions[session_key] = ydl
+        return ydl
+    
+    def _capture_errors(self, ydl: 'yt_dlp.YoutubeDL'):
+        """Zapamiętuje ostatni błąd zgłoszony przez sesję.
+        
+        Przy ignoreerrors yt-dlp tylko wypisuje błąd extractora i zwraca
+        None - bez jego treści nie da się sklasyfikować porażki.
+        """
+        report_error = ydl.report_error
         
-        for attempt, strategy in enumerate(retry_strategies, 1):
+        def capture(message, *args, **kwargs):
+            self._job.ytdlp_error = message
+            return report_error(message, *args, **kwargs)
+        
+        ydl.report_error = capture
+    
+    def pop_ytdlp_error(self, default: str) -> str:
+        """Ostatni błąd zgłoszony przez yt-dlp w tym wątku (albo `default`)."""
+        message = getattr(self._job, 'ytdlp_error', None)
+        self._job.ytdlp_error = None
+        return message or default
+    
+    def _progress_hook(self, status: dict):
+        """Hook postępu yt-dlp: przekazuje postęp i obsługuje anulowanie."""
+        cancel_event = getattr(self._job, 'cancel_event', None)
+        if cancel_event is not None and cancel_event.is_set():
+            # Tylko wyjątki DownloadCancelled yt-dlp przechodzą przez jego obsługę błędów
+            raise yt_dlp.utils.DownloadCancelled("Pobieranie anulowane")
+        record = self.current_record()
+        if record is not None:
+            record.on_progress(status)
+        if status.get('status') == 'downloading':
+            self.report_progress(
+                'download',
+                status.get('downloaded_bytes'),
+                status.get('total_bytes') or status.get('total_bytes_estimate')
+            )
+    
+    def _postprocessor_hook(self, status: dict):
+        """Hook postprocesorów yt-dlp: mierzy czas np. naprawy kontenera."""
+        record = self.current_record()
+        if record is not None:
+            record.on_postprocess(status)
+    
+    def current_record(self) -> Optional[UrlMetrics]:
+        """Pomiary URL-a przetwarzanego w bieżącym wątku (lub None)."""
+        return getattr(self._job, 'record', None)
+    
+    def note_error(self, error_class: str):
+        """Zapamiętuje klasę błędu bieżącego URL-a (wątek i pomiary)."""
+        self._job.error_class = error_class
+        record = self.current_record()
+        if record is not None:
+            record.error_class = error_class
+    
+    def last_error_class(self) -> Optional[str]:
+        """Klasa ostatniego błędu URL-a przetwarzanego w tym wątku (lub None)."""
+        return getattr(self._job, 'error_class', None)
+    
+    def backoff_sleep(self, attempt: int):
+        """Indywidualny backoff przed kolejną próbą (wliczany do metryk)."""
+        delay = self.retry_backoff.delay(attempt)
+        self.rate_limiter.clock.sleep(delay)
+        record = self.current_record()
+        if record is not None:
+            record.add_sleep(delay)
+    
+    def report_progress(self, stage: str, downloaded: Optional[int] = None, total: Optional[int] = None):
+        """Wywołuje callback postępu bieżącego zadania (jeśli ustawiony)."""
+        callback = getattr(self._job, 'progress_callback', None)
+        if callback is None:
+            return
+        fraction = None
+        if downloaded is not None and total:
+            fraction = min(1.0, downloaded / total)
+        callback({'stage': stage, 'downloaded': downloaded, 'total': total, 'fraction': fraction})
+    
+    def check_cancelled(self):
+        """Rzuca DownloadCancelled jeśli bieżące zadanie zostało anulowane."""
+        cancel_event = getattr(self._job, 'cancel_event', None)
+        if cancel_event is not None and cancel_event.is_set():
+            raise DownloadCancelled("Pobieranie anulowane")
+    
+    def apply_overrides(self, ydl: 'yt_dlp.YoutubeDL', outtmpl: Optional[str] = None,
+                        user_agent: Optional[str] = None):
+        """Nakłada tanie, per-URL zmiany na ciepłą sesję (bez jej przebudowy)."""
+        _, opts = self.profile_opts('download')
+        ydl.params['outtmpl']['default'] = outtmpl or opts['outtmpl']
+        ydl.params['http_headers']['User-Agent'] = user_agent or opts['http_headers']['User-Agent']
+    
+    def close_sessions(self):
+        """Zamyka wszystkie ciepłe sesje yt-dlp (np. na koniec wsadu)."""
+        with self._sessions_lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for ydl in sessions:
             try:
-                self.logger.info(f"Próba {attempt}/{len(retry_strategies)}: {url}")
+                ydl.close()
+            except Exception as e:
+                self.logger.debug(f"Błąd zamykania sesji yt-dlp: {e}")
+    
+    def _fetch_once(self, ydl: 'yt_dlp.YoutubeDL', url: str) -> Path:
+        """Jedna próba pobrania pliku źródłowego. Zwraca ścieżkę pobranego pliku."""
+        self.logger.info(f"Pobieranie audio z: {url}")
+        record = self.current_record()
+        if record is not None:
+            record.begin_call()
+        self._job.ytdlp_error = None
+        source = None
+        try:
+            if self.connections > 1 and SEGMENTED_SUPPORTED:
+                # Najpierw sam wybór formatu - długi plik HTTP idzie kilkoma połączeniami
+                info = ydl.extract_info(url, download=False)
+                if info is not None:
+                    source = self._fetch_segmented(ydl, info)
+                    if source is None:
+                        info = ydl.process_ie_result(info, download=True)
+            else:
+                info = ydl.extract_info(url, download=True)
+        finally:
+            if record is not None:
+                record.end_call()
+        downloads = (info or {}).get('requested_downloads') or []
+        if source is None and downloads and downloads[0].get('filepath'):
+            source = Path(downloads[0]['filepath'])
+        elif source is None and info:
+            source = Path(ydl.prepare_filename(info))
+        # ignoreerrors='only_download' połyka błędy pobierania - sprawdź wynik
+        if source is None or not source.exists():
+            raise yt_dlp.DownloadError(self.pop_ytdlp_error(f"Plik źródłowy nie został pobrany: {url}"))
+        if self.metadata_cache is not None:
+            self.metadata_cache.put_metadata(self.cache_key(url), MetadataCache.summarize(info))
+        return source
+    
+    def _fetch_segmented(self, ydl: 'yt_dlp.YoutubeDL', info: dict) -> Optional[Path]:
+        """Pobiera wybrany format kilkoma połączeniami HTTP Range.
+        
+        Zwraca None, gdy format się do tego nie nadaje (protokół inny niż
+        HTTP, osobne strumienie, proxy, plik za mały, niedokończony .part
+        do wznowienia) albo serwer nie
+        obsługuje Range - wtedy pobiera zwykła ścieżka yt-dlp. Postęp
+        i anulowanie idą przez ten sam hook co w yt-dlp.
+        """
+        if info.get('_type', 'video') != 'video' or info.get('requested_formats') \
+                or info.get('protocol') not in ('http', 'https') or ydl.params.get('proxy'):
+            return None
+        known_size = info.get('filesize') or info.get('filesize_approx')
+        if known_size and plan_connections(known_size, self.connections) <= 1:
+            return None
+        path = Path(ydl.prepare_filename(info))
+        if path.with_name(path.name + '.part').exists():
+            # Niedokończony plik yt-dlp (np. --resume) - niech yt-dlp go dokończy
+            return None
+        headers = {**(info.get('http_headers') or {}), 'Accept-Encoding': 'identity'}
+        cookiejar = getattr(ydl, 'cookiejar', None)
+        if hasattr(cookiejar, 'get_cookie_header'):
+            cookie = cookiejar.get_cookie_header(info['url'])
+            if cookie:
+                headers['Cookie'] = cookie
+        try:
+            size = probe_size(info['url'], headers)
+        except RangeNotSupported as e:
+            self.logger.debug(f"Pobieranie jednym połączeniem: {e}")
+            return None
+        except OSError:
+            # Błąd sieci przy sondzie - niech zwykła ścieżka yt-dlp go obsłuży i sklasyfikuje
+            return None
+        connections = plan_connections(size, self.connections)
+        if connections <= 1:
+            return None
+        
+        self.logger.info(f"Pobieranie w {connections} połączeniach ({format_size(size)}): {path.name}")
+        download = SegmentedDownload(
+            info['url'], headers, path, size, connections,
+            on_progress=lambda done, total: self._progress_hook(
+                {'status': 'downloading', 'downloaded_bytes': done, 'total_bytes': total}
+            )
+        )
+        try:
+            download.run()
+        except RangeNotSupported as e:
+            self.logger.warning(f"Serwer przestał obsługiwać Range ({e}) - pobieram jednym połączeniem")
+            return None
+        except (SegmentError, OSError) as e:
+            # Nieudany segment mimo ponowień - cała próba idzie do polityki ponowień URL-a
+            raise yt_dlp.DownloadError(f"Pobieranie segmentowe nie powiodło się: {e}") from e
+        self._progress_hook({'status': 'finished', 'downloaded_bytes': size, 'total_bytes': size})
+        if download.segment_retries or download.splits:
+            self.logger.debug(
+                f"Segmenty: {download.splits} podziałów, {download.segment_retries} ponowień zakresów"
+            )
+        info['filepath'] = str(path)
+        return path
+    
+    def fetch_source(self, url: str, output_filename: Optional[str] = None) -> Optional[Path]:
+        """Etap sieciowy: pobiera plik źródłowy audio z inteligentnym retry (bez konwersji)."""
+        return self._run_with_retries(url, output_filename, self._fetch_once)
+    
+    def stream_audio(self, url: str, output_filename: Optional[str] = None) -> Optional[Path]:
+        """Pobiera i konwertuje jednocześnie: bajty źródła trafiają wprost do FFmpeg.
+        
+        Zwraca ścieżkę gotowego pliku WAV. Rzuca `TranscodeError` gdy źródła
+        nie da się przesłać strumieniowo (np. protokół fragmentowany) albo
+        FFmpeg nie potrafi go zdekodować z potoku.
+        """
+        return self._run_with_retries(url, output_filename, self._stream_once)
+    
+    def _run_with_retries(self, url: str, output_filename: Optional[str], action) -> Optional[Path]:
+        """Wykonuje `action(ydl, url)` z rotacją User-Agent przeciwko blokowaniu.
+        
+        Przed każdą próbą wątek czeka na żeton wspólnego limitera. Blokada
+        (403/429) uruchamia grupowy cooldown z jitterem dla wszystkich wątków,
+        inne błędy - indywidualny backoff tylko dla tego URL-a.
+        
+        Gdy wszystkie próby zawiodą błędem extractora, URL czeka na
+        aktualizację yt-dlp w tle (jedną na wsad; inne URL-e pracują dalej)
+        i ponawia pobranie w świeżym procesie roboczym. Otwarty bezpiecznik
+        extractora odrzuca URL bez prób.
+        """
+        # Klauzule except poniżej odwołują się do wyjątków yt-dlp
+        load_yt_dlp()
+        
+        # Niestandardowa nazwa pliku
+        outtmpl = None
+        if output_filename:
+            clean_filename = self.sanitize_filename(output_filename)
+            if not clean_filename.endswith('.wav'):
+                clean_filename += '.wav'
+            outtmpl = str(self.output_dir / clean_filename.replace('.wav', '.%(ext)s'))
+        
+        guard = self.extractor_guard
+        try:
+            trial = guard.acquire(self.check_cancelled)
+        except ExtractorBroken as e:
+            self.note_error('environment')
+            self.logger.error(f"Pomijam {url}: {e}")
+            return None
+        if trial:
+            self.logger.info(f"Bezpiecznik extractora: próba kontrolna na {url}")
+        
+        # Wynik dla bezpiecznika: True/False - extractor zadziałał/zawiódł, None - nie wiadomo
+        outcome = None
+        try:
+            if guard.updated:
+                # Zaimportowany yt_dlp jest sprzed aktualizacji - nowy działa tylko w świeżym procesie
+                if action != self._fetch_once:
+                    raise TranscodeError("yt-dlp zaktualizowany w trakcie pracy")
+                source = self.fetch_in_worker(url, outtmpl)
+                outcome = self.extractor_outcome(source)
+                return source
+            
+            source, extractor_failed = self._attempt_all(url, outtmpl, action)
+            if source is not None:
+                outcome = True
+                return source
+            if not extractor_failed:
+                return None
+            outcome = False
+            
+            # Ostatnia próba - aktualizacja yt-dlp w tle, czeka tylko ten URL
+            if not guard.request_update():
+                self.logger.error(f"Wszystkie strategie retry zawiodły, a aktualizacja yt-dlp w tym wsadzie była nieudana: {url}")
+                return None
+            self.logger.warning(f"Wszystkie strategie retry zawiodły - czekam na aktualizację yt-dlp: {url}")
+            if not guard.wait_update(self.check_cancelled):
+                self.logger.error(f"Pobieranie nie powiodło się, aktualizacja yt-dlp nieudana: {url}")
+                return None
+            self.logger.info(f"Ponawiam pobieranie po aktualizacji yt-dlp (nowy proces): {url}")
+            source = self.fetch_in_worker(url, outtmpl)
+            outcome = self.extractor_outcome(source)
+            return source
+        finally:
+            guard.release(outcome, trial)
+    
+    def extractor_outcome(self, source: Optional[Path]) -> Optional[bool]:
+        """Wynik próby dla bezpiecznika: porażka liczy się tylko dla błędów extractora."""
+        if source is not None:
+            return True
+        return False if RETRY_POLICIES[self.last_error_class() or 'transient']['extractor'] else None
+    
+    def _attempt_all(self, url: str, outtmpl: Optional[str], action) -> tuple:
+        """Próby w bieżącym procesie. Zwraca (ścieżka albo None, czy zawiódł extractor).
+        
+        Liczbę prób i rodzaj przerwy wyznacza klasa błędu (RETRY_POLICIES):
+        błąd trwały (film prywatny, usunięty, niedostępny w regionie) i błąd
+        środowiska (brak miejsca, brak uprawnień) kończą URL od razu.
+        """
+        attempts = len(USER_AGENT_SUFFIXES)
+        record = self.current_record()
+        for attempt, user_agent_suffix in enumerate(USER_AGENT_SUFFIXES, 1):
+            try:
+                self.check_cancelled()
+                waited = self.rate_limiter.acquire()
+                if record is not None:
+                    record.attempts += 1
+                    record.add_sleep(waited, 'limiter')
+                self.check_cancelled()
+                if waited >= 1:
+                    self.logger.info(f"Limiter zapytań: odczekano {waited:.1f}s")
+                self.logger.info(f"Próba {attempt}/{attempts}: {url}")
                 
-                # Budowanie opcji yt-dlp z aktualną strategią
-                ydl_opts = self.build_opts(
-                    out_dir=self.output_dir,
-                    sr=self.sample_rate,
-                    ch=self.channels,
-                    bit=self.bit_depth,
-                    keep_src=self.keep_source,
-                    retries=self.retries
+                # Ciepła sesja yt-dlp + per-URL zmiana User-Agent
+                ydl = self.get_session('download')
+                _, base_opts = self.profile_opts('download')
+                base_ua = base_opts['http_headers']['User-Agent']
+                self.apply_overrides(
+                    ydl,
+                    outtmpl=outtmpl,
+                    user_agent=base_ua + user_agent_suffix
                 )
                 
-                # Modyfikacja User-Agent dla różnych prób
-                base_ua = ydl_opts['http_headers']['User-Agent']
-                ydl_opts['http_headers']['User-Agent'] = base_ua + strategy['user_agent_suffix']
-                ydl_opts['sleep_interval'] = strategy['sleep_interval']
-                
-                # Niestandardowa nazwa pliku
-                if output_filename:
-                    clean_filename = self.sanitize_filename(output_filename)
-                    if not clean_filename.endswith('.wav'):
-                        clean_filename += '.wav'
-                    ydl_opts['outtmpl'] = str(self.output_dir / clean_filename.replace('.wav', '.%(ext)s'))
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    self.logger.info(f"Pobieranie audio z: {url}")
-                    ydl.download([url])
-                    self.logger.info("Pobieranie zakończone pomyślnie!")
-                    return True
+                source = action(ydl, url)
+                self.rate_limiter.on_success()
+                self.logger.info(f"Pobieranie zakończone pomyślnie: {source.name}")
+                return source, False
                     
-            except yt_dlp.DownloadError as e:
-                error_msg = str(e).lower()
-                if 'http error 403' in error_msg or 'forbidden' in error_msg:
-                    self.logger.warning(f"Próba {attempt} zablokowana (403). Czekam {strategy['sleep_interval']*2}s...")
-                    import time
-                    time.sleep(strategy['sleep_interval'] * 2)
-                    if attempt < len(retry_strategies):
-                        continue
-                self.logger.error(f"Błąd pobierania {url}: {e}")
-                if attempt == len(retry_strategies):
-                    # Ostatnia próba - spróbuj zaktualizować yt-dlp
-                    self.logger.warning("Wszystkie strategie retry zawiodły. Próbuję zaktualizować yt-dlp...")
-                    if self.auto_update_ytdlp():
-                        self.logger.info("Ponawiam pobieranie po aktualizacji yt-dlp...")
-                        import time
-                        time.sleep(3)
-                        # Jedna dodatkowa próba po aktualizacji
+            except (TranscodeError, DownloadCancelled):
+                raise
+            except yt_dlp.utils.DownloadCancelled as e:
+                raise DownloadCancelled(str(e)) from e
+            except Exception as e:
+                # Błąd spoza yt-dlp nie świadczy o extractorze
+                from_extractor = isinstance(e, yt_dlp.DownloadError)
+                error_class = classify_error(e)
+                policy = RETRY_POLICIES[error_class]
+                self.note_error(error_class)
+                if error_class == 'throttled':
+                    delay = self.rate_limiter.on_throttle()
+                    if record is not None:
+                        record.throttles += 1
+                    self.logger.warning(f"Próba {attempt} zablokowana (403/429). "
+                                        f"Wspólna pauza wszystkich wątków: {delay:.1f}s")
+                elif from_extractor:
+                    self.logger.error(f"Błąd pobierania {url}: {e}")
+                else:
+                    self.logger.error(f"Nieoczekiwany błąd dla {url}: {e}")
+                
+                if attempt >= (policy['attempts'] or attempts):
+                    if policy['attempts'] == 1:
+                        self.logger.error(f"Błąd klasy {error_class} - bez ponawiania: {url}")
+                    return None, from_extractor and policy['extractor']
+                if policy['pause'] == 'backoff':
+                    self.backoff_sleep(attempt)
+        
+        return None, False
+    
+    def fetch_in_worker(self, url: str, outtmpl: Optional[str] = None) -> Optional[Path]:
+        """Pobiera plik źródłowy w świeżym procesie (nowo zainstalowany yt-dlp).
+        
+        Proces dostaje te same opcje co ciepłe sesje. Anulowanie zadania
+        zabija proces roboczy.
+        """
+        self.check_cancelled()
+        waited = self.rate_limiter.acquire()
+        record = self.current_record()
+        if record is not None:
+            record.attempts += 1
+            record.add_sleep(waited, 'limiter')
+        _, opts = self.profile_opts('download')
+        opts = {**opts, 'outtmpl': outtmpl or opts['outtmpl']}
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, str(WORKER_SCRIPT), 'fetch', url],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        payload = json.dumps(opts)
+        while True:
+            try:
+                stdout, stderr = process.communicate(payload, timeout=WAIT_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                payload = None
+                try:
+                    self.check_cancelled()
+                except DownloadCancelled:
+                    process.kill()
+                    process.communicate()
+                    raise
+        if record is not None:
+            record.add_stage('download', time.perf_counter() - started)
+        if process.returncode != 0:
+            message = stderr.strip().splitlines()[-1] if stderr.strip() else f"kod {process.returncode}"
+            self.note_error(classify_error(stderr or message))
+            self.logger.error(f"Proces roboczy yt-dlp: {message}")
+            return None
+        result = json.loads(stdout.strip().splitlines()[-1])
+        source = Path(result['filepath'])
+        if self.metadata_cache is not None:
+            self.metadata_cache.put_metadata(self.cache_key(url), result['metadata'])
+        self.rate_limiter.on_success()
+        self.logger.info(f"Pobieranie zakończone pomyślnie (yt-dlp {result['yt_dlp_version']}): {source.name}")
+        return source
+    
+    def is_throttled(self, error_msg: str) -> bool:
+        """Czy komunikat błędu oznacza blokadę/limitowanie po stronie serwera."""
+        return classify_error(error_msg) == 'throttled'
+    
+    def build_ffmpeg_cmd(self, source: str, partials: List[Path],
+                         duration: Optional[float] = None) -> List[str]:
+        """Buduje pełne wywołanie FFmpeg: źródło (plik lub `pipe:0`) -> WAV dla każdego profilu.
+        
+        Wszystkie profile są wyjściami jednego procesu - źródło jest dekodowane
+        raz, a każde wyjście ma własne przepróbkowanie i format próbek.
+        """
+        cmd = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-y', '-i', source]
+        for profile, partial in zip(self.profiles, partials):
+            rf64 = self.needs_rf64(profile, duration)
+            if self.content_index is None:
+                cmd += [*self.build_ffmpeg_args(*profile), '-f', 'wav',
+                        *(['-rf64', 'auto'] if rf64 else []), str(partial)]
+            else:
+                # Muxer tee: ten sam zakodowany PCM trafia do WAV i do skrótu SHA-256
+                wav = '[f=wav:rf64=auto]' if rf64 else '[f=wav]'
+                cmd += ['-map', '0:a:0', *self.build_ffmpeg_args(*profile), '-f', 'tee',
+                        f"{wav}{escape_tee_path(partial)}|"
+                        f"[f=hash:hash=sha256]{escape_tee_path(self.hash_path(partial))}"]
+        return cmd
+    
+    def needs_rf64(self, profile: tuple, duration: Optional[float]) -> bool:
+        """Czy wyjście potrzebuje RF64 (`-rf64 auto`), bo może przekroczyć 4 GB.
+        
+        Przy znanej długości, mieszczącej się z zapasem w limicie, zostaje
+        zwykły WAV. Inaczej (długi materiał albo nieznana długość, np.
+        transmisja) FFmpeg przełącza nagłówek na RF64 tylko wtedy, gdy plik
+        faktycznie przekroczy limit.
+        """
+        sr, ch, bit = profile
+        return not (duration and duration * sr * ch * (bit // 8) * WAV_SIZE_MARGIN < WAV_SIZE_LIMIT)
+    
+    def hash_path(self, partial: Path) -> Path:
+        """Plik, do którego FFmpeg zapisuje skrót PCM wyjścia `partial`."""
+        return partial.with_name(partial.name + '.sha256')
+    
+    def discard_partials(self, partials: List[Path]):
+        """Usuwa niedokończone wyjścia i ich skróty."""
+        for partial in partials:
+            partial.unlink(missing_ok=True)
+            self.hash_path(partial).unlink(missing_ok=True)
+    
+    def commit_outputs(self, partials: List[Path], targets: List[Path]):
+        """Przenosi gotowe pliki na miejsce i deduplikuje je po skrócie treści.
+        
+        Plik, którego PCM ma już kopię w tym samym profilu w katalogu
+        wyjściowym (inny film z tą samą ścieżką dźwiękową), jest zastępowany
+        reflinkiem lub hardlinkiem.
+        Każda decyzja trafia do logu.
+        """
+        for profile, partial, target in zip(self.archive_profiles(), partials, targets):
+            content_hash = None
+            hash_file = self.hash_path(partial)
+            if hash_file.exists():
+                content_hash = hash_file.read_text(encoding='ascii').strip().partition('=')[2] or None
+                hash_file.unlink()
+            os.replace(partial, target)
+            if self.content_index is None or content_hash is None:
+                continue
+            existing = self.content_index.lookup(content_hash, profile)
+            if existing is None or existing == target.absolute():
+                self.content_index.add(content_hash, profile, target)
+                continue
+            method = link_file(existing, target)
+            if method is None:
+                self.logger.info(f"Duplikat treści {target.name} = {existing.name}, "
+                                 f"ale dowiązanie niemożliwe - kopia zachowana")
+            else:
+                self.logger.info(f"Duplikat treści: {target.name} -> {existing} ({method}, "
+                                 f"zaoszczędzono {existing.stat().st_size / 1e6:.1f} MB)")
+    
+    def verify_outputs(self, partials: List[Path]) -> Optional[str]:
+        """Sprawdza nagłówki gotowych plików względem profili. Zwraca opis błędu lub None."""
+        for (sr, ch, bit), partial in zip(self.profiles, partials):
+            try:
+                header = read_wav_header(partial)
+            except (OSError, ValueError, struct.error) as e:
+                return f"{partial.name}: {e}"
+            expected = (WAVE_FORMAT_PCM, sr, ch, bit, ch * bit // 8)
+            actual = (header['format'], header['sample_rate'], header['channels'],
+                      header['bits'], header['block_align'])
+            if actual != expected:
+                return f"{partial.name}: nagłówek {actual}, oczekiwano {expected}"
+            if header['container'] == 'RF64':
+                self.logger.info(f"Plik powyżej 4 GB zapisany jako RF64: {partial.name}")
+        return None
+    
+    def source_duration(self, url: str) -> Optional[float]:
+        """Długość materiału z cache metadanych (bez sieci) - do wyboru RIFF/RF64."""
+        if self.metadata_cache is None:
+            return None
+        metadata = self.metadata_cache.get_metadata(self.cache_key(url))
+        return (metadata or {}).get('duration') or None
+    
+    def output_paths(self, target: Path) -> List[Path]:
+        """Pliki wyjściowe dla `target` - po jednym na profil, w kolejności profili.
+        
+        Przy jednym profilu to sam `target`, przy wielu - ta sama nazwa
+        w podkatalogach profili (np. `wav_out/16000Hz_1ch_16bit/`).
+        """
+        if len(self.profiles) == 1:
+            return [target]
+        return [target.parent / profile_label(*profile) / target.name for profile in self.profiles]
+    
+    def profile_outputs(self, output: Path) -> List[Path]:
+        """Wszystkie pliki profili na podstawie pliku głównego zwróconego przez transcode."""
+        if len(self.profiles) == 1:
+            return [output]
+        return self.output_paths(output.parent.parent / output.name)
+    
+    def _stream_once(self, ydl: 'yt_dlp.YoutubeDL', url: str) -> Path:
+        """Jedna próba strumieniowej konwersji: HTTP -> stdin FFmpeg -> WAV.
+        
+        Nie powstaje pośredni plik m4a/webm. W razie błędu po którejkolwiek
+        stronie proces FFmpeg jest zabijany, a niepełny `.wav.part` usuwany.
+        """
+        from yt_dlp.networking import Request
+        from yt_dlp.networking.exceptions import RequestError
+        
+        self.logger.info(f"Pobieranie strumieniowe z: {url}")
+        record = self.current_record()
+        key = self.cache_key(url)
+        stream = self.metadata_cache.get_stream(key) if self.metadata_cache is not None else None
+        if stream is None:
+            self._job.ytdlp_error = None
+            with timed(record, 'extract'):
+                info = ydl.extract_info(url, download=False)
+            if not info:
+                raise yt_dlp.DownloadError(self.pop_ytdlp_error(f"Brak informacji o filmie: {url}"))
+            if info.get('requested_formats'):
+                raise TranscodeError("Wybrany format wymaga łączenia strumieni")
+            if info.get('protocol') not in ('http', 'https') or not info.get('url'):
+                raise TranscodeError(f"Protokół {info.get('protocol')} nie obsługuje trybu strumieniowego")
+            stream = {
+                'id': info.get('id'),
+                'title': info.get('title'),
+                'ext': info.get('ext'),
+                'url': info['url'],
+                'http_headers': info.get('http_headers') or {},
+            }
+            if self.metadata_cache is not None:
+                self.metadata_cache.put_metadata(key, MetadataCache.summarize(info))
+                self.metadata_cache.put_stream(key, stream)
+        
+        targets = self.output_paths(Path(ydl.prepare_filename(stream)).with_suffix('.wav'))
+        partials = [target.with_name(target.name + '.part') for target in targets]
+        for target in targets:
+            target.parent.mkdir(exist_ok=True)
+        
+        stream_started = time.perf_counter()
+        try:
+            response = ydl.urlopen(Request(stream['url'], headers=stream['http_headers']))
+        except RequestError as e:
+            # Podpisany URL mógł wygasnąć - kolejna próba zrobi świeżą ekstrakcję
+            if self.metadata_cache is not None:
+                self.metadata_cache.invalidate_stream(key)
+            raise yt_dlp.DownloadError(str(e)) from e
+        
+        total = response.headers.get('Content-Length')
+        total = int(total) if total and total.isdigit() else None
+        received = 0
+        
+        with tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(
+                self.build_ffmpeg_cmd('pipe:0', partials, self.source_duration(url)),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=stderr_file
+            )
+            network_error = None
+            cancelled = False
+            try:
+                with response:
+                    while True:
+                        cancel_event = getattr(self._job, 'cancel_event', None)
+                        if cancel_event is not None and cancel_event.is_set():
+                            cancelled = True
+                            break
+                        try:
+                            chunk = response.read(STREAM_CHUNK_SIZE)
+                        except Exception as e:
+                            network_error = e
+                            break
+                        if not chunk:
+                            break
                         try:
-                            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                                ydl.download([url])
-                                self.logger.info("Pobieranie zakończone pomyślnie po aktualizacji!")
-                                return True
-                        except Exception as final_e:
-                            self.logger.error(f"Pobieranie nie powiodło się nawet po aktualizacji: {final_e}")
+                            process.stdin.write(chunk)
+                        except BrokenPipeError:
+                            # FFmpeg zakończył się - powód będzie w stderr
+                            break
+                        received += len(chunk)
+                        self.report_progress('download', received, total)
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+                if network_error is not None or cancelled:
+                    process.kill()
+                returncode = process.wait()
+                if record is not None:
+                    record.add_stage('stream', time.perf_counter() - stream_started)
+                    record.add_bytes(received)
+            
+            if cancelled or network_error is not None or returncode != 0:
+                self.discard_partials(partials)
+            if cancelled:
+                raise DownloadCancelled("Pobieranie anulowane")
+            if network_error is not None:
+                if self.metadata_cache is not None:
+                    self.metadata_cache.invalidate_stream(key)
+                raise yt_dlp.DownloadError(f"Przerwany strumień {url}: {network_error}")
+            if returncode != 0:
+                stderr_file.seek(0)
+                details = stderr_file.read().decode('utf-8', errors='replace').strip()
+                raise TranscodeError(f"FFmpeg nie przetworzył strumienia: {details}")
+            if not all(partial.exists() and partial.stat().st_size >= MIN_WAV_SIZE for partial in partials):
+                # Np. MP4 z atomem moov na końcu - z potoku nie da się go odczytać
+                self.discard_partials(partials)
+                raise TranscodeError("FFmpeg nie zdekodował audio z potoku")
+            problem = self.verify_outputs(partials)
+            if problem is not None:
+                self.discard_partials(partials)
+                raise TranscodeError(f"Nieprawidłowy nagłówek WAV: {problem}")
+        
+        self.commit_outputs(partials, targets)
+        return targets[0]
+    
+    def transcode(self, source: Path, duration: Optional[float] = None) -> Optional[Path]:
+        """Etap CPU: konwertuje pobrany plik źródłowy do WAV PCM przez FFmpeg.
+        
+        Wynik trafia najpierw do pliku tymczasowego `.wav.part`, a dopiero po
+        udanej konwersji jest atomowo przemianowywany na docelowy `.wav`.
+        Wszystkie profile powstają w jednym wywołaniu FFmpeg. `duration`
+        (sekundy, jeśli znana) decyduje o nagłówku RIFF/RF64. Zwraca ścieżkę
+        pliku WAV głównego profilu lub None przy błędzie.
+        """
+        target = source.with_suffix('.wav')
+        if target == source:
+            target = source.with_name(f"{source.stem}.pcm.wav")
+        targets = self.output_paths(target)
+        partials = [path.with_name(path.name + '.part') for path in targets]
+        for path in targets:
+            path.parent.mkdir(exist_ok=True)
+        cmd = self.build_ffmpeg_cmd(str(source), partials, duration)
+        
+        self.logger.info(f"Konwersja do WAV: {target.name}"
+                         + (f" ({len(targets)} profile)" if len(targets) > 1 else ""))
+        self.report_progress('convert')
+        try:
+            with timed(self.current_record(), 'convert'):
+                result = subprocess.run(cmd, capture_output=True, text=True)
+        except Exception as e:
+            self.note_error('environment')
+            self.logger.error(f"Nie udało się uruchomić FFmpeg: {e}")
+            self.discard_partials(partials)
+            return None
+        
+        if result.returncode != 0:
+            # Źródło, którego FFmpeg nie dekoduje, nie zmieni się przy ponowieniu
+            self.note_error(classify_error(result.stderr, default='permanent'))
+            self.logger.error(f"Błąd konwersji {source.name}: {result.stderr.strip()}")
+            self.discard_partials(partials)
+            return None
+        
+        problem = self.verify_outputs(partials)
+        if problem is not None:
+            self.note_error('permanent')
+            self.logger.error(f"Nieprawidłowy nagłówek WAV po konwersji {source.name}: {problem}")
+            self.discard_partials(partials)
+            return None
+        
+        self.commit_outputs(partials, targets)
+        
+        # Usuń plik źródłowy jeśli nie jest wymagany
+        if not self.keep_source:
+            source.unlink(missing_ok=True)
+        
+        self.logger.info(f"Konwersja zakończona: {target.name}")
+        return targets[0]
+    
+    def download_audio(self, url: str, output_filename: Optional[str] = None,
+                       progress_callback=None, cancel_event: Optional[threading.Event] = None) -> bool:
+        """Pobiera audio z YouTube i konwertuje do WAV PCM z inteligentnym retry.
+        
+        `progress_callback` dostaje słowniki {'stage', 'downloaded', 'total', 'fraction'}
+        (stage: 'download' lub 'convert') i jest wywoływany z wątku pobierania.
+        Ustawienie `cancel_event` przerywa zadanie wyjątkiem DownloadCancelled.
+        """
+        
+        self._job.error_class = None
+        if not self.check_ffmpeg():
+            self.note_error('environment')
+            return False
+        
+        self._job.progress_callback = progress_callback
+        self._job.cancel_event = cancel_event
+        # We wsadzie pomiar URL-a zakłada i zamyka download_batch
+        own_record = self.current_record() is None
+        if own_record:
+            self._job.record = self.metrics.begin(url)
+        record = self.current_record()
+        status = 'failed'
+        try:
+            success = self._download_audio(url, output_filename)
+            status = 'ok' if success else 'failed'
+            return success
+        except DownloadCancelled:
+            status = 'cancelled'
+            raise
+        finally:
+            self._job.progress_callback = None
+            self._job.cancel_event = None
+            if own_record:
+                self._job.record = None
+                self.metrics.end(record, status)
+    
+    def _download_audio(self, url: str, output_filename: Optional[str]) -> bool:
+        output = None
+        if self.stream and not self.keep_source:
+            try:
+                output = self.stream_audio(url, output_filename)
+                if output is None:
                     return False
+            except TranscodeError as e:
+                # Nie każde źródło da się zdekodować z potoku - wróć do trybu z plikiem
+                self.logger.warning(f"Tryb strumieniowy niedostępny ({e}) - pobieram plik")
+        
+        if output is None:
+            source = self.fetch_source(url, output_filename)
+            if source is None:
+                return False
+            self.check_cancelled()
+            output = self.transcode(source, self.source_duration(url))
+            if output is None:
+                return False
+        
+        self.mark_done(url, output)
+        return True
+    
+    def archive_profiles(self) -> List[str]:
+        """Klucze profili wyjściowych w archiwum pobrań."""
+        return [DownloadArchive.profile_key(*profile) for profile in self.profiles]
+    
+    def archive_profile(self) -> str:
+        """Klucz zestawu profili (np. do identyfikacji wsadu)."""
+        return ','.join(self.archive_profiles())
+    
+    def is_done(self, url: str) -> bool:
+        """Czy URL jest już w archiwum dla wszystkich profili (bez sieci)."""
+        if self.archive is None:
+            return False
+        key = self.cache_key(url)
+        return all(self.archive.contains(key, profile) for profile in self.archive_profiles())
+    
+    def mark_done(self, url: str, output: Optional[Path] = None):
+        """Zapisuje ukończone pobranie w archiwum (osobno dla każdego profilu)."""
+        if self.archive is not None:
+            outputs = self.profile_outputs(output) if output else [None] * len(self.profiles)
+            for profile, path in zip(self.archive_profiles(), outputs):
+                self.archive.add(self.cache_key(url), profile, str(path) if path else None)
+    
+    
+    def host_key(self, url: str) -> str:
+        """Zwraca klucz hosta używany do limitu równoległych połączeń."""
+        host = (urlparse(url).hostname or '').lower()
+        for prefix in ('www.', 'm.', 'music.'):
+            if host.startswith(prefix):
+                host = host[len(prefix):]
+                break
+        # youtu.be to ten sam serwis co youtube.com
+        if host == 'youtu.be':
+            host = 'youtube.com'
+        return host
+    
+    def get_journal(self) -> BatchJournal:
+        """Zwraca dziennik wsadów dla katalogu wyjściowego."""
+        if self.journal is None:
+            self.journal = BatchJournal(self.output_dir / '.ytwav_journal.sqlite')
+        return self.journal
+    
+    def download_batch(self, urls: List[str], jobs: int = 1, per_host: Optional[int] = None,
+                       convert_jobs: int = 1, queue_size: Optional[int] = None,
+                       resume: bool = False, items: Optional[str] = None,
+                       order: str = 'list', min_free: int = 0,
+                       disk_quota: Optional[int] = None) -> List[bool]:
+        """Pobiera listę URL-i dwuetapowym potokiem: pobieranie -> konwersja.
+        
+        Etap sieciowy (`jobs` wątków, maks. `per_host` na host - domyślnie
+        tyle co `jobs`) pobiera pliki
+        źródłowe i przekazuje je przez ograniczoną kolejkę do puli konwersji
+        FFmpeg (`convert_jobs` wątków). Gdy kolejka jest pełna, pobieranie
+        czeka (backpressure), więc nieprzekonwertowane pliki nie zapełniają dysku.
+        
+        Bezpiecznik extractora jest zerowany na starcie wsadu (o ile inne
+        zadania wspólnego downloadera go nie używają): yt-dlp jest
+        aktualizowany co najwyżej raz, w tle, a po kilku kolejnych porażkach
+        extractora nowe URL-e nie są już próbowane (patrz
+        `ytwav_update.ExtractorGuard`).
+        
+        Linki do playlist i kanałów są rozwijane leniwie (`iter_videos`):
+        filmy trafiają do potoku w miarę pobierania kolejnych stron listy,
+        a liczba zadań w locie jest ograniczona, więc pamięć nie rośnie
+        z długością playlisty. `items` wybiera pozycje, np. "1-50,60".
+        
+        Stan każdego URL-a trafia do dziennika wsadu. Przy `resume=True`
+        ukończone pozycje są pomijane, przerwane konwersje uruchamiane od razu
+        na zachowanym pliku źródłowym, a przerwane pobrania wznawiane z `.part`.
+        
+        `order` ('shortest', 'longest') ustala kolejność według długości
+        z metadanych - krótkie pliki nie czekają za wielogodzinnym miksem.
+        Wymaga to znajomości całej listy, więc playlisty są wtedy rozwijane
+        w całości przed startem. Każde zadanie przed startem rezerwuje
+        szacowane miejsce na dysku (czas × sample rate × kanały × bajty
+        próbki); gdy wolne miejsce ponad `min_free` lub limit `disk_quota`
+        nie wystarcza, czeka na zakończenie trwających albo jest odrzucane.
+        
+        Wyniki są raportowane w kolejności uruchamiania (przy 'list' - listy
+        wejściowej), niezależnie od kolejności ukończenia. Zwraca listę wyników
+        (True/False) w kolejności listy (dla playlist - po jednym na rozwinięty film).
+        """
+        if per_host is None:
+            per_host = jobs
+        for name, value in (('jobs', jobs), ('per_host', per_host), ('convert_jobs', convert_jobs),
+                            ('queue_size', queue_size)):
+            if value is not None and value < 1:
+                raise ValueError(f"{name} musi być większe od zera (podano {value})")
+        if jobs > per_host:
+            # Linki YouTube trafiają do jednego hosta - nadmiarowe wątki tylko czekają
+            self.logger.warning(f"--jobs {jobs} > --per-host {per_host}: równolegle z jednego hosta "
+                                f"pobiera się tylko {per_host} plików")
+        self.extractor_guard.reset()
+        if queue_size is None:
+            queue_size = max(4, 2 * convert_jobs)
+        
+        # Dziennik wsadu - przy wznowieniu tylko niezakończona praca
+        journal = self.get_journal()
+        batch_id = BatchJournal.batch_id(urls, self.archive_profile())
+        expand = any(self.is_collection(url) for url in urls)
+        if expand:
+            # Liczba pozycji nieznana z góry - wpisy powstają w miarę rozwijania
+            journal.begin(batch_id, [], resume=resume)
+            work = None
+            source = self.iter_videos(urls, items)
+            if resume:
+                self.logger.info(f"Wznawiam wsad {batch_id}: playlisty zostaną rozwinięte ponownie")
+        else:
+            work = journal.begin(batch_id, urls, resume=resume)
+            source = ((url, None) for url in urls)
+            if resume:
+                self.logger.info(f"Wznawiam wsad {batch_id}: pozostało {len(work)}/{len(urls)}")
+        
+        # Pomiar długości z sieci tylko gdy jest potrzebny (kolejność lub limity dysku)
+        fetch_durations = order != 'list' or min_free > 0 or disk_quota is not None
+        with_source = self.keep_source or not self.stream
+        budget = DiskBudget(self.output_dir, min_free=min_free, quota=disk_quota)
+        reservations = {}
+        
+        if order != 'list':
+            source = self.schedule(list(source), order, jobs)
+        else:
+            source = ((index, url, error) for index, (url, error) in enumerate(source))
+        
+        host_limits = {}
+        host_limits_lock = threading.Lock()
+        
+        def host_semaphore(url: str) -> threading.Semaphore:
+            key = self.host_key(url)
+            with host_limits_lock:
+                if key not in host_limits:
+                    host_limits[key] = threading.Semaphore(per_host)
+                return host_limits[key]
+        
+        # Stan tylko dla pozycji w locie - reszta to lista wyników True/False
+        batch_urls = {}
+        records = {}
+        results: List[Optional[bool]] = []
+        skipped = set()
+        # Klasy błędów nieudanych pozycji (do raportu)
+        failure_classes = {}
+        skipped_count = 0
+        report_lock = threading.Lock()
+        # Pozycje w kolejności uruchamiania - raport idzie tą samą kolejnością
+        sequence = []
+        next_to_report = 0
+        total_label = str(len(urls)) if not expand else '?'
+        
+        def report():
+            # Raportuj w kolejności uruchamiania - tylko ciągły prefiks gotowych
+            nonlocal next_to_report
+            with report_lock:
+                while next_to_report < len(sequence) and results[sequence[next_to_report]] is not None:
+                    done = sequence[next_to_report]
+                    if done in skipped:
+                        skipped.discard(done)
+                        status = "POMINIĘTO (ukończone)"
+                    elif results[done]:
+                        status = "OK"
+                    else:
+                        error_class = failure_classes.pop(done, None)
+                        status = f"BŁĄD ({error_class})" if error_class else "BŁĄD"
+                    self.logger.info(f"[{done + 1}/{total_label}] {status}: {batch_urls.pop(done)}")
+                    next_to_report += 1
+        
+        def settle(index: int, success: bool):
+            with report_lock:
+                results[index] = success
+            report()
+        
+        def finish(index: int, success: bool, output: Optional[Path] = None):
+            if index in reservations:
+                budget.release(reservations.pop(index))
+            record = records.pop(index, None)
+            error_class = None
+            if not success:
+                error_class = (record.error_class if record is not None else None) or 'transient'
+                failure_classes[index] = error_class
+            journal.update(batch_id, index, 'done' if success else 'failed',
+                           output=str(output) if output else None, error=error_class)
+            self.metrics.end(record, 'ok' if success else 'failed')
+            settle(index, success)
+        
+        transcode_queue = queue.Queue(maxsize=queue_size)
+        
+        def convert_worker():
+            while True:
+                item = transcode_queue.get()
+                if item is None:
+                    break
+                index, source_path = item
+                output = None
+                self._job.record = records.get(index)
+                try:
+                    output = self.transcode(source_path, self.source_duration(batch_urls[index]))
+                    success = output is not None
+                    if success:
+                        self.mark_done(batch_urls[index], output)
+                except Exception as e:
+                    self.logger.error(f"Nieoczekiwany błąd konwersji {source_path}: {e}")
+                    self.note_error(classify_error(e))
+                    success = False
+                finally:
+                    self._job.record = None
+                finish(index, success, output)
+        
+        def admit(index: int, url: str, duration: Optional[float]) -> bool:
+            # Dopuszczenie według miejsca na dysku - czeka na trwające zadania
+            estimate = estimate_output_size(duration, self.profiles, with_source)
+            refusal = budget.reserve(estimate)
+            if refusal is None:
+                reservations[index] = estimate
+                return True
+            error = f"Brak miejsca: szacowany rozmiar {format_size(estimate)}, {refusal}"
+            self.logger.error(f"[{index + 1}/{total_label}] {error}: {url}")
+            journal.update(batch_id, index, 'failed', error=error)
+            if index in records:
+                self.metrics.end(records.pop(index), 'failed')
+            settle(index, False)
+            return False
+        
+        def fetch_worker(index: int, url: str, entry: dict, admitted: bool):
+            records[index] = self.metrics.begin(url)
+            self._job.record = records[index]
+            self._job.error_class = None
+            try:
+                # Długość spoza cache pobierana tutaj, równolegle - nie w pętli zgłoszeń
+                if admitted or admit(index, url, self.job_duration(url, fetch=True)):
+                    fetch_stage(index, url, entry)
+            finally:
+                self._job.record = None
+        
+        def fetch_stage(index: int, url: str, entry: dict):
+            if entry['state'] == 'transcoding' and entry['source'] and Path(entry['source']).exists():
+                # Przerwana konwersja - plik źródłowy jest gotowy, pomijamy sieć
+                self.logger.info(f"[{index + 1}/{total_label}] Wznawiam konwersję: {entry['source']}")
+                transcode_queue.put((index, Path(entry['source'])))
+                return
+            
+            journal.update(batch_id, index, 'downloading')
+            if self.stream and not self.keep_source:
+                # Tryb strumieniowy: pobieranie i konwersja dzieją się razem
+                with host_semaphore(url):
+                    self.logger.info(f"[{index + 1}/{total_label}] Pobieranie: {url}")
+                    try:
+                        success = self.download_audio(url)
+                    except Exception as e:
+                        self.logger.error(f"Nieoczekiwany błąd dla {url}: {e}")
+                        self.note_error(classify_error(e))
+                        success = False
+                finish(index, success)
+                return
+            
+            with host_semaphore(url):
+                self.logger.info(f"[{index + 1}/{total_label}] Pobieranie: {url}")
+                try:
+                    source_path = self.fetch_source(url)
+                except Exception as e:
+                    self.logger.error(f"Nieoczekiwany błąd dla {url}: {e}")
+                    self.note_error(classify_error(e))
+                    source_path = None
+            if source_path is None:
+                finish(index, False)
+            else:
+                journal.update(batch_id, index, 'transcoding', source=str(source_path))
+                # Blokuje gdy kolejka konwersji jest pełna (backpressure)
+                transcode_queue.put((index, source_path))
+        
+        converters = [
+            threading.Thread(target=convert_worker, name=f"ytwav-ffmpeg-{n}", daemon=True)
+            for n in range(convert_jobs)
+        ]
+        for converter in converters:
+            converter.start()
+        
+        if jobs > 1 or convert_jobs > 1:
+            self.logger.info(f"Potok: {jobs} wątków pobierania (maks. {per_host} na host), "
+                             f"{convert_jobs} wątków konwersji, kolejka {queue_size}")
+        
+        # Ograniczenie zadań w locie - rozwijanie playlisty czeka na wolne miejsce
+        slots = threading.BoundedSemaphore(2 * jobs)
+        errors = []
+        archived = []
+        ffmpeg_ok = None
+        
+        def task_done(future):
+            if future.exception() is not None:
+                errors.append(future.exception())
+            slots.release()
+        
+        try:
+            with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="ytwav-fetch") as pool:
+                for index, url, error in source:
+                    with report_lock:
+                        if index >= len(results):
+                            results.extend([None] * (index + 1 - len(results)))
+                        sequence.append(index)
+                        batch_urls[index] = url
+                    
+                    if expand:
+                        entry = journal.add(batch_id, index, url)
+                    else:
+                        entry = work.get(index, {'state': 'done', 'source': None})
+                    if entry['state'] == 'done':
+                        skipped.add(index)
+                        skipped_count += 1
+                        settle(index, True)
+                        continue
+                    
+                    if error is not None:
+                        # Nie udało się rozwinąć playlisty/kanału
+                        journal.update(batch_id, index, 'failed', error=error)
+                        settle(index, False)
+                        continue
+                    
+                    # Archiwum sprawdzane przed jakimkolwiek ruchem sieciowym
+                    if self.is_done(url):
+                        archived.append(index)
+                        if len(archived) >= 256:
+                            journal.update_many(batch_id, archived, 'done')
+                            archived.clear()
+                        skipped.add(index)
+                        skipped_count += 1
+                        settle(index, True)
+                        continue
+                    
+                    if ffmpeg_ok is None:
+                        ffmpeg_ok = self.check_ffmpeg()
+                    if not ffmpeg_ok:
+                        break
+                    
+                    # Długość z listy lub cache - bez sieci; brakującą pobierze wątek zadania
+                    duration = self.job_duration(url)
+                    admitted = duration is not None or not fetch_durations
+                    if admitted and not admit(index, url, duration):
+                        continue
+                    
+                    slots.acquire()
+                    pool.submit(fetch_worker, index, url, entry, admitted).add_done_callback(task_done)
+                total_label = str(len(results))
+        finally:
+            for _ in converters:
+                transcode_queue.put(None)
+            for converter in converters:
+                converter.join()
+            if archived:
+                journal.update_many(batch_id, archived, 'done')
+            # Wątki puli już nie istnieją - zwolnij ich sesje i połączenia
+            self.close_sessions()
+        
+        if errors:
+            raise errors[0]
+        if ffmpeg_ok is False:
+            return [False] * len(urls)
+        
+        if skipped_count:
+            self.logger.info(f"Pominięto {skipped_count} plików już ukończonych")
+        
+        if journal.remaining(batch_id) == 0:
+            journal.clear(batch_id)
+        
+        return [bool(result) for result in results]
+    
+    def job_duration(self, url: str, fetch: bool = False) -> Optional[float]:
+        """Długość filmu w sekundach: z płaskiej listy, cache metadanych, a przy `fetch` z sieci."""
+        duration = self.duration_hints.get(url) or self.source_duration(url)
+        if duration or not fetch or self.is_collection(url):
+            return duration
+        self.rate_limiter.acquire()
+        info = self.get_video_info(url)
+        return (info or {}).get('duration') or None
+    
+    def schedule(self, pairs: List[tuple], order: str, jobs: int = 1) -> List[tuple]:
+        """Ustala kolejność wsadu według długości. Zwraca trójki (pozycja, url, błąd).
+        
+        Pozycje ukończone (archiwum) i błędne idą pierwsze - nie wymagają
+        metadanych. Dla pozostałych długości są pobierane równolegle
+        (z cache, gdy to możliwe).
+        """
+        instant, pending = [], []
+        for index, (url, error) in enumerate(pairs):
+            (instant if error is not None or self.is_done(url) else pending).append((index, url))
+        
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="ytwav-info") as pool:
+            durations = list(pool.map(lambda item: self.job_duration(item[1], fetch=True), pending))
+        ordered = order_jobs([(index, duration) for (index, _), duration in zip(pending, durations)], order)
+        unknown = sum(1 for duration in durations if not duration)
+        self.logger.info(f"Kolejność '{order}': {len(pending)} zadań do pobrania "
+                         f"(metadane w {time.perf_counter() - started:.1f}s"
+                         + (f", {unknown} bez długości - na końcu" if unknown else "") + ")")
+        return ([(index, url, pairs[index][1]) for index, url in instant]
+                + [(index, pairs[index][0], None) for index, _ in ordered])
+    
+    def is_collection(self, url: str) -> bool:
+        """Czy link wskazuje playlistę lub kanał (a nie pojedynczy film)."""
+        parsed = parse_youtube_url(url)
+        return parsed is not None and parsed[0] in ('playlist', 'channel')
+    
+    def iter_videos(self, urls: List[str], items: Optional[str] = None):
+        """Generator par (url, błąd): filmy z listy, playlisty i kanały rozwijane leniwie.
+        
+        Duplikaty (także między playlistami) są pomijane. Gdy rozwinięcie
+        się nie powiedzie, zwracany jest link kolekcji z opisem błędu.
+        """
+        seen = set()
+        for url in urls:
+            if not self.is_collection(url):
+                if url not in seen:
+                    seen.add(url)
+                    yield url, None
+                continue
+            try:
+                for entry_url in self.iter_collection(url, items):
+                    if entry_url not in seen:
+                        seen.add(entry_url)
+                        yield entry_url, None
             except Exception as e:
-                self.logger.error(f"Nieoczekiwany błąd dla {url}: {e}")
-                if attempt == len(retry_strategies):
-                    return False
+                self.logger.error(f"Nie udało się rozwinąć {url}: {e}")
+                yield url, str(e)
+    
+    def iter_collection(self, url: str, items: Optional[str] = None):
+        """Leniwie rozwija playlistę/kanał (ekstrakcja płaska, strona po stronie).
         
-        return False
+        Zwraca kanoniczne linki filmów. Przy `items` ogranicza się do wybranych
+        pozycji i kończy pobieranie stron po ostatniej z nich.
+        """
+        ranges = parse_item_ranges(items) if items else None
+        last = None
+        if ranges and all(end is not None for _, end in ranges):
+            last = max(end for _, end in ranges)
+        
+        self.logger.info(f"Rozwijam listę: {url}")
+        ydl = self.get_session('flat')
+        info = ydl.extract_info(url, download=False, process=False)
+        for position, entry in enumerate(self._flat_entries(ydl, info), 1):
+            if last is not None and position > last:
+                break
+            if ranges and not any(start <= position and (end is None or position <= end)
+                                  for start, end in ranges):
+                continue
+            entry_url = self.entry_url(entry)
+            if entry_url:
+                if entry.get('duration'):
+                    self.duration_hints[entry_url] = entry['duration']
+                yield entry_url
+    
+    def _flat_entries(self, ydl: 'yt_dlp.YoutubeDL', info: Optional[dict], depth: int = 0):
+        """Wpisy płaskiej ekstrakcji; zagnieżdżone zakładki kanału rozwijane rekurencyjnie."""
+        while info and info.get('_type') in ('url', 'url_transparent') and depth < 3:
+            info = ydl.extract_info(info['url'], download=False, process=False,
+                                    ie_key=info.get('ie_key'))
+            depth += 1
+        if not info:
+            return
+        if info.get('_type') != 'playlist':
+            yield info
+            return
+        # `entries` z extractora YouTube to generator - kolejne strony na żądanie
+        for entry in info.get('entries') or ():
+            if not entry:
+                continue
+            nested = parse_youtube_url(entry.get('url') or '')
+            if depth < 3 and (entry.get('_type') == 'playlist' or
+                              (nested and nested[0] in ('playlist', 'channel'))):
+                if entry.get('_type') != 'playlist':
+                    entry = ydl.extract_info(entry['url'], download=False, process=False,
+                                             ie_key=entry.get('ie_key'))
+                yield from self._flat_entries(ydl, entry, depth + 1)
+            else:
+                yield entry
+    
+    def entry_url(self, entry: dict) -> Optional[str]:
+        """Kanoniczny link filmu dla wpisu płaskiej ekstrakcji."""
+        for candidate in (entry.get('url'), entry.get('webpage_url')):
+            parsed = parse_youtube_url(candidate or '')
+            if parsed and parsed[0] == 'video':
+                return canonical_url(*parsed)
+        if VIDEO_ID_RE.match(entry.get('id') or '') and str(entry.get('ie_key') or 'Youtube').startswith('Youtube'):
+            return canonical_url('video', entry['id'])
+        return entry.get('webpage_url') or entry.get('url')
+    
+    def cache_key(self, url: str) -> str:
+        """Klucz cache: kanoniczne ID filmu, a dla innych URL-i sam URL."""
+        return extract_video_id(url) or f"url:{url}"
     
     def get_video_info(self, url: str) -> Optional[dict]:
-        """Pobiera informacje o filmie bez pobierania."""
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-        }
-        
+        """Pobiera informacje o filmie bez pobierania (z trwałego cache jeśli to możliwe)."""
+        key = self.cache_key(url)
+        if self.metadata_cache is not None:
+            cached = self.metadata_cache.get_metadata(key)
+            if cached is not None:
+                return cached
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                return {
-                    'title': info.get('title', 'Nieznany tytuł'),
-                    'duration': info.get('duration', 0),
-                    'uploader': info.get('uploader', 'Nieznany autor'),
-                    'view_count': info.get('view_count', 0)
-                }
+            ydl = self.get_session('info')
+            info = ydl.extract_info(url, download=False)
+            metadata = MetadataCache.summarize(info)
+            if self.metadata_cache is not None:
+                self.metadata_cache.put_metadata(key, metadata)
+            return metadata
         except Exception as e:
             print(f"Błąd pobierania informacji: {e}")
             return None
@@ -299,6 +1895,11 @@ class YTWavDownloader:
 
 def main():
     """Główna funkcja CLI."""
+    if sys.argv[1:2] == ['serve']:
+        from ytwav_server import serve_main
+        serve_main(sys.argv[2:])
+        return
+    
     parser = argparse.ArgumentParser(
         description="Pobierz audio z YouTube i konwertuj do WAV PCM",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -306,7 +1907,12 @@ def main():
 Przykłady użycia:
   %(prog)s "https://youtube.com/watch?v=VIDEO_ID"
   %(prog)s --list urls.txt -o custom_dir
+  %(prog)s --list urls.txt --jobs 4
+  %(prog)s "https://youtube.com/playlist?list=PLAYLIST_ID" --items 1-50
   %(prog)s "https://youtube.com/watch?v=VIDEO_ID" --sr 44100 --ch 1 --bit 24
+  %(prog)s --list urls.txt --profiles 48000:2:16,44100:2:24,16000:1:16
+  %(prog)s serve --jobs 2
+  %(prog)s "https://youtube.com/watch?v=VIDEO_ID" --server
         """
     )
     
@@ -350,6 +1956,12 @@ Przykłady użycia:
         help="Głębia bitowa WAV: 16 lub 24 (domyślnie: 16)"
     )
     
+    parser.add_argument(
+        "--profiles",
+        help="Kilka profili wyjściowych z jednego pobrania, np. 48000:2:16,44100:2:24,16000:1:16 "
+             "(sr:ch:bit; zastępuje --sr/--ch/--bit, pliki w podkatalogach profili)"
+    )
+    
     parser.add_argument(
         "--keep-src",
         action="store_true",
@@ -363,8 +1975,182 @@ Przykłady użycia:
         help="Liczba ponowień przy błędach (domyślnie: 5)"
     )
     
+    parser.add_argument(
+        "-j", "--jobs",
+        type=positive_int,
+        default=1,
+        help="Liczba równoległych pobrań w trybie --list (domyślnie: 1)"
+    )
+    
+    parser.add_argument(
+        "--per-host",
+        type=positive_int,
+        default=None,
+        help="Maksymalna liczba równoległych pobrań z jednego hosta (domyślnie: tyle co --jobs)"
+    )
+    
+    parser.add_argument(
+        "--convert-jobs",
+        type=positive_int,
+        default=1,
+        help="Liczba równoległych konwersji FFmpeg (domyślnie: 1)"
+    )
+    
+    parser.add_argument(
+        "--connections",
+        type=positive_int,
+        default=DEFAULT_CONNECTIONS,
+        help=f"Maks. liczba połączeń (zakresów HTTP Range) na długi plik źródłowy; 1 = wyłączone "
+             f"(domyślnie: {DEFAULT_CONNECTIONS})"
+    )
+    
+    parser.add_argument(
+        "--queue-size",
+        type=positive_int,
+        default=None,
+        help="Pojemność kolejki plików czekających na konwersję (domyślnie: 2x --convert-jobs, min. 4)"
+    )
+    
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Konwertuj w locie, bez zapisu pośredniego pliku źródłowego"
+    )
+    
+    parser.add_argument(
+        "--info",
+        action="store_true",
+        help="Tylko pokaż informacje o filmach, bez pobierania"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Nie używaj trwałego cache metadanych"
+    )
+    
+    parser.add_argument(
+        "--archive",
+        help="Plik archiwum ukończonych pobrań (domyślnie: <out>/.ytwav_archive.sqlite)"
+    )
+    
+    parser.add_argument(
+        "--no-archive",
+        action="store_true",
+        help="Nie pomijaj ani nie zapisuj ukończonych pobrań w archiwum"
+    )
+    
+    parser.add_argument(
+        "--no-dedupe",
+        action="store_true",
+        help="Nie zastępuj plików o identycznej treści audio dowiązaniami (reflink/hardlink)"
+    )
+    
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Wznów przerwany wsad (dokończ pobrania i konwersje, pomiń ukończone)"
+    )
+    
+    parser.add_argument(
+        "--rate",
+        type=positive_float,
+        default=1.0,
+        help="Maksymalne tempo zapytań na sekundę dla całego procesu (domyślnie: 1.0)"
+    )
+    
+    parser.add_argument(
+        "--order",
+        choices=ORDERS,
+        default="list",
+        help="Kolejność wsadu: list (jak w pliku), shortest (najkrótsze najpierw), longest "
+             "(domyślnie: list; inne wymagają metadanych każdego filmu)"
+    )
+    
+    parser.add_argument(
+        "--min-free",
+        default="0",
+        help="Minimalne wolne miejsce, które musi zostać na dysku, np. 2G (domyślnie: 0)"
+    )
+    
+    parser.add_argument(
+        "--disk-quota",
+        help="Maksymalny szacowany rozmiar danych zapisanych przez wsad, np. 50G"
+    )
+    
+    parser.add_argument(
+        "--items",
+        help="Pozycje playlist/kanałów do pobrania, np. 1-50,60,100- (domyślnie: wszystkie)"
+    )
+    
+    parser.add_argument(
+        "--metrics-jsonl",
+        help="Dopisuj metryki każdego URL-a (czasy etapów, B/s, ponowienia) do pliku JSON Lines"
+    )
+    
+    parser.add_argument(
+        "--metrics-prom",
+        help="Zapisuj skumulowane metryki do pliku .prom (textfile collector node exportera)"
+    )
+    
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const="http://127.0.0.1:8757",
+        help="Zgłoś zadania do działającej usługi (ytdl_wav.py serve) zamiast pobierać w tym procesie"
+    )
+    
+    parser.add_argument(
+        "--detach",
+        action="store_true",
+        help="Z --server: tylko zgłoś zadania, nie czekaj na ich zakończenie"
+    )
+    
     args = parser.parse_args()
     
+    if args.items:
+        try:
+            parse_item_ranges(args.items)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    try:
+        min_free = parse_size(args.min_free)
+        disk_quota = parse_size(args.disk_quota) if args.disk_quota else None
+    except ValueError as e:
+        parser.error(str(e))
+    
+    profiles = None
+    if args.profiles:
+        try:
+            profiles = parse_profiles(args.profiles)
+        except ValueError as e:
+            parser.error(str(e))
+    
+    # Cienki klient usługi - bez importu yt-dlp i bez lokalnych magazynów
+    if args.server:
+        from ytwav_server import run_client
+        urls = [args.url] if args.url else []
+        if args.list:
+            try:
+                with open(args.list, 'r', encoding='utf-8') as f:
+                    urls += [line.strip() for line in f
+                             if line.strip() and not line.strip().startswith('#')]
+            except OSError as e:
+                print(f"Błąd podczas czytania pliku {args.list}: {e}")
+                sys.exit(2)
+        if not urls:
+            print("Musisz podać URL lub plik z listą URL-ów (--list)")
+            sys.exit(2)
+        options = {'out': os.path.abspath(args.out), 'sr': args.sr, 'ch': args.ch,
+                   'bit': args.bit, 'stream': args.stream, 'items': args.items,
+                   'profiles': args.profiles, 'connections': args.connections}
+        sys.exit(run_client(args.server, urls, options, detach=args.detach))
+    
+    if not has_yt_dlp():
+        print("Błąd: Brak modułu yt-dlp. Zainstaluj: pip install yt-dlp")
+        sys.exit(1)
+    
     # Tworzenie downloadera
     downloader = YTWavDownloader(
         output_dir=args.out,
@@ -372,12 +2158,18 @@ Przykłady użycia:
         channels=args.ch,
         bit_depth=args.bit,
         keep_source=args.keep_src,
-        retries=args.retries
+        retries=args.retries,
+        stream=args.stream,
+        use_cache=not args.no_cache,
+        use_archive=not args.no_archive,
+        archive_path=args.archive,
+        rate_limiter=get_rate_limiter(args.rate),
+        metrics=MetricsRecorder(args.metrics_jsonl, args.metrics_prom),
+        profiles=profiles,
+        dedupe=not args.no_dedupe,
+        connections=args.connections
     )
     
-    # Wyświetl hinty
-    downloader.show_hints()
-    
     # Jednolity loader URL-ów
     urls = downloader.load_all_urls(args.url, args.list)
     
@@ -389,19 +2181,62 @@ Przykłady użycia:
             downloader.logger.error("Nie znaleziono prawidłowych URL-ów")
         sys.exit(2)  # Exit code 2 dla braku URL-ów
     
-    # Pobieranie audio
-    success_count = 0
-    total_count = len(urls)
+    # FFmpeg i obsługa profili (np. pcm_s24le) sprawdzane przed jakimkolwiek pobieraniem
+    if not args.info and not downloader.check_ffmpeg():
+        sys.exit(1)
     
-    downloader.logger.info(f"Rozpoczynam pobieranie {total_count} plików...")
+    # Tryb informacyjny (dry run) - bez pobierania
+    if args.info:
+        found = 0
+        for url, error in downloader.iter_videos(urls, args.items):
+            if error is not None:
+                continue
+            info = downloader.get_video_info(url)
+            if info:
+                found += 1
+                print(f"{info['title']} | {info['duration']}s | {info['uploader']} | {url}")
+        if downloader.metadata_cache is not None:
+            stats = downloader.metadata_cache.stats()
+            downloader.logger.info(f"Cache metadanych: {stats['hits']} trafień, {stats['misses']} chybień")
+        sys.exit(0 if found else 1)
     
-    for i, url in enumerate(urls, 1):
-        downloader.logger.info(f"[{i}/{total_count}] Przetwarzanie: {url}")
-        if downloader.download_audio(url):
-            success_count += 1
+    # Pobieranie audio
+    if any(downloader.is_collection(url) for url in urls):
+        downloader.logger.info(f"Rozpoczynam pobieranie ({len(urls)} linków, playlisty rozwijane w locie)...")
+    else:
+        downloader.logger.info(f"Rozpoczynam pobieranie {len(urls)} plików...")
+    
+    results = downloader.download_batch(
+        urls,
+        jobs=args.jobs,
+        per_host=args.per_host,
+        convert_jobs=args.convert_jobs,
+        queue_size=args.queue_size,
+        resume=args.resume,
+        items=args.items,
+        order=args.order,
+        min_free=min_free,
+        disk_quota=disk_quota
+    )
+    total_count = len(results)
+    success_count = sum(1 for result in results if result)
     
     # Podsumowanie
     downloader.logger.info(f"Zakończono: {success_count}/{total_count} plików pobrano pomyślnie")
+    totals = downloader.metrics.summary()
+    if totals['stage_seconds']:
+        stages = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in sorted(totals['stage_seconds'].items()))
+        downloader.logger.info(f"Czas etapów: {stages}; ponowienia: {totals['retries']}, "
+                               f"uśpienie: {totals['limiter_wait'] + totals['backoff_sleep']:.1f}s")
+    if totals['error_classes']:
+        classes = ", ".join(f"{error_class} {count}" for error_class, count in sorted(totals['error_classes'].items()))
+        downloader.logger.info(f"Błędy według klasy: {classes}")
+    if downloader.metadata_cache is not None:
+        stats = downloader.metadata_cache.stats()
+        line = f"Cache metadanych: {stats['hits']} trafień, {stats['misses']} chybień"
+        if stats['stream_hits'] or stats['stream_misses']:
+            line += f"; URL-e strumieni: {stats['stream_hits']} trafień, {stats['stream_misses']} chybień"
+        downloader.logger.info(line)
     
     if success_count == total_count:
         downloader.logger.info("✅ Wszystkie operacje zakończone pomyślnie!")
@@ -414,30 +2249,57 @@ Przykłady użycia:
         sys.exit(1)
 
 
-def download_wav(url: str, output_dir: str = "wav_out") -> bool:
+_shared_downloaders = {}
+_shared_downloaders_lock = threading.Lock()
+
+
+def get_shared_downloader(output_dir: str = "wav_out") -> YTWavDownloader:
+    """Zwraca długożyjący downloader dla katalogu (tworzony tylko raz).
+    
+    Dzięki temu mkdir, konfiguracja loggingu, hinty i ciepłe sesje yt-dlp
+    nie są odtwarzane przy każdym pobraniu z GUI.
+    """
+    key = str(Path(output_dir).resolve())
+    with _shared_downloaders_lock:
+        downloader = _shared_downloaders.get(key)
+        if downloader is None:
+            downloader = YTWavDownloader(
+                output_dir=output_dir,
+                sample_rate=48000,
+                channels=2,
+                bit_depth=16,
+                keep_source=False,
+                retries=5
+            )
+            _shared_downloaders[key] = downloader
+        return downloader
+
+
+def download_wav(url: str, output_dir: str = "wav_out", progress_callback=None,
+                 cancel_event: Optional[threading.Event] = None) -> bool:
     """
     Prosta funkcja do pobierania audio z YouTube i konwersji do WAV PCM.
-    Używana przez GUI i CLI.
+    Używana przez GUI i CLI. Korzysta ze współdzielonego, ciepłego downloadera.
     
     Args:
         url: URL YouTube do pobrania
         output_dir: Katalog wyjściowy (domyślnie: wav_out)
+        progress_callback: Opcjonalny callback postępu (patrz download_audio)
+        cancel_event: Opcjonalna flaga anulowania (threading.Event)
         
     Returns:
         bool: True jeśli sukces, False jeśli błąd
+        
+    Raises:
+        DownloadCancelled: gdy zadanie anulowano przez cancel_event
     """
     try:
-        downloader = YTWavDownloader(
-            output_dir=output_dir,
-            sample_rate=48000,
-            channels=2,
-            bit_depth=16,
-            keep_source=False,
-            retries=5
-        )
-        
-        return downloader.download_audio(url)
+        downloader = get_shared_downloader(output_dir)
+        return downloader.download_audio(url, progress_callback=progress_callback,
+                                         cancel_event=cancel_event)
         
+    except DownloadCancelled:
+        raise
     except Exception as e:
         print(f"Błąd podczas pobierania: {e}")
         return False
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+YTWAV - Rejestr możliwości narzędzi
+Jednorazowe sondowanie FFmpeg (wersja, enkodery, formaty próbek, muxery)
+i yt-dlp (wersja). Wynik jest zapisywany w ~/.cache/ytwav/toolchain.json
+z kluczem: ścieżka binarki + mtime, więc CLI, GUI i skrypt utrzymania
+czytają go bez uruchamiania procesów - aż do aktualizacji narzędzia.
+
+Autor: Senior Python Developer
+Licencja: MIT
+"""
+
+import importlib.metadata
+import importlib.util
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from ytwav_store import default_cache_dir
+
+
+# Enkodery, dla których zapamiętywane są obsługiwane formaty próbek
+PROBED_ENCODERS = ('pcm_s16le', 'pcm_s24le', 'pcm_s32le')
+# Muxery używane przez konwersję (WAV, deduplikacja przez tee + hash)
+PROBED_MUXERS = ('wav', 'tee', 'hash')
+# Limit czasu pojedynczego wywołania ffmpeg podczas sondowania
+PROBE_TIMEOUT = 15
+# Wersja formatu pliku - zmiana wymusza ponowne sondowanie
+CACHE_VERSION = 1
+# Po ilu sekundach proces ponawia nieudane sondowanie (wynik nie trafia do pliku)
+PROBE_RETRY_INTERVAL = 5.0
+
+
+def file_key(path: str) -> dict:
+    """Klucz ważności wpisu: rzeczywista ścieżka pliku i jego mtime."""
+    real = os.path.realpath(path)
+    return {'path': real, 'mtime_ns': os.stat(real).st_mtime_ns}
+
+
+def run_ffmpeg(binary: str, *args: str) -> str:
+    result = subprocess.run([binary, '-hide_banner', *args], capture_output=True,
+                            text=True, timeout=PROBE_TIMEOUT)
+    return result.stdout
+
+
+def probe_ffmpeg(binary: str) -> dict:
+    """Sonduje FFmpeg: wersja, enkodery audio, formaty próbek PCM, muxery, RF64."""
+    version = run_ffmpeg(binary, '-version').split('\n', 1)[0].strip()
+    if not version:
+        raise OSError(f"{binary} -version nie zwrócił wersji")
+    encoders = [
+        match.group(1) for match in re.finditer(r'^ A\S* (\S+)', run_ffmpeg(binary, '-encoders'), re.M)
+    ]
+    muxers = [
+        match.group(1) for match in re.finditer(r'^ +D?E +(\S+)', run_ffmpeg(binary, '-muxers'), re.M)
+    ]
+    sample_formats = {}
+    for encoder in PROBED_ENCODERS:
+        if encoder in encoders:
+            match = re.search(r'Supported sample formats: (.+)', run_ffmpeg(binary, '-h', f'encoder={encoder}'))
+            sample_formats[encoder] = match.group(1).split() if match else []
+    return {
+        'version': version,
+        'encoders': encoders,
+        'muxers': [muxer for muxer in muxers if muxer in PROBED_MUXERS],
+        'sample_formats': sample_formats,
+        'wav_rf64': 'rf64' in run_ffmpeg(binary, '-h', 'muxer=wav'),
+    }
+
+
+def ytdlp_location() -> Optional[str]:
+    """Plik wersji zainstalowanego yt-dlp (bez importu pakietu)."""
+    spec = importlib.util.find_spec('yt_dlp')
+    if spec is None or not spec.origin:
+        return None
+    version_file = Path(spec.origin).with_name('version.py')
+    return str(version_file if version_file.exists() else spec.origin)
+
+
+def probe_ytdlp() -> dict:
+    try:
+        version = importlib.metadata.version('yt-dlp')
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+    return {'version': version}
+
+
+class ToolchainCapabilities:
+    """Współdzielony rejestr możliwości FFmpeg i yt-dlp.
+
+    `get()` zwraca {'ffmpeg': dict albo None, 'probe_error': str albo None,
+    'yt_dlp': dict albo None}. `probe_error` odróżnia binarkę, która jest,
+    ale nie odpowiada (timeout, uszkodzony plik), od braku instalacji.
+    W procesie wynik jest liczony raz; między procesami - czytany z pliku,
+    dopóki ścieżka i mtime binarki się nie zmienią. Nieudane sondowanie
+    nie jest zapisywane, a w procesie jest ponawiane po
+    PROBE_RETRY_INTERVAL s (kolejne sprawdzenia tuż po nim nie czekają
+    ponownie na timeout). Koszt
+    typowego wywołania to `shutil.which` i `stat`, bez uruchamiania ffmpeg.
+    """
+
+    def __init__(self, cache_path: Optional[Path] = None):
+        self.cache_path = Path(cache_path) if cache_path else default_cache_dir() / 'toolchain.json'
+        self._result = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        try:
+            data = json.loads(self.cache_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+        return data if data.get('version') == CACHE_VERSION else {}
+
+    def save(self, data: dict):
+        # Zapis atomowy - równolegle startujące procesy nie przeczytają połowy pliku
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            partial = self.cache_path.with_name(f"{self.cache_path.name}.{os.getpid()}.part")
+            partial.write_text(json.dumps(data, indent=2), encoding='utf-8')
+            os.replace(partial, self.cache_path)
+        except OSError:
+            pass
+
+    def get(self, refresh: bool = False) -> dict:
+        with self._lock:
+            if self._result is not None and not refresh and (
+                    self._result['probe_error'] is None or time.monotonic() < self._retry_at):
+                return self._result
+            cached = {} if refresh else self.load()
+            changed = False
+            result = {'version': CACHE_VERSION}
+
+            binary = shutil.which('ffmpeg')
+            ffmpeg = None
+            probe_error = None
+            if binary:
+                key = file_key(binary)
+                entry = cached.get('ffmpeg')
+                if entry and {k: entry.get(k) for k in key} == key:
+                    ffmpeg = entry
+                else:
+                    try:
+                        ffmpeg = {**key, **probe_ffmpeg(binary)}
+                    except (OSError, subprocess.SubprocessError) as e:
+                        probe_error = f"{binary}: {e}"
+                    changed = True
+            elif cached.get('ffmpeg'):
+                changed = True
+            result['ffmpeg'] = ffmpeg
+            result['probe_error'] = probe_error
+
+            location = ytdlp_location()
+            ytdlp = None
+            if location:
+                key = file_key(location)
+                entry = cached.get('yt_dlp')
+                if entry and {k: entry.get(k) for k in key} == key:
+                    ytdlp = entry
+                else:
+                    ytdlp = {**key, **probe_ytdlp()}
+                    changed = True
+            elif cached.get('yt_dlp'):
+                changed = True
+            result['yt_dlp'] = ytdlp
+
+            if probe_error is None and changed:
+                self.save(result)
+            self._result = result
+            self._retry_at = time.monotonic() + PROBE_RETRY_INTERVAL
+            return result
+
+    def missing(self, requirements: List[tuple], muxers: List[str] = ()) -> List[str]:
+        """Brakujące elementy: pary (enkoder, format próbek) i muxery. Pusta lista = OK.
+
+        ['ffmpeg'] oznacza brak instalacji; binarka, która nie odpowiada,
+        daje opis błędu sondowania.
+        """
+        result = self.get()
+        ffmpeg = result['ffmpeg']
+        if ffmpeg is None:
+            if result.get('probe_error'):
+                return [f"działający ffmpeg ({result['probe_error']})"]
+            return ['ffmpeg']
+        problems = []
+        for encoder, sample_fmt in requirements:
+            if encoder not in ffmpeg['encoders']:
+                problems.append(f"enkoder {encoder}")
+            elif sample_fmt not in ffmpeg['sample_formats'].get(encoder, [sample_fmt]):
+                problems.append(f"format próbek {sample_fmt} dla {encoder}")
+        problems += [f"muxer {muxer}" for muxer in muxers if muxer not in ffmpeg['muxers']]
+        return list(dict.fromkeys(problems))
+
+
+_capabilities = None
+_capabilities_lock = threading.Lock()
+
+
+def get_capabilities() -> ToolchainCapabilities:
+    """Wspólny dla procesu rejestr (CLI, GUI, usługa i skrypt utrzymania)."""
+    global _capabilities
+    with _capabilities_lock:
+        if _capabilities is None:
+            _capabilities = ToolchainCapabilities()
+        return _capabilities
@@ -1,71 +1,110 @@
 #!/usr/bin/env python3
 """
 YTWAV GUI - Minimalistyczny interfejs graficzny dla YouTube Audio Downloader
-Retro-style Tkinter GUI (400x120px, nierozszerzalne)
+Retro-style Tkinter GUI (480x300px, nierozszerzalne) z kolejką pobrań
 
 Wymagania:
 - tkinter (wbudowany w Python)
 - ytdl_wav.py (logika pobierania)
 
+Pobieranie odbywa się w wątku roboczym - okno pozostaje responsywne,
+a do kolejki można dodawać kolejne linki w trakcie pobierania. Jeśli działa
+usługa `ytdl_wav.py serve`, zadania są zgłaszane do niej (cienki klient).
+
 Autor: Senior Python Developer
 Licencja: MIT
 """
 
 import tkinter as tk
-from tkinter import messagebox
-import shutil
+from tkinter import messagebox, ttk
+import itertools
+import queue
 import sys
+import threading
+import time
 import os
 
 # Import funkcji pobierania z głównego modułu
 try:
-    from ytdl_wav import download_wav
+    from ytdl_wav import (download_wav, has_yt_dlp, load_yt_dlp, parse_youtube_url,
+                          profile_requirements, DownloadCancelled)
+    from ytwav_caps import get_capabilities
+    from ytwav_server import ServiceClient
 except ImportError:
     messagebox.showerror("Błąd", "Nie można zaimportować ytdl_wav.py")
     sys.exit(1)
 
 
+# Jak często wątek UI odbiera zdarzenia z wątku roboczego
+POLL_INTERVAL_MS = 50
+# Maksymalny czas obsługi zdarzeń w jednym cyklu - reszta w kolejnym
+POLL_BUDGET_S = 0.02
+# Opóźnienie wstępnego importu yt-dlp po starcie okna
+PRELOAD_DELAY_MS = 300
+
+
 class YTWavGUI:
     """Minimalistyczny GUI dla pobierania audio z YouTube."""
-    
+
     def __init__(self):
         self.root = tk.Tk()
+
+        # Zadania: id -> słownik z widgetami i flagą anulowania
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+        # Kolejka zadań dla wątku roboczego i kolejka zdarzeń z powrotem do UI
+        self.job_queue = queue.Queue()
+        self.events = queue.Queue()
+        # Klient usługi w tle - ustawiany, gdy usługa odpowiada przy starcie
+        self.service = None
+        client = ServiceClient()
+        if client.is_available():
+            self.service = client
+
         self.setup_window()
         self.create_widgets()
         self.check_ffmpeg_on_startup()
-        
+
+        self.worker = threading.Thread(target=self.worker_loop, name="ytwav-gui-worker", daemon=True)
+        self.worker.start()
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
+        # yt-dlp ładowany w tle dopiero po narysowaniu okna
+        if self.service is None:
+            self.root.after(PRELOAD_DELAY_MS, self.preload_downloader)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
     def setup_window(self):
         """Konfiguruje główne okno aplikacji."""
         self.root.title("YT → WAV Downloader")
-        self.root.geometry("400x120")
+        self.root.geometry("480x300")
         self.root.resizable(False, False)
-        
+
         # Centrowanie okna na ekranie
         self.root.update_idletasks()
-        x = (self.root.winfo_screenwidth() // 2) - (400 // 2)
-        y = (self.root.winfo_screenheight() // 2) - (120 // 2)
-        self.root.geometry(f"400x120+{x}+{y}")
-        
+        x = (self.root.winfo_screenwidth() // 2) - (480 // 2)
+        y = (self.root.winfo_screenheight() // 2) - (300 // 2)
+        self.root.geometry(f"480x300+{x}+{y}")
+
     def create_widgets(self):
         """Tworzy elementy interfejsu."""
         # Etykieta
         label = tk.Label(
-            self.root, 
+            self.root,
             text="Wklej link YouTube:",
             font=("Arial", 10)
         )
         label.pack(pady=(15, 5))
-        
+
         # Pole tekstowe na URL
         self.url_entry = tk.Entry(
             self.root,
-            width=50,
+            width=55,
             font=("Arial", 9)
         )
         self.url_entry.pack(pady=5)
-        
-        # Przycisk pobierania
-        download_btn = tk.Button(
+
+        # Przycisk dodawania do kolejki
+        self.download_btn = tk.Button(
             self.root,
             text="Pobierz",
             command=self.download_audio,
@@ -73,17 +112,47 @@ class YTWavGUI:
             width=15,
             height=1
         )
-        download_btn.pack(pady=(10, 15))
-        
+        self.download_btn.pack(pady=(5, 10))
+
+        # Lista zadań z przewijaniem
+        list_frame = tk.Frame(self.root)
+        list_frame.pack(fill="both", expand=True, padx=10)
+        self.jobs_canvas = tk.Canvas(list_frame, height=130, highlightthickness=0)
+        scrollbar = tk.Scrollbar(list_frame, orient="vertical", command=self.jobs_canvas.yview)
+        self.jobs_frame = tk.Frame(self.jobs_canvas)
+        self.jobs_frame.bind(
+            "<Configure>",
+            lambda event: self.jobs_canvas.configure(scrollregion=self.jobs_canvas.bbox("all"))
+        )
+        self.jobs_canvas.create_window((0, 0), window=self.jobs_frame, anchor="nw")
+        self.jobs_canvas.configure(yscrollcommand=scrollbar.set)
+        self.jobs_canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        # Pasek statusu
+        self.status_label = tk.Label(
+            self.root,
+            text="Lokalizacja: wav_out/",
+            font=("Arial", 8),
+            anchor="w"
+        )
+        self.status_label.pack(fill="x", padx=10, pady=(2, 5))
+
         # Focus na pole tekstowe
         self.url_entry.focus()
-        
+
         # Bind Enter key do pobierania
         self.root.bind('<Return>', lambda event: self.download_audio())
-        
+
     def check_ffmpeg_on_startup(self):
-        """Sprawdza dostępność FFmpeg przy starcie aplikacji."""
-        if not shutil.which("ffmpeg"):
+        """Sprawdza FFmpeg (z enkoderem PCM) i yt-dlp przy starcie aplikacji (bez importu yt-dlp)."""
+        if not has_yt_dlp():
+            messagebox.showerror("Błąd", "Brak modułu yt-dlp. Zainstaluj: pip install yt-dlp")
+            self.root.destroy()
+            sys.exit(1)
+        # Wspólny rejestr możliwości - zwykle odczyt z cache, bez uruchamiania ffmpeg
+        problems = get_capabilities().missing(profile_requirements([(48000, 2, 16)]), muxers=['wav'])
+        if problems == ['ffmpeg']:
             messagebox.showerror(
                 "Błąd FFmpeg",
                 "FFmpeg nie jest zainstalowany lub niedostępny w PATH.\n\n"
@@ -92,11 +161,23 @@ class YTWavGUI:
             )
             self.root.destroy()
             sys.exit(1)
-            
+        if problems and get_capabilities().get()['ffmpeg'] is None:
+            messagebox.showerror("Błąd FFmpeg", "FFmpeg jest zainstalowany, ale nie odpowiada:\n" + "\n".join(problems))
+            self.root.destroy()
+            sys.exit(1)
+        if problems:
+            messagebox.showerror("Błąd FFmpeg", "FFmpeg nie obsługuje konwersji do WAV:\n" + "\n".join(problems))
+            self.root.destroy()
+            sys.exit(1)
+
+    def preload_downloader(self):
+        """Importuje yt-dlp w tle, zanim użytkownik wklei pierwszy link."""
+        threading.Thread(target=load_yt_dlp, name="ytwav-gui-preload", daemon=True).start()
+    
     def download_audio(self):
-        """Handler przycisku pobierania."""
+        """Handler przycisku pobierania - dodaje link do kolejki zadań."""
         url = self.url_entry.get().strip()
-        
+
         # Sprawdzenie czy URL został podany
         if not url:
             messagebox.showwarning(
@@ -104,58 +185,194 @@ class YTWavGUI:
                 "Proszę wkleić link YouTube do pobrania."
             )
             return
-            
-        # Sprawdzenie czy to prawidłowy URL YouTube
-        youtube_domains = ['youtube.com', 'youtu.be', 'm.youtube.com', 'www.youtube.com']
-        if not any(domain in url for domain in youtube_domains):
+
+        # Sprawdzenie czy to prawidłowy URL YouTube (host i ID, bez sieci)
+        if parse_youtube_url(url) is None:
             messagebox.showwarning(
                 "Nieprawidłowy link",
                 "To nie wygląda na prawidłowy link YouTube."
             )
             return
-            
-        # Wyłączenie przycisku podczas pobierania
-        download_btn = None
-        for widget in self.root.winfo_children():
-            if isinstance(widget, tk.Button):
-                download_btn = widget
-                break
-                
-        if download_btn:
-            download_btn.config(state="disabled", text="Pobieranie...")
-            
-        self.root.update()
+
+        if parse_youtube_url(url)[0] != 'video':
+            messagebox.showwarning(
+                "Playlista",
+                "Playlisty i kanały pobiera CLI:\npython3 ytdl_wav.py \"<link>\" --items 1-50"
+            )
+            return
         
-        try:
-            # Wywołanie funkcji pobierania
-            success = download_wav(url, "wav_out")
-            
-            if success:
-                messagebox.showinfo(
-                    "Sukces",
-                    "Audio zostało pomyślnie pobrane i zapisane jako WAV!\n\n"
-                    "Lokalizacja: wav_out/"
+        job = self.add_job_row(url)
+        self.job_queue.put(job)
+
+        # Wyczyść pole tekstowe - można od razu wkleić kolejny link
+        self.url_entry.delete(0, tk.END)
+        self.update_status()
+
+    def add_job_row(self, url: str) -> dict:
+        """Tworzy wiersz zadania: link, pasek postępu, status i przycisk anulowania."""
+        job_id = next(self.job_ids)
+        row = tk.Frame(self.jobs_frame)
+        row.pack(fill="x", pady=1)
+
+        short_url = url if len(url) <= 28 else url[:25] + "..."
+        tk.Label(row, text=short_url, font=("Arial", 8), width=24, anchor="w").pack(side="left")
+        progress = ttk.Progressbar(row, length=140, mode="determinate", maximum=100)
+        progress.pack(side="left", padx=4)
+        status = tk.Label(row, text="W kolejce", font=("Arial", 8), width=11, anchor="w")
+        status.pack(side="left")
+        cancel_btn = tk.Button(
+            row,
+            text="✕",
+            font=("Arial", 8),
+            width=2,
+            command=lambda: self.cancel_job(job_id)
+        )
+        cancel_btn.pack(side="left")
+
+        job = {
+            'id': job_id,
+            'url': url,
+            'state': 'queued',
+            'cancel': threading.Event(),
+            'progress': progress,
+            'status': status,
+            'cancel_btn': cancel_btn,
+        }
+        self.jobs[job_id] = job
+        return job
+
+    def cancel_job(self, job_id: int):
+        """Anuluje zadanie - oczekujące od razu, trwające przy najbliższym postępie."""
+        job = self.jobs.get(job_id)
+        if not job or job['state'] in ('done', 'failed', 'cancelled'):
+            return
+        job['cancel'].set()
+        job['status'].config(text="Anulowanie...")
+        job['cancel_btn'].config(state="disabled")
+
+    def worker_loop(self):
+        """Wątek roboczy: pobiera zadania po kolei. Nie dotyka widgetów Tk."""
+        while True:
+            job = self.job_queue.get()
+            if job is None:
+                break
+            job_id = job['id']
+            if job['cancel'].is_set():
+                self.events.put((job_id, 'cancelled', None))
+                continue
+
+            self.events.put((job_id, 'started', None))
+            if self.service is not None:
+                self.run_remote_job(job)
+                continue
+            try:
+                success = download_wav(
+                    job['url'],
+                    "wav_out",
+                    progress_callback=lambda progress, job_id=job_id: self.events.put(
+                        (job_id, 'progress', progress)
+                    ),
+                    cancel_event=job['cancel']
                 )
-                # Wyczyść pole tekstowe po sukcesie
-                self.url_entry.delete(0, tk.END)
+                self.events.put((job_id, 'done' if success else 'failed', None))
+            except DownloadCancelled:
+                self.events.put((job_id, 'cancelled', None))
+            except Exception as e:
+                self.events.put((job_id, 'failed', str(e)))
+
+    def run_remote_job(self, job: dict):
+        """Zgłasza zadanie do usługi i tłumaczy jej strumień na zdarzenia GUI."""
+        job_id = job['id']
+        try:
+            remote_id = self.service.submit([job['url']], {'out': os.path.abspath("wav_out")})['jobs'][0]['id']
+            cancel_sent = False
+            for event in self.service.events([remote_id]):
+                # Heartbeat co ~1 s pozwala przekazać anulowanie
+                if job['cancel'].is_set() and not cancel_sent:
+                    self.service.cancel(remote_id)
+                    cancel_sent = True
+                if 'heartbeat' in event:
+                    continue
+                if event['state'] == 'running' and event['progress']:
+                    self.events.put((job_id, 'progress', event['progress']))
+                elif event['state'] in ('done', 'failed', 'cancelled'):
+                    self.events.put((job_id, event['state'], event['error']))
+                    return
+            self.events.put((job_id, 'failed', "Usługa zakończyła strumień zdarzeń"))
+        except (OSError, ValueError, IndexError) as e:
+            self.events.put((job_id, 'failed', f"Usługa: {e}"))
+
+    def poll_events(self):
+        """Obsługuje zdarzenia z wątku roboczego w ograniczonym budżecie czasu."""
+        deadline = time.perf_counter() + POLL_BUDGET_S
+        latest_progress = {}
+        try:
+            while time.perf_counter() < deadline:
+                job_id, kind, payload = self.events.get_nowait()
+                if kind == 'progress':
+                    # Wystarczy najnowszy postęp każdego zadania
+                    latest_progress[job_id] = payload
+                else:
+                    latest_progress.pop(job_id, None)
+                    self.apply_event(job_id, kind, payload)
+        except queue.Empty:
+            pass
+        for job_id, payload in latest_progress.items():
+            self.apply_event(job_id, 'progress', payload)
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
+
+    def apply_event(self, job_id: int, kind: str, payload):
+        """Aktualizuje wiersz zadania na podstawie zdarzenia."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        progress, status = job['progress'], job['status']
+
+        if kind == 'started':
+            job['state'] = 'running'
+            status.config(text="Pobieranie")
+        elif kind == 'progress':
+            if payload['stage'] == 'convert':
+                if progress['mode'] != 'indeterminate':
+                    progress.config(mode='indeterminate')
+                    progress.start(15)
+                status.config(text="Konwersja")
+            elif payload['fraction'] is not None:
+                progress['value'] = payload['fraction'] * 100
+                status.config(text=f"{payload['fraction'] * 100:.0f}%")
+        else:
+            job['state'] = kind
+            progress.stop()
+            progress.config(mode='determinate')
+            job['cancel_btn'].config(state="disabled")
+            if kind == 'done':
+                progress['value'] = 100
+                status.config(text="✔ Gotowe")
+            elif kind == 'cancelled':
+                progress['value'] = 0
+                status.config(text="Anulowano")
             else:
-                messagebox.showerror(
-                    "Błąd pobierania",
-                    "Nie udało się pobrać audio.\n\n"
-                    "Sprawdź link YouTube i połączenie internetowe."
-                )
-                
-        except Exception as e:
-            messagebox.showerror(
-                "Nieoczekiwany błąd",
-                f"Wystąpił błąd podczas pobierania:\n\n{str(e)}"
-            )
-            
-        finally:
-            # Przywrócenie przycisku
-            if download_btn:
-                download_btn.config(state="normal", text="Pobierz")
-                
+                status.config(text="✖ Błąd")
+        self.update_status()
+        if kind == 'failed' and payload:
+            self.status_label.config(text=f"Błąd: {payload[:70]}")
+
+    def update_status(self):
+        """Pokazuje w pasku statusu liczbę zadań w toku."""
+        active = sum(1 for job in self.jobs.values() if job['state'] in ('queued', 'running'))
+        location = "Lokalizacja: wav_out/" + (" (usługa)" if self.service is not None else "")
+        if active:
+            self.status_label.config(text=f"W kolejce/w toku: {active} • {location}")
+        else:
+            self.status_label.config(text=location)
+
+    def on_close(self):
+        """Zamyka okno, anulując zadania w toku."""
+        for job in self.jobs.values():
+            job['cancel'].set()
+        self.job_queue.put(None)
+        self.root.destroy()
+
     def run(self):
         """Uruchamia główną pętlę GUI."""
         self.root.mainloop()
@@ -174,4 +391,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+YTWAV - Metryki wydajności
+Czasy etapów (ekstrakcja, pobieranie, konwersja, sen przy retry), przepustowość
+i liczba ponowień dla każdego URL-a. Eksport do JSON Lines (rekord na URL)
+oraz do pliku tekstowego Prometheusa (textfile collector node exportera).
+
+Autor: Senior Python Developer
+Licencja: MIT
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+
+# Etapy mierzone dla każdego URL-a
+STAGES = ('extract', 'download', 'postprocess', 'convert', 'stream')
+
+
+class UrlMetrics:
+    """Pomiary jednego URL-a. Wypełniane z wątków pobierania i konwersji."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.stages = {}
+        self.bytes = 0
+        self.attempts = 0
+        self.throttles = 0
+        self.limiter_wait = 0.0
+        self.backoff_sleep = 0.0
+        self.status = None
+        self.duration = None
+        # Klasa ostatniego błędu (permanent, transient, throttled, environment)
+        self.error_class = None
+        # Znacznik wywołania yt-dlp - pierwszy hook postępu kończy ekstrakcję
+        self._call_started = None
+        self._download_started = None
+        self._postprocess_started = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + max(0.0, seconds)
+
+    def add_bytes(self, count: int):
+        with self._lock:
+            self.bytes += count
+
+    def add_sleep(self, seconds: float, kind: str = 'backoff'):
+        with self._lock:
+            if kind == 'limiter':
+                self.limiter_wait += seconds
+            else:
+                self.backoff_sleep += seconds
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    def begin_call(self):
+        """Początek wywołania yt-dlp (ekstrakcja + ewentualne pobieranie)."""
+        self._call_started = time.perf_counter()
+        self._download_started = None
+
+    def end_call(self):
+        """Koniec wywołania yt-dlp. Bez hooka pobierania całość to ekstrakcja."""
+        if self._call_started is not None and self._download_started is None:
+            self.add_stage('extract', time.perf_counter() - self._call_started)
+        self._call_started = None
+
+    def on_progress(self, status: dict):
+        """Obsługa progress_hooks yt-dlp: granica ekstrakcja/pobieranie i bajty."""
+        now = time.perf_counter()
+        state = status.get('status')
+        if state == 'downloading' and self._download_started is None:
+            self._download_started = now
+            if self._call_started is not None:
+                self.add_stage('extract', now - self._call_started)
+        elif state == 'finished':
+            if self._download_started is not None:
+                self.add_stage('download', now - self._download_started)
+            elif status.get('elapsed') is not None:
+                self.add_stage('download', status['elapsed'])
+            self.add_bytes(status.get('total_bytes') or status.get('downloaded_bytes') or 0)
+
+    def on_postprocess(self, status: dict):
+        """Obsługa postprocessor_hooks yt-dlp (np. naprawa kontenera m4a)."""
+        name = status.get('postprocessor')
+        if status.get('status') == 'started':
+            self._postprocess_started[name] = time.perf_counter()
+        elif status.get('status') == 'finished' and name in self._postprocess_started:
+            self.add_stage('postprocess', time.perf_counter() - self._postprocess_started.pop(name))
+
+    def throughput(self) -> Optional[float]:
+        """Bajty na sekundę w etapie sieciowym (pobieranie lub strumień)."""
+        seconds = self.stages.get('download') or self.stages.get('stream')
+        if not self.bytes or not seconds:
+            return None
+        return self.bytes / seconds
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            throughput = self.throughput()
+            return {
+                'time': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'),
+                'url': self.url,
+                'status': self.status,
+                'error_class': self.error_class,
+                'duration_s': round(self.duration, 4) if self.duration is not None else None,
+                'stages_s': {stage: round(seconds, 4) for stage, seconds in self.stages.items()},
+                'bytes': self.bytes,
+                'bytes_per_s': round(throughput, 1) if throughput else None,
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'throttles': self.throttles,
+                'limiter_wait_s': round(self.limiter_wait, 4),
+                'backoff_sleep_s': round(self.backoff_sleep, 4),
+            }
+
+
+class MetricsRecorder:
+    """Zbiera pomiary URL-i i eksportuje je po zakończeniu każdego z nich.
+
+    `jsonl_path` - dopisywany rekord JSON na URL,
+    `prom_path` - atomowo nadpisywany plik z licznikami w formacie Prometheusa
+    (skumulowane od startu procesu).
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None, prom_path: Optional[str] = None):
+        self.jsonl_path = Path(jsonl_path) if jsonl_path else None
+        self.prom_path = Path(prom_path) if prom_path else None
+        self.totals = {
+            'urls': {},
+            'error_classes': {},
+            'stage_seconds': {},
+            'stage_count': {},
+            'bytes': 0,
+            'retries': 0,
+            'throttles': 0,
+            'limiter_wait': 0.0,
+            'backoff_sleep': 0.0,
+            'last_throughput': 0.0,
+        }
+        self._lock = threading.Lock()
+
+    def begin(self, url: str) -> UrlMetrics:
+        return UrlMetrics(url)
+
+    def end(self, record: Optional[UrlMetrics], status: str):
+        """Zamyka pomiar URL-a (ponowne wywołanie nic nie robi) i eksportuje."""
+        if record is None:
+            return
+        with record._lock:
+            if record.status is not None:
+                return
+            record.status = status
+            record.duration = time.perf_counter() - record._started
+        data = record.to_dict()
+        with self._lock:
+            totals = self.totals
+            totals['urls'][status] = totals['urls'].get(status, 0) + 1
+            if status == 'failed' and record.error_class:
+                classes = totals['error_classes']
+                classes[record.error_class] = classes.get(record.error_class, 0) + 1
+            for stage, seconds in record.stages.items():
+                totals['stage_seconds'][stage] = totals['stage_seconds'].get(stage, 0.0) + seconds
+                totals['stage_count'][stage] = totals['stage_count'].get(stage, 0) + 1
+            totals['bytes'] += record.bytes
+            totals['retries'] += record.retries
+            totals['throttles'] += record.throttles
+            totals['limiter_wait'] += record.limiter_wait
+            totals['backoff_sleep'] += record.backoff_sleep
+            if data['bytes_per_s']:
+                totals['last_throughput'] = data['bytes_per_s']
+            if self.jsonl_path is not None:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(data, ensure_ascii=False) + '\n')
+            if self.prom_path is not None:
+                self.write_prometheus()
+
+    def render_prometheus(self) -> str:
+        """Liczniki w formacie tekstowym Prometheusa (wywoływane pod blokadą)."""
+        totals = self.totals
+        lines = [
+            '# HELP ytwav_urls_total Przetworzone URL-e według wyniku.',
+            '# TYPE ytwav_urls_total counter',
+        ]
+        for status, count in sorted(totals['urls'].items()):
+            lines.append(f'ytwav_urls_total{{status="{status}"}} {count}')
+        lines += [
+            '# HELP ytwav_failures_total Nieudane URL-e według klasy błędu.',
+            '# TYPE ytwav_failures_total counter',
+        ]
+        for error_class, count in sorted(totals['error_classes'].items()):
+            lines.append(f'ytwav_failures_total{{class="{error_class}"}} {count}')
+        lines += [
+            '# HELP ytwav_stage_seconds Czas spędzony w etapach przetwarzania.',
+            '# TYPE ytwav_stage_seconds summary',
+        ]
+        for stage in sorted(totals['stage_seconds']):
+            lines.append(f'ytwav_stage_seconds_sum{{stage="{stage}"}} {totals["stage_seconds"][stage]:.6f}')
+            lines.append(f'ytwav_stage_seconds_count{{stage="{stage}"}} {totals["stage_count"][stage]}')
+        lines += [
+            '# HELP ytwav_downloaded_bytes_total Pobrane bajty źródłowe.',
+            '# TYPE ytwav_downloaded_bytes_total counter',
+            f'ytwav_downloaded_bytes_total {totals["bytes"]}',
+            '# HELP ytwav_retries_total Ponowione próby pobrania.',
+            '# TYPE ytwav_retries_total counter',
+            f'ytwav_retries_total {totals["retries"]}',
+            '# HELP ytwav_throttles_total Blokady 403/429 zgłoszone przez serwer.',
+            '# TYPE ytwav_throttles_total counter',
+            f'ytwav_throttles_total {totals["throttles"]}',
+            '# HELP ytwav_sleep_seconds_total Czas uśpienia przed kolejnymi próbami.',
+            '# TYPE ytwav_sleep_seconds_total counter',
+            f'ytwav_sleep_seconds_total{{reason="limiter"}} {totals["limiter_wait"]:.6f}',
+            f'ytwav_sleep_seconds_total{{reason="backoff"}} {totals["backoff_sleep"]:.6f}',
+            '# HELP ytwav_last_throughput_bytes_per_second Przepustowość ostatniego pobrania.',
+            '# TYPE ytwav_last_throughput_bytes_per_second gauge',
+            f'ytwav_last_throughput_bytes_per_second {totals["last_throughput"]:.1f}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self):
+        # Zapis atomowy - node exporter nie może przeczytać połowy pliku
+        partial = self.prom_path.with_name(self.prom_path.name + '.part')
+        partial.write_text(self.render_prometheus(), encoding='utf-8')
+        os.replace(partial, self.prom_path)
+
+    def summary(self) -> dict:
+        """Skumulowane liczniki (kopia) - np. do podsumowania w logu."""
+        with self._lock:
+            return json.loads(json.dumps(self.totals))
+
+
+@contextmanager
+def timed(record: Optional[UrlMetrics], stage: str):
+    """Mierzy czas bloku jako etap `stage` (nic nie robi bez rekordu)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if record is not None:
+            record.add_stage(stage, time.perf_counter() - started)
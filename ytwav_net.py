@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+YTWAV - Sterowanie ruchem sieciowym
+Wspólny dla procesu limiter zapytań (token bucket), polityka backoffu z jitterem
+oraz klasyfikacja błędów pobierania z polityką ponawiania dla każdej klasy.
+
+Autor: Senior Python Developer
+Licencja: MIT
+"""
+
+import errno
+import random
+import threading
+import time
+from typing import Optional, Union
+
+
+# Klasy błędów pobierania
+ERROR_CLASSES = ('permanent', 'transient', 'throttled', 'environment')
+
+# Fragmenty komunikatów (małe litery) rozpoznające klasę błędu. Kolejność
+# sprawdzania: środowisko, blokada, błąd trwały - reszta jest przejściowa
+ENVIRONMENT_MARKERS = (
+    'no space left on device', 'disk quota exceeded', 'read-only file system',
+    'permission denied', 'ffmpeg not found', 'ffprobe and ffmpeg not found',
+    'ffmpeg is not installed', 'certificate verify failed',
+)
+THROTTLE_MARKERS = (
+    'http error 403', 'forbidden', 'http error 429', 'too many requests',
+    "confirm you're not a bot", 'confirm you’re not a bot', 'rate-limited',
+)
+PERMANENT_MARKERS = (
+    'video unavailable', 'private video', 'video is private', 'has been removed',
+    'no longer available', 'account associated with this video has been terminated',
+    'sign in to confirm your age', 'age-restricted', 'inappropriate for some users',
+    'not available in your country', 'blocked it in your country', 'geo restriction',
+    'uploader has not made this video available', 'members-only', 'join this channel',
+    'incomplete youtube id', 'is not a valid url', 'unsupported url',
+    # Tylko sformułowania YouTube - samo "does not exist" łapie też np. brak katalogu tymczasowego
+    'http error 404', 'http error 410', 'this video does not exist',
+    'playlist does not exist', 'this channel does not exist',
+    'requested format is not available', 'this live event will begin', 'premieres in',
+)
+# Kody errno błędów systemu, których ponowienie nie naprawi
+ENVIRONMENT_ERRNOS = {errno.ENOSPC, errno.EDQUOT, errno.EROFS, errno.EACCES, errno.EPERM}
+
+# Klasa -> polityka ponawiania:
+#   attempts  - liczba prób (None = wszystkie strategie User-Agent),
+#   pause     - przerwa przed kolejną próbą: 'backoff' (tylko ten URL)
+#               albo 'cooldown' (grupowa pauza limitera, zgłaszana przez on_throttle),
+#   extractor - czy wyczerpanie prób świadczy o uszkodzonym extractorze
+#               (bezpiecznik i aktualizacja yt-dlp)
+RETRY_POLICIES = {
+    'permanent': {'attempts': 1, 'pause': None, 'extractor': False},
+    'environment': {'attempts': 1, 'pause': None, 'extractor': False},
+    'throttled': {'attempts': None, 'pause': 'cooldown', 'extractor': False},
+    'transient': {'attempts': None, 'pause': 'backoff', 'extractor': True},
+}
+
+
+def classify_error(error: Union[BaseException, str], default: str = 'transient') -> str:
+    """Klasa błędu: 'permanent', 'transient', 'throttled' albo 'environment'.
+
+    Przyjmuje wyjątek albo sam komunikat. Dla wyjątku sprawdzany jest cały
+    łańcuch przyczyn (np. OSError opakowany przez DownloadError yt-dlp).
+    Nierozpoznany błąd dostaje klasę `default`.
+    """
+    chain = []
+    while isinstance(error, BaseException) and error not in chain:
+        chain.append(error)
+        error = error.__cause__ or error.__context__ or (getattr(error, 'exc_info', None) or (None, None))[1]
+    if any(isinstance(item, OSError) and item.errno in ENVIRONMENT_ERRNOS for item in chain):
+        return 'environment'
+    message = ' '.join(str(item) for item in chain or [error]).lower()
+    for markers, error_class in ((ENVIRONMENT_MARKERS, 'environment'),
+                                 (THROTTLE_MARKERS, 'throttled'),
+                                 (PERMANENT_MARKERS, 'permanent')):
+        if any(marker in message for marker in markers):
+            return error_class
+    return default
+
+
+class MonotonicClock:
+    """Zegar systemowy. W testach można podstawić zegar z tymi samymi metodami."""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class BackoffPolicy:
+    """Wykładniczy backoff z jitterem ("equal jitter").
+
+    Opóźnienie dla próby n to połowa z min(cap, base * factor^(n-1)) plus
+    losowa reszta z drugiej połowy - rośnie wykładniczo, ale równoległe
+    wątki nie budzą się w tym samym momencie.
+    """
+
+    def __init__(self, base: float = 1.0, factor: float = 2.0, cap: float = 60.0,
+                 rng: Optional[random.Random] = None):
+        self.base = base
+        self.factor = factor
+        self.cap = cap
+        self.rng = rng or random.Random()
+
+    def delay(self, attempt: int) -> float:
+        ceiling = min(self.cap, self.base * (self.factor ** max(0, attempt - 1)))
+        half = ceiling / 2
+        return half + self.rng.uniform(0, half)
+
+
+class RateLimiter:
+    """Adaptacyjny token bucket współdzielony przez wszystkie wątki procesu.
+
+    W zdrowym stanie przepuszcza zapytania bez czekania (do `burst` naraz,
+    potem `rate` na sekundę). Po zgłoszeniu blokady (403/429) przez
+    dowolny wątek cała grupa wstrzymuje się na czas backoffu, a tempo jest
+    zmniejszane o połowę; kolejne sukcesy stopniowo je przywracają (AIMD).
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 3, min_rate: float = 0.05,
+                 increase: float = 0.1, backoff: Optional[BackoffPolicy] = None,
+                 clock: Optional[MonotonicClock] = None):
+        if not rate > 0:
+            raise ValueError(f"Tempo zapytań musi być większe od zera: {rate}")
+        self.clock = clock or MonotonicClock()
+        self.backoff = backoff or BackoffPolicy(base=4.0, cap=120.0)
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.increase = increase
+        self.tokens = float(burst)
+        self.cooldown_until = 0.0
+        self.throttle_streak = 0
+        self.throttle_count = 0
+        self.total_wait = 0.0
+        self._updated = self.clock.now()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self._updated)
+        self.tokens = min(float(self.burst), self.tokens + elapsed * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Rezerwuje żeton i zwraca czas, który trzeba odczekać (bez czekania)."""
+        with self._lock:
+            now = self.clock.now()
+            self._refill(now)
+            self.tokens -= 1
+            wait = 0.0
+            if self.tokens < 0:
+                wait = -self.tokens / self.rate
+            wait = max(wait, self.cooldown_until - now)
+            self.total_wait += wait
+            return wait
+
+    def acquire(self) -> float:
+        """Czeka na swoją kolej. Zwraca czas oczekiwania w sekundach."""
+        wait = self.reserve()
+        self.clock.sleep(wait)
+        return wait
+
+    def on_throttle(self) -> float:
+        """Zgłasza blokadę (403/429): grupowy cooldown i zmniejszenie tempa."""
+        with self._lock:
+            now = self.clock.now()
+            self._refill(now)
+            self.throttle_streak += 1
+            self.throttle_count += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            delay = self.backoff.delay(self.throttle_streak)
+            self.cooldown_until = max(self.cooldown_until, now + delay)
+            self.tokens = min(self.tokens, 0.0)
+            return delay
+
+    def on_success(self):
+        """Zgłasza udane zapytanie: stopniowy powrót do pełnego tempa."""
+        with self._lock:
+            self.throttle_streak = 0
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'throttle_count': self.throttle_count,
+                'total_wait': self.total_wait,
+            }
+
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(rate: Optional[float] = None) -> RateLimiter:
+    """Zwraca limiter współdzielony przez cały proces (tworzony przy pierwszym użyciu)."""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(rate=rate) if rate is not None else RateLimiter()
+        elif rate is not None:
+            if not rate > 0:
+                raise ValueError(f"Tempo zapytań musi być większe od zera: {rate}")
+            _shared_limiter.max_rate = rate
+            _shared_limiter.rate = min(_shared_limiter.rate, rate)
+        return _shared_limiter
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+YTWAV - Planowanie wsadu
+Kolejność zadań według długości materiału (np. najkrótsze najpierw) oraz
+dopuszczanie zadań tylko wtedy, gdy szacowany rozmiar wyjścia mieści się
+w wolnym miejscu na dysku i w limicie wsadu.
+
+Autor: Senior Python Developer
+Licencja: MIT
+"""
+
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+
+# Dostępne kolejności wsadu
+ORDERS = ('list', 'shortest', 'longest')
+
+# Górne oszacowanie bitrate'u źródła audio (m4a/webm ~128-160 kb/s) w B/s
+SOURCE_BYTES_PER_SECOND = 24000
+# Jak często czekające zadanie sprawdza ponownie wolne miejsce
+ADMISSION_POLL_INTERVAL = 2.0
+
+SIZE_UNITS = {'': 1, 'k': 1000, 'm': 1000 ** 2, 'g': 1000 ** 3, 't': 1000 ** 4}
+
+
+def parse_size(spec: str) -> int:
+    """Parsuje rozmiar, np. "500M", "20G", "1.5T" (jednostki dziesiętne) -> bajty."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kmgt]?)b?\s*', spec.lower())
+    if not match:
+        raise ValueError(f"Nieprawidłowy rozmiar: {spec!r} (np. 500M, 20G)")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def format_size(size: float) -> str:
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if abs(size) < 1000:
+            return f"{size:.1f} {unit}"
+        size /= 1000
+    return f"{size:.1f} TB"
+
+
+def estimate_output_size(duration: Optional[float], profiles: List[tuple],
+                         with_source: bool = True) -> Optional[int]:
+    """Szacowany rozmiar na dysku: czas × sample rate × kanały × bajty próbki.
+
+    Sumuje wszystkie profile wyjściowe i plik źródłowy (istnieje do końca
+    konwersji albo zostaje przy --keep-src; bez niego w trybie strumieniowym).
+    None, gdy długość nieznana.
+    """
+    if not duration:
+        return None
+    size = sum(duration * sr * ch * (bit // 8) + 4096 for sr, ch, bit in profiles)
+    if with_source:
+        size += duration * SOURCE_BYTES_PER_SECOND
+    return int(size)
+
+
+def order_jobs(jobs: List[tuple], order: str) -> List[tuple]:
+    """Sortuje pary (pozycja, długość). Nieznana długość trafia na koniec.
+
+    Sortowanie jest stabilne - przy równych długościach zostaje kolejność listy.
+    """
+    if order == 'list':
+        return list(jobs)
+    if order not in ORDERS:
+        raise ValueError(f"Nieznana kolejność: {order}")
+    known = [job for job in jobs if job[1]]
+    unknown = [job for job in jobs if not job[1]]
+    known.sort(key=lambda job: job[1], reverse=(order == 'longest'))
+    return known + unknown
+
+
+class DiskBudget:
+    """Dopuszczanie zadań według wolnego miejsca i limitu (quota) wsadu.
+
+    Zadanie rezerwuje szacowany rozmiar przed startem i zwalnia rezerwację
+    po zakończeniu. Gdy miejsca brakuje, `reserve` czeka, aż trwające
+    zadania się skończą. Zadanie, które nie zmieściłoby się nawet bez
+    innych w toku, jest odrzucane od razu - zamiast przerwać się w połowie
+    pliku na pełnym dysku.
+    """
+
+    def __init__(self, path: Path, min_free: int = 0, quota: Optional[int] = None,
+                 poll_interval: float = ADMISSION_POLL_INTERVAL):
+        self.path = Path(path)
+        self.min_free = min_free
+        self.quota = quota
+        self.poll_interval = poll_interval
+        self.reserved = 0
+        self.admitted = 0
+        self.in_flight = 0
+        self._changed = threading.Condition()
+
+    def free_space(self) -> int:
+        return shutil.disk_usage(self.path).free
+
+    def _refusal(self, size: int) -> Optional[str]:
+        """Powód, dla którego zadania nie da się dopuścić teraz (albo None)."""
+        if self.quota is not None and self.admitted + size > self.quota:
+            return (f"limit wsadu {format_size(self.quota)} "
+                    f"(wykorzystano {format_size(self.admitted)})")
+        available = self.free_space() - self.min_free - self.reserved
+        if size > available:
+            return f"wolne miejsce {format_size(max(0, available))}"
+        return None
+
+    def reserve(self, size: Optional[int]) -> Optional[str]:
+        """Rezerwuje `size` bajtów, czekając na miejsce. Zwraca None albo powód odmowy.
+
+        Nieznany rozmiar (brak długości) jest dopuszczany bez rezerwacji.
+        """
+        size = size or 0
+        with self._changed:
+            while True:
+                reason = self._refusal(size) if size else None
+                if reason is None:
+                    self.reserved += size
+                    self.admitted += size
+                    self.in_flight += 1
+                    return None
+                quota_exceeded = self.quota is not None and self.admitted + size > self.quota
+                # Bez zadań w toku nic nie zwolni miejsca; limit wsadu nigdy nie rośnie
+                if self.in_flight == 0 or quota_exceeded:
+                    return reason
+                self._changed.wait(timeout=self.poll_interval)
+
+    def release(self, size: Optional[int]):
+        """Zwalnia rezerwację zakończonego zadania (zapisane pliki są już na dysku)."""
+        with self._changed:
+            self.reserved = max(0, self.reserved - (size or 0))
+            self.in_flight = max(0, self.in_flight - 1)
+            self._changed.notify_all()
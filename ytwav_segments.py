@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+YTWAV - Pobieranie wielosegmentowe (HTTP Range)
+Długi plik źródłowy jest dzielony na zakresy bajtów pobierane równolegle
+kilkoma połączeniami - limit prędkości pojedynczego połączenia przestaje
+ograniczać czas pobrania. Każdy segment zapisuje dane wprost w swoje miejsce
+pliku (os.pwrite), więc nie ma sklejania części ani dodatkowych kopii.
+Liczba połączeń zależy od rozmiaru pliku, a połączenie, które skończy swój
+segment, przejmuje połowę największego pozostałego (work stealing).
+
+Autor: Senior Python Developer
+Licencja: MIT
+"""
+
+import os
+import re
+import threading
+import urllib.request
+from http.client import HTTPException
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from ytwav_net import BackoffPolicy
+
+
+# Domyślna maksymalna liczba połączeń na plik: 1 - pobiera yt-dlp, tryb wielosegmentowy
+# trzeba włączyć jawnie (omija downloader i poprawki kontenera yt-dlp)
+DEFAULT_CONNECTIONS = 1
+# Najmniejsza porcja pliku na połączenie - mniejsze pliki idą jednym połączeniem
+SEGMENT_MIN_SIZE = 4 * 1024 * 1024
+# Segment z mniejszą resztą nie jest już dzielony
+SPLIT_MIN_SIZE = 1024 * 1024
+# Rozmiar odczytu z gniazda
+READ_CHUNK_SIZE = 256 * 1024
+# Ponowienia jednego segmentu (wznawiane od ostatniego zapisanego bajtu)
+SEGMENT_RETRIES = 5
+# Limit czasu pojedynczego zapytania / odczytu
+REQUEST_TIMEOUT = 20.0
+# Jak często wątek wywołujący raportuje postęp i sprawdza anulowanie
+PROGRESS_INTERVAL = 0.2
+# Dopisek pliku tymczasowego (inny niż .part yt-dlp - nie jest wznawiany liniowo)
+PARTIAL_SUFFIX = '.seg'
+
+SEGMENTED_SUPPORTED = hasattr(os, 'pwrite')
+CONTENT_RANGE_RE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+class RangeNotSupported(Exception):
+    """Serwer nie obsługuje zapytań Range - plik trzeba pobrać jednym połączeniem."""
+
+
+class SegmentError(Exception):
+    """Segment nie został pobrany mimo ponowień."""
+
+
+def plan_connections(size: Optional[int], max_connections: int,
+                     min_segment: int = SEGMENT_MIN_SIZE) -> int:
+    """Liczba połączeń dla pliku: po jednym na `min_segment` bajtów, maks. `max_connections`."""
+    if not size or max_connections <= 1:
+        return 1
+    return max(1, min(max_connections, size // min_segment))
+
+
+def open_range(url: str, headers: Dict[str, str], start: int, end: int,
+               timeout: float = REQUEST_TIMEOUT):
+    """Otwiera zapytanie o bajty [start, end). Rzuca RangeNotSupported bez odpowiedzi 206."""
+    request = urllib.request.Request(url, headers={**headers, 'Range': f"bytes={start}-{end - 1}"})
+    response = urllib.request.urlopen(request, timeout=timeout)
+    if response.status != 206:
+        response.close()
+        raise RangeNotSupported(f"serwer odpowiedział {response.status} na zapytanie Range")
+    match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+    if not match or int(match.group(1)) != start:
+        response.close()
+        raise RangeNotSupported("brak lub niezgodny nagłówek Content-Range")
+    return response
+
+
+def probe_size(url: str, headers: Dict[str, str], timeout: float = REQUEST_TIMEOUT) -> int:
+    """Rozmiar pliku z odpowiedzi na `Range: bytes=0-0` (sprawdza też obsługę Range)."""
+    with open_range(url, headers, 0, 1, timeout) as response:
+        total = CONTENT_RANGE_RE.match(response.headers['Content-Range']).group(3)
+        response.read()
+    if total == '*':
+        raise RangeNotSupported("serwer nie podał rozmiaru pliku")
+    return int(total)
+
+
+class Segment:
+    """Zakres [start, end) pliku; `pos` to pierwszy jeszcze niezapisany bajt."""
+
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.end = end
+        self.pos = start
+
+    @property
+    def remaining(self) -> int:
+        return self.end - self.pos
+
+
+class SegmentedDownload:
+    """Pobranie jednego pliku kilkoma połączeniami HTTP Range.
+
+    `run()` działa w wątku wywołującym: uruchamia wątki połączeń, co
+    PROGRESS_INTERVAL woła `on_progress(pobrane, rozmiar)` (wyjątek z niego,
+    np. anulowanie, przerywa pobieranie) i czeka na koniec. Plik powstaje
+    pod nazwą z dopiskiem PARTIAL_SUFFIX i jest przenoszony na miejsce
+    dopiero w całości.
+    """
+
+    def __init__(self, url: str, headers: Dict[str, str], path: Path, size: int,
+                 connections: int, retries: int = SEGMENT_RETRIES,
+                 backoff: Optional[BackoffPolicy] = None,
+                 on_progress: Optional[Callable[[int, int], None]] = None,
+                 opener: Callable = open_range):
+        self.url = url
+        self.headers = dict(headers)
+        self.path = Path(path)
+        self.size = size
+        self.connections = max(1, connections)
+        self.retries = retries
+        self.backoff = backoff or BackoffPolicy(base=0.5, cap=8.0)
+        self.on_progress = on_progress
+        self.opener = opener
+        self.downloaded = 0
+        self.segment_retries = 0
+        self.splits = 0
+        self.error = None
+        self._segments = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def initial_segments(self) -> list:
+        step = self.size // self.connections
+        bounds = [index * step for index in range(self.connections)] + [self.size]
+        return [Segment(bounds[index], bounds[index + 1]) for index in range(self.connections)]
+
+    def steal(self) -> Optional[Segment]:
+        """Odcina drugą połowę segmentu z największą resztą (wywoływane pod blokadą)."""
+        victim = max(self._segments, key=lambda segment: segment.remaining, default=None)
+        if victim is None or victim.remaining < 2 * SPLIT_MIN_SIZE:
+            return None
+        middle = victim.pos + victim.remaining // 2
+        segment = Segment(middle, victim.end)
+        victim.end = middle
+        self._segments.append(segment)
+        self.splits += 1
+        return segment
+
+    def fetch_segment(self, fd: int, segment: Segment):
+        """Pobiera segment do końca, z ponowieniami od ostatniego zapisanego bajtu."""
+        failures = 0
+        while not self._stop.is_set():
+            with self._lock:
+                if segment.remaining <= 0:
+                    return
+                start, end = segment.pos, segment.end
+            try:
+                with self.opener(self.url, self.headers, start, end) as response:
+                    while not self._stop.is_set():
+                        chunk = response.read(READ_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        with self._lock:
+                            # Koniec segmentu mógł się przesunąć (podział) - zapis tylko do niego
+                            count = min(len(chunk), segment.end - segment.pos)
+                            offset = segment.pos
+                            segment.pos += count
+                            self.downloaded += count
+                        if count > 0:
+                            os.pwrite(fd, memoryview(chunk)[:count], offset)
+                        if count < len(chunk) or segment.remaining <= 0:
+                            break
+                with self._lock:
+                    if segment.remaining <= 0:
+                        return
+                # Połączenie zamknięte przed końcem zakresu - ponów od bieżącej pozycji
+                raise SegmentError(f"przerwany zakres {start}-{end - 1}")
+            except RangeNotSupported:
+                raise
+            except (OSError, HTTPException, SegmentError) as e:
+                # Licznik dotyczy kolejnych prób bez postępu
+                failures = 1 if segment.pos > start else failures + 1
+                with self._lock:
+                    self.segment_retries += 1
+                if failures > self.retries:
+                    raise SegmentError(f"segment {segment.start}-{segment.end - 1}: {e}") from e
+                self._stop.wait(self.backoff.delay(failures))
+
+    def worker(self, fd: int, segment: Segment):
+        try:
+            while segment is not None and not self._stop.is_set():
+                self.fetch_segment(fd, segment)
+                with self._lock:
+                    segment = self.steal()
+        except Exception as e:
+            with self._lock:
+                if self.error is None:
+                    self.error = e
+            self._stop.set()
+
+    def run(self) -> Path:
+        """Pobiera cały plik. Zwraca ścieżkę docelową; przy błędzie usuwa plik tymczasowy."""
+        partial = self.path.with_name(self.path.name + PARTIAL_SUFFIX)
+        fd = os.open(partial, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        completed = False
+        try:
+            os.ftruncate(fd, self.size)
+            self._segments = self.initial_segments()
+            threads = [
+                threading.Thread(target=self.worker, args=(fd, segment),
+                                 name=f"ytwav-segment-{index}", daemon=True)
+                for index, segment in enumerate(self._segments)
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                while any(thread.is_alive() for thread in threads):
+                    # Błąd dowolnego połączenia ustawia _stop i budzi pętlę od razu
+                    self._stop.wait(PROGRESS_INTERVAL)
+                    if self._stop.is_set():
+                        break
+                    if self.on_progress is not None:
+                        self.on_progress(self.downloaded, self.size)
+            finally:
+                # Połączenia piszą do fd - trzeba na nie poczekać przed zamknięciem
+                self._stop.set()
+                for thread in threads:
+                    thread.join()
+            if self.error is not None:
+                raise self.error
+            if self.downloaded != self.size:
+                raise SegmentError(f"pobrano {self.downloaded} z {self.size} bajtów")
+            completed = True
+        finally:
+            os.close(fd)
+            if not completed:
+                partial.unlink(missing_ok=True)
+        os.replace(partial, self.path)
+        return self.path
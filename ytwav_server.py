@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""
+YTWAV - Usługa w tle (ytdl_wav serve)
+Długożyjący proces z ciepłym downloaderem i lokalnym API HTTP (tylko localhost).
+
+Każde wywołanie CLI płaci za start interpretera, import yt-dlp i rozgrzewkę
+extractorów. Usługa robi to raz, a klienci (CLI z --server, GUI) tylko
+zgłaszają zadania - zgłoszenie to jedno zapytanie HTTP i jeden zapis SQLite.
+
+API (JSON):
+  GET    /health              stan usługi i liczniki zadań
+  POST   /jobs                {"urls": [...], "options": {...}} -> {"jobs": [...], "rejected": [...]}
+                               (opcje: out, sr, ch, bit, stream, items, profiles, connections;
+                               `out` - ścieżka bezwzględna wewnątrz katalogu --output-root)
+  GET    /jobs[?state=&limit=] ostatnie zadania
+  GET    /jobs/<id>           stan zadania z bieżącym postępem
+  DELETE /jobs/<id>           anulowanie zadania
+  GET    /events?ids=1,2      strumień zmian (JSON Lines) do zakończenia zadań
+
+Strony WWW otwarte w przeglądarce mogą wysyłać zapytania na localhost, więc
+usługa przyjmuje tylko nagłówek Host wskazujący na nią samą, odrzuca obce
+Origin, a POST wymaga `Content-Type: application/json` (taki POST
+przeglądarka poprzedza zapytaniem CORS, na które usługa nie odpowiada).
+
+Autor: Senior Python Developer
+Licencja: MIT
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import urlparse, parse_qs
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8757
+DEFAULT_SERVER_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+
+# Opcje zadania przyjmowane przez API i ich wartości domyślne
+JOB_OPTIONS = {'out': None, 'sr': 48000, 'ch': 2, 'bit': 16, 'stream': False, 'items': None,
+               'profiles': None, 'connections': None}
+
+# Co ile sekund strumień zdarzeń wysyła linię, nawet bez zmian
+HEARTBEAT_INTERVAL = 1.0
+
+# Nazwy hosta, pod którymi usługa jest zawsze dostępna (nagłówki Host i Origin)
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+
+class DownloadService:
+    """Kolejka zadań obsługiwana przez wątki z ciepłymi downloaderami."""
+
+    def __init__(self, queue_path: Optional[str] = None, jobs: int = 1,
+                 output_root: Optional[str] = None):
+        from ytwav_store import JobQueue
+
+        self.store = JobQueue(queue_path)
+        # Zadania zapisują pliki tylko wewnątrz tego katalogu
+        self.output_root = os.path.realpath(output_root or os.getcwd())
+        self.jobs = max(1, jobs)
+        self.downloaders = {}
+        self.progress = {}
+        self.cancel_events = {}
+        self.version = 0
+        self.changed = threading.Condition()
+        self.stopping = threading.Event()
+        self.workers = []
+
+    def start(self):
+        for n in range(self.jobs):
+            worker = threading.Thread(target=self.worker_loop, name=f"ytwav-service-{n}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def stop(self):
+        self.stopping.set()
+        for cancel_event in list(self.cancel_events.values()):
+            cancel_event.set()
+        self.notify()
+        for worker in self.workers:
+            worker.join(timeout=5)
+        self.store.close()
+
+    def notify(self):
+        """Budzi wątki robocze i strumienie zdarzeń po każdej zmianie."""
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+
+    def get_downloader(self, options: dict):
+        """Ciepły downloader dla katalogu i profilu wyjściowego (tworzony raz)."""
+        from ytdl_wav import YTWavDownloader, parse_profiles
+
+        key = (options['out'], options['sr'], options['ch'], options['bit'], options['stream'],
+               options.get('profiles'), options.get('connections'))
+        with self.changed:
+            downloader = self.downloaders.get(key)
+            if downloader is None:
+                downloader = YTWavDownloader(
+                    output_dir=options['out'],
+                    sample_rate=options['sr'],
+                    channels=options['ch'],
+                    bit_depth=options['bit'],
+                    stream=options['stream'],
+                    profiles=parse_profiles(options['profiles']) if options.get('profiles') else None,
+                    **({'connections': options['connections']} if options.get('connections') else {})
+                )
+                self.downloaders[key] = downloader
+        return downloader
+
+    def output_dir(self, out) -> str:
+        """Katalog wyjściowy zadania: bezwzględny i wewnątrz `output_root`. Rzuca ValueError."""
+        if out is None:
+            return os.path.join(self.output_root, 'wav_out')
+        if not isinstance(out, str) or not os.path.isabs(out):
+            raise ValueError("Opcja out musi być ścieżką bezwzględną")
+        out = os.path.realpath(out)
+        if os.path.commonpath([out, self.output_root]) != self.output_root:
+            raise ValueError(f"Opcja out musi wskazywać katalog wewnątrz {self.output_root} "
+                             f"(zmień: serve --output-root)")
+        return out
+
+    def submit(self, urls: List[str], options: Optional[dict] = None,
+               parent: Optional[int] = None) -> dict:
+        """Waliduje (bez sieci) i kolejkuje linki. Duplikaty w zgłoszeniu są pomijane."""
+        from ytdl_wav import canonical_url, parse_profiles, parse_youtube_url, profile_requirements
+        from ytwav_caps import get_capabilities
+
+        merged = dict(JOB_OPTIONS)
+        for key, value in (options or {}).items():
+            if key not in JOB_OPTIONS:
+                raise ValueError(f"Nieznana opcja zadania: {key}")
+            merged[key] = value
+        merged['out'] = self.output_dir(merged['out'])
+        for key in ('sr', 'ch', 'bit'):
+            if not isinstance(merged[key], int) or isinstance(merged[key], bool):
+                raise ValueError(f"Opcja {key} musi być liczbą całkowitą")
+        # Te same zakresy co w CLI (--profiles) - klient nie utworzy sesji dla dowolnego profilu
+        parse_profiles(f"{merged['sr']}:{merged['ch']}:{merged['bit']}")
+        if merged['profiles'] is not None and not isinstance(merged['profiles'], str):
+            raise ValueError("Opcja profiles musi być tekstem, np. \"48000:2:16,44100:2:24\"")
+        if merged['connections'] is not None and (not isinstance(merged['connections'], int)
+                                                  or isinstance(merged['connections'], bool)
+                                                  or merged['connections'] < 1):
+            raise ValueError("Opcja connections musi być liczbą całkowitą >= 1")
+        profiles = parse_profiles(merged['profiles']) if merged['profiles'] else \
+            [(merged['sr'], merged['ch'], merged['bit'])]
+        # Nieobsługiwany profil odrzucany przy zgłoszeniu, nie po pobraniu
+        missing = get_capabilities().missing(profile_requirements(profiles), muxers=['wav'])
+        if missing:
+            raise ValueError(f"FFmpeg nie obsługuje profilu - brak: {', '.join(missing)}")
+
+        accepted, rejected = [], []
+        for url in urls:
+            parsed = parse_youtube_url(url)
+            if parsed is None:
+                rejected.append(url)
+            else:
+                accepted.append(canonical_url(*parsed))
+        accepted = list(dict.fromkeys(accepted))
+        ids = self.store.add(accepted, merged, parent=parent)
+        self.notify()
+        return {
+            'jobs': [{'id': job_id, 'url': url} for job_id, url in zip(ids, accepted)],
+            'rejected': rejected,
+        }
+
+    def cancel(self, job_id: int) -> Optional[dict]:
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job['state'] == 'queued':
+            self.store.update(job_id, 'cancelled')
+        elif job['state'] == 'running' and job_id in self.cancel_events:
+            self.cancel_events[job_id].set()
+        self.notify()
+        return self.status(job_id)
+
+    def status(self, job_id: int) -> Optional[dict]:
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        job['progress'] = self.progress.get(job_id)
+        return job
+
+    def worker_loop(self):
+        while not self.stopping.is_set():
+            job = self.store.claim()
+            if job is None:
+                with self.changed:
+                    self.changed.wait(timeout=1.0)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: dict):
+        from ytdl_wav import DownloadCancelled
+
+        job_id = job['id']
+        options = job['options']
+        cancel_event = threading.Event()
+        self.cancel_events[job_id] = cancel_event
+        self.notify()
+
+        def on_progress(progress: dict):
+            self.progress[job_id] = progress
+            self.notify()
+
+        try:
+            downloader = self.get_downloader(options)
+            if downloader.is_collection(job['url']):
+                # Playlista/kanał: wpisy trafiają do kolejki jako osobne zadania
+                count = 0
+                for url, error in downloader.iter_videos([job['url']], options.get('items')):
+                    if error is not None:
+                        raise RuntimeError(error)
+                    if cancel_event.is_set():
+                        raise DownloadCancelled("Rozwijanie anulowane")
+                    self.store.add([url], options, parent=job_id)
+                    count += 1
+                    self.notify()
+                self.store.update(job_id, 'done', output=f"{count} zadań")
+            elif downloader.is_done(job['url']):
+                self.store.update(job_id, 'done', output="archiwum")
+            elif downloader.download_audio(job['url'], progress_callback=on_progress,
+                                           cancel_event=cancel_event):
+                self.store.update(job_id, 'done')
+            else:
+                error_class = downloader.last_error_class() or 'transient'
+                self.store.update(job_id, 'failed', error=f"Pobieranie nie powiodło się ({error_class})")
+        except DownloadCancelled:
+            self.store.update(job_id, 'cancelled')
+        except Exception as e:
+            self.store.update(job_id, 'failed', error=str(e))
+        finally:
+            self.cancel_events.pop(job_id, None)
+            self.progress.pop(job_id, None)
+            self.notify()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Obsługa zapytań API. `self.server.service` to DownloadService."""
+
+    server_version = "ytwav-serve"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def is_trusted(self) -> bool:
+        """Czy zapytanie pochodzi od lokalnego klienta, a nie od obcej strony w przeglądarce.
+
+        Host spoza listy oznacza DNS rebinding, a Origin spoza listy - stronę,
+        która wysyła zapytanie z przeglądarki użytkownika (klienci CLI i GUI
+        nie wysyłają Origin). Odrzucone zapytanie dostaje 403.
+        """
+        allowed = self.server.allowed_hosts
+        host = urlparse(f"//{self.headers.get('Host') or ''}").hostname
+        origin = self.headers.get('Origin')
+        if host not in allowed or (origin is not None and urlparse(origin).hostname not in allowed):
+            self.send_json(403, {'error': 'Zapytanie spoza lokalnego klienta odrzucone'})
+            return False
+        return True
+
+    def job_id(self, path: str) -> Optional[int]:
+        parts = path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'jobs' and parts[1].isdigit():
+            return int(parts[1])
+        return None
+
+    def do_GET(self):
+        if not self.is_trusted():
+            return
+        service = self.server.service
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        if parsed.path == '/health':
+            self.send_json(200, {'status': 'ok', 'jobs': service.store.counts()})
+        elif parsed.path == '/jobs':
+            try:
+                limit = int((query.get('limit') or ['100'])[0])
+            except ValueError:
+                limit = 0
+            if limit < 1:
+                self.send_json(400, {'error': 'Parametr limit musi być liczbą całkowitą >= 1'})
+                return
+            self.send_json(200, {'jobs': service.store.list((query.get('state') or [None])[0], limit)})
+        elif parsed.path == '/events':
+            ids = [int(value) for value in (query.get('ids') or [''])[0].split(',') if value.isdigit()]
+            self.stream_events(ids)
+        elif self.job_id(parsed.path) is not None:
+            status = service.status(self.job_id(parsed.path))
+            if status is None:
+                self.send_json(404, {'error': 'Nie ma takiego zadania'})
+            else:
+                self.send_json(200, status)
+        else:
+            self.send_json(404, {'error': 'Nieznana ścieżka'})
+
+    def do_POST(self):
+        if not self.is_trusted():
+            return
+        if urlparse(self.path).path != '/jobs':
+            self.send_json(404, {'error': 'Nieznana ścieżka'})
+            return
+        content_type = (self.headers.get('Content-Type') or '').partition(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self.send_json(415, {'error': 'Wymagany nagłówek Content-Type: application/json'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            result = self.server.service.submit(request.get('urls') or [], request.get('options'))
+        except (ValueError, TypeError) as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        self.send_json(201, result)
+
+    def do_DELETE(self):
+        if not self.is_trusted():
+            return
+        job_id = self.job_id(urlparse(self.path).path)
+        status = self.server.service.cancel(job_id) if job_id is not None else None
+        if status is None:
+            self.send_json(404, {'error': 'Nie ma takiego zadania'})
+        else:
+            self.send_json(200, status)
+
+    def stream_events(self, ids: List[int]):
+        """Wysyła stan zadań (JSON Lines) przy każdej zmianie, do ich zakończenia.
+
+        Wpisy rozwijanej playlisty/kanału są dołączane do strumienia na bieżąco.
+        """
+        from ytwav_store import JobQueue
+
+        service = self.server.service
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.end_headers()
+        followed = set(ids)
+        last_sent = {}
+        seen_version = -1
+        try:
+            while ids:
+                with service.changed:
+                    if service.version == seen_version:
+                        service.changed.wait(timeout=HEARTBEAT_INTERVAL)
+                    seen_version = service.version
+                lines = []
+                for job_id in list(ids):
+                    status = service.status(job_id)
+                    if status is None:
+                        ids.remove(job_id)
+                        continue
+                    if status['state'] != 'queued':
+                        for child in service.store.children(job_id):
+                            if child['id'] not in followed:
+                                followed.add(child['id'])
+                                ids.append(child['id'])
+                    snapshot = (status['state'], json.dumps(status['progress'], sort_keys=True))
+                    if last_sent.get(job_id) != snapshot:
+                        last_sent[job_id] = snapshot
+                        lines.append(status)
+                    if status['state'] in JobQueue.FINAL_STATES:
+                        ids.remove(job_id)
+                if not lines:
+                    # Heartbeat - klient wie, że usługa żyje
+                    lines.append({'heartbeat': time.time()})
+                self.wfile.write(''.join(json.dumps(line, ensure_ascii=False) + '\n'
+                                         for line in lines).encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class ServiceClient:
+    """Cienki klient API usługi - tylko biblioteka standardowa, bez yt-dlp."""
+
+    def __init__(self, base_url: str = DEFAULT_SERVER_URL, timeout: float = 5.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, data=None, timeout: Optional[float] = None):
+        body = json.dumps(data).encode('utf-8') if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+            return json.loads(response.read())
+
+    def is_available(self, timeout: float = 0.2) -> bool:
+        """Czy usługa odpowiada (krótki timeout - do wykrywania przy starcie)."""
+        try:
+            return self.request('GET', '/health', timeout=timeout).get('status') == 'ok'
+        except (OSError, ValueError):
+            return False
+
+    def submit(self, urls: List[str], options: Optional[dict] = None) -> dict:
+        return self.request('POST', '/jobs', {'urls': urls, 'options': options or {}})
+
+    def status(self, job_id: int) -> dict:
+        return self.request('GET', f'/jobs/{job_id}')
+
+    def cancel(self, job_id: int) -> dict:
+        return self.request('DELETE', f'/jobs/{job_id}')
+
+    def events(self, job_ids: List[int]):
+        """Generator zmian stanu zadań (także heartbeat co ~1 s) do ich zakończenia."""
+        ids = ','.join(str(job_id) for job_id in job_ids)
+        with urllib.request.urlopen(f"{self.base_url}/events?ids={ids}",
+                                    timeout=HEARTBEAT_INTERVAL * 30) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def make_server(service: DownloadService, host: str = DEFAULT_HOST,
+                port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """Serwer HTTP API dla `service` (nagłówek Host: localhost albo `host`)."""
+    httpd = ThreadingHTTPServer((host, port), ServiceHandler)
+    httpd.daemon_threads = True
+    httpd.service = service
+    httpd.allowed_hosts = {*LOOPBACK_HOSTS, host.lower()}
+    return httpd
+
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, jobs: int = 1,
+          queue_path: Optional[str] = None, output_root: Optional[str] = None):
+    """Uruchamia usługę do przerwania (Ctrl+C)."""
+    service = DownloadService(queue_path, jobs=jobs, output_root=output_root)
+    httpd = make_server(service, host, port)
+    service.start()
+    print(f"🎧 YTWAV serve: http://{host}:{port} ({service.jobs} wątków, kolejka {service.store.db_path})")
+    print(f"Katalog wyjściowy zadań: {service.output_root}")
+    if service.store.requeued:
+        print(f"Przywrócono do kolejki {service.store.requeued} przerwanych zadań")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nZatrzymywanie usługi...")
+    finally:
+        httpd.server_close()
+        service.stop()
+
+
+def serve_main(argv: Optional[List[str]] = None):
+    """CLI: ytdl_wav.py serve [--host] [--port] [--jobs] [--queue]."""
+    parser = argparse.ArgumentParser(
+        prog="ytdl_wav.py serve",
+        description="Usługa w tle z ciepłym downloaderem i lokalnym API zadań"
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help=f"Adres nasłuchu (domyślnie: {DEFAULT_HOST} - tylko lokalnie)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"Port HTTP (domyślnie: {DEFAULT_PORT})")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Liczba równoległych zadań (domyślnie: 1)")
+    parser.add_argument("--queue", help="Plik trwałej kolejki (domyślnie: ~/.cache/ytwav/service.sqlite)")
+    parser.add_argument("--output-root",
+                        help="Katalog, wewnątrz którego zadania mogą zapisywać pliki (domyślnie: bieżący)")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.jobs, args.queue, args.output_root)
+
+
+def run_client(server_url: str, urls: List[str], options: dict, detach: bool = False) -> int:
+    """Zgłasza linki do usługi i (bez `detach`) śledzi ich postęp. Zwraca kod wyjścia."""
+    client = ServiceClient(server_url)
+    try:
+        result = client.submit(urls, options)
+    except (OSError, ValueError) as e:
+        print(f"Błąd: usługa {server_url} niedostępna ({e}). Uruchom: python3 ytdl_wav.py serve")
+        return 1
+    for url in result['rejected']:
+        print(f"Nieprawidłowy URL YouTube: {url}")
+    jobs = {job['id']: job['url'] for job in result['jobs']}
+    for job_id, url in jobs.items():
+        print(f"Zadanie #{job_id}: {url}")
+    if not jobs:
+        return 2
+    if detach:
+        return 0
+
+    from ytdl_wav import parse_youtube_url
+
+    results = {}
+    try:
+        for event in client.events(list(jobs)):
+            if 'heartbeat' in event or event['state'] not in ('done', 'failed', 'cancelled'):
+                continue
+            if event['state'] == 'done' and parse_youtube_url(event['url'])[0] != 'video':
+                # Playlista/kanał rozwinięte przez usługę - liczą się ich wpisy
+                print(f"#{event['id']} {event['url']}: {event['output']}")
+                continue
+            results[event['id']] = event['state']
+            detail = event['error'] or event['output'] or ''
+            print(f"#{event['id']} {event['state'].upper()}: {event['url']} {detail}".rstrip())
+    except KeyboardInterrupt:
+        print("\nPrzerwano śledzenie - zadania pozostają w kolejce usługi")
+        return 1
+    except OSError as e:
+        print(f"Błąd: utracono połączenie z usługą ({e})")
+        return 1
+
+    success = sum(1 for state in results.values() if state == 'done')
+    print(f"Zakończono: {success}/{len(results)} zadań")
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    serve_main()
@@ -0,0 +1,754 @@
+#!/usr/bin/env python3
+"""
+YTWAV - Trwałe magazyny danych (SQLite)
+Cache metadanych, archiwum pobrań, indeks treści audio, dziennik wsadów, kolejka usługi i metryki sukcesu - współdzielone przez CLI, GUI i skrypt utrzymania.
+
+Autor: Senior Python Developer
+Licencja: MIT
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+
+def default_cache_dir() -> Path:
+    """Katalog cache aplikacji (można nadpisać zmienną YTWAV_CACHE_DIR)."""
+    override = os.environ.get('YTWAV_CACHE_DIR')
+    if override:
+        return Path(override)
+    return Path.home() / '.cache' / 'ytwav'
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Otwiera bazę SQLite w trybie WAL (bezpieczne dla wielu procesów)."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class MetadataCache:
+    """Cache metadanych filmów z TTL i eksmisją LRU według rozmiaru.
+
+    Metadane (tytuł, czas trwania, autor, lista formatów) żyją długo, więc
+    są trzymane osobno od podpisanych URL-i strumieni, które wygasają po
+    kilku godzinach. Kluczem jest kanoniczne ID filmu.
+    """
+
+    # Margines bezpieczeństwa przed wygaśnięciem podpisanego URL-a
+    STREAM_EXPIRY_MARGIN = 300
+
+    def __init__(self, db_path: Optional[Path] = None, ttl: float = 7 * 24 * 3600,
+                 stream_ttl: float = 1800, max_bytes: int = 64 * 1024 * 1024):
+        self.db_path = Path(db_path) if db_path else default_cache_dir() / 'metadata.sqlite'
+        self.ttl = ttl
+        self.stream_ttl = stream_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # URL-e strumieni często wygasają - liczone osobno, by nie zaniżać trafień metadanych
+        self.stream_hits = 0
+        self.stream_misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect(self.db_path)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    video_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed_at)"
+            )
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS streams (
+                    video_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def summarize(info: dict) -> dict:
+        """Wybiera z wyniku extract_info trwałe metadane (bez podpisanych URL-i)."""
+        formats = []
+        for fmt in info.get('formats') or []:
+            formats.append({
+                key: fmt.get(key)
+                for key in ('format_id', 'ext', 'acodec', 'vcodec', 'abr', 'asr',
+                            'audio_channels', 'filesize', 'protocol')
+                if fmt.get(key) is not None
+            })
+        return {
+            'id': info.get('id'),
+            'title': info.get('title', 'Nieznany tytuł'),
+            'duration': info.get('duration', 0),
+            'uploader': info.get('uploader', 'Nieznany autor'),
+            'view_count': info.get('view_count', 0),
+            'formats': formats,
+        }
+
+    @staticmethod
+    def stream_expiry(url: str, default: float) -> float:
+        """Czas wygaśnięcia podpisanego URL-a (parametr `expire` googlevideo)."""
+        try:
+            expire = parse_qs(urlparse(url).query).get('expire')
+            if expire:
+                return float(expire[0])
+        except (TypeError, ValueError):
+            pass
+        return time.time() + default
+
+    def get_metadata(self, video_id: str) -> Optional[dict]:
+        """Zwraca metadane z cache lub None (miss / wygasłe)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, fetched_at FROM metadata WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE metadata SET accessed_at = ? WHERE video_id = ?", (now, video_id)
+                )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put_metadata(self, video_id: str, metadata: dict):
+        """Zapisuje metadane i w razie potrzeby eksmituje najdawniej używane wpisy."""
+        data = json.dumps(metadata, ensure_ascii=False)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata (video_id, data, size, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (video_id, data, len(data), now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        """Eksmisja LRU: usuwa wygasłe wpisy, potem najstarsze aż do limitu rozmiaru."""
+        now = time.time()
+        self._conn.execute("DELETE FROM metadata WHERE fetched_at < ?", (now - self.ttl,))
+        self._conn.execute("DELETE FROM streams WHERE expires_at < ?", (now,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM metadata").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        freed = 0
+        victims = []
+        for video_id, size in self._conn.execute(
+                "SELECT video_id, size FROM metadata ORDER BY accessed_at"):
+            victims.append((video_id,))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM metadata WHERE video_id = ?", victims)
+
+    def get_stream(self, video_id: str) -> Optional[dict]:
+        """Zwraca wybrany format (URL + nagłówki) jeśli podpisany URL jest jeszcze ważny."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, expires_at FROM streams WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            if row is None or row[1] - self.STREAM_EXPIRY_MARGIN < time.time():
+                self.stream_misses += 1
+                return None
+            self.stream_hits += 1
+        return json.loads(row[0])
+
+    def put_stream(self, video_id: str, stream: dict):
+        """Zapisuje krótkożyjący, podpisany URL strumienia."""
+        expires_at = self.stream_expiry(stream.get('url', ''), self.stream_ttl)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO streams (video_id, data, expires_at) VALUES (?, ?, ?)",
+                (video_id, json.dumps(stream, ensure_ascii=False), expires_at)
+            )
+
+    def invalidate_stream(self, video_id: str):
+        """Usuwa URL strumienia (np. po 403 - podpis już nieważny)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM streams WHERE video_id = ?", (video_id,))
+
+    def stats(self) -> dict:
+        """Liczniki trafień (metadane i URL-e strumieni osobno) i rozmiar cache."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM metadata"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        stream_lookups = self.stream_hits + self.stream_misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) * 100 if lookups else 0.0,
+            'stream_hits': self.stream_hits,
+            'stream_misses': self.stream_misses,
+            'stream_hit_rate': (self.stream_hits / stream_lookups) * 100 if stream_lookups else 0.0,
+            'entries': entries,
+            'bytes': size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DownloadArchive:
+    """Archiwum ukończonych pobrań: (ID filmu, profil wyjściowy) -> plik.
+
+    Profil to napis `sample_rate:channels:bit_depth`, więc ten sam film w
+    innej jakości nie jest traktowany jako gotowy. Zbiór ukończonych ID jest
+    wczytywany raz na profil, więc sprawdzenie to O(1) bez zapytań do bazy.
+    Zapisy są atomowe (SQLite WAL), bezpieczne dla wielu wątków i procesów.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._done = {}
+        self._conn = connect(self.db_path)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS archive (
+                    video_id TEXT NOT NULL,
+                    profile TEXT NOT NULL,
+                    output TEXT,
+                    completed_at REAL NOT NULL,
+                    PRIMARY KEY (video_id, profile)
+                )
+            """)
+
+    @staticmethod
+    def profile_key(sample_rate: int, channels: int, bit_depth: int) -> str:
+        return f"{sample_rate}:{channels}:{bit_depth}"
+
+    def _profile_set(self, profile: str) -> set:
+        done = self._done.get(profile)
+        if done is None:
+            done = {row[0] for row in self._conn.execute(
+                "SELECT video_id FROM archive WHERE profile = ?", (profile,)
+            )}
+            self._done[profile] = done
+        return done
+
+    def contains(self, video_id: str, profile: str) -> bool:
+        """Czy film w danym profilu został już ukończony."""
+        with self._lock:
+            return video_id in self._profile_set(profile)
+
+    def add(self, video_id: str, profile: str, output: Optional[str] = None):
+        """Oznacza film jako ukończony w danym profilu."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO archive (video_id, profile, output, completed_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (video_id, profile, output, time.time())
+                )
+            self._profile_set(profile).add(video_id)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ContentIndex:
+    """Indeks treści audio: (SHA-256 zdekodowanego PCM, profil) -> pierwszy plik z tą treścią.
+
+    Ten sam utwór pod różnymi ID filmów (ponowne uploady, wersje z tekstem)
+    daje identyczny PCM. Nowy plik o znanym skrócie może wtedy zostać
+    zastąpiony dowiązaniem do istniejącego zamiast kolejnej kopii.
+    Skrót obejmuje tylko próbki, nie nagłówek WAV - te same bajty PCM
+    w innym profilu (np. cisza 16000:1:16 i 8000:2:16) to inny plik,
+    dlatego profil jest częścią klucza. Rozmiar i mtime pliku chronią
+    przed wskazaniem pliku, który został w międzyczasie usunięty lub zmieniony.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = connect(self.db_path)
+        with self._conn:
+            # Starszy indeks był kluczowany samym skrótem - to tylko cache, więc budujemy go od nowa
+            key = [row[1] for row in self._conn.execute("PRAGMA table_info(content)") if row[5]]
+            if key == ['hash']:
+                self._conn.execute("DROP TABLE content")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS content (
+                    hash TEXT NOT NULL,
+                    profile TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    added_at REAL NOT NULL,
+                    PRIMARY KEY (hash, profile)
+                )
+            """)
+
+    def lookup(self, content_hash: str, profile: str) -> Optional[Path]:
+        """Istniejący, niezmieniony plik o danym skrócie w danym profilu (albo None)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, size, mtime_ns FROM content WHERE hash = ? AND profile = ?",
+                (content_hash, profile)
+            ).fetchone()
+        if row is None:
+            return None
+        path, size, mtime_ns = row
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stat = None
+        if stat is None or stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            self.remove(content_hash, profile)
+            return None
+        return Path(path)
+
+    def add(self, content_hash: str, profile: str, path: Path):
+        stat = os.stat(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO content (hash, profile, path, size, mtime_ns, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, profile, os.path.abspath(path), stat.st_size, stat.st_mtime_ns, time.time())
+            )
+
+    def remove(self, content_hash: str, profile: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM content WHERE hash = ? AND profile = ?",
+                               (content_hash, profile))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SuccessMetrics:
+    """Metryki sukcesu pobierania z atomowymi licznikami.
+
+    Każde zdarzenie to jedna transakcja z dwoma upsertami `count = count + 1`:
+    liczniki łączne (wynik, typ błędu) i kubełki minutowe. Równoległe wątki
+    i procesy nie gubią więc aktualizacji, a koszt zapisu nie zależy od
+    długości historii. Kubełki starsze niż `retention` są okresowo usuwane
+    (liczniki łączne zostają), więc statystyki okien czasowych czytają
+    ograniczoną liczbę wierszy niezależnie od liczby zdarzeń.
+    """
+
+    BUCKET_SECONDS = 60
+    WINDOWS = {'hour': 3600, 'day': 24 * 3600}
+
+    def __init__(self, db_path: Optional[Path] = None, retention: float = 2 * 24 * 3600,
+                 compact_interval: float = 3600):
+        self.db_path = Path(db_path) if db_path else default_cache_dir() / 'metrics.sqlite'
+        self.retention = retention
+        self.compact_interval = compact_interval
+        self._compacted_at = 0.0
+        self._lock = threading.Lock()
+        self._conn = connect(self.db_path)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS metric_totals (
+                    outcome TEXT NOT NULL,
+                    error_type TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (outcome, error_type)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS metric_buckets (
+                    bucket INTEGER NOT NULL,
+                    outcome TEXT NOT NULL,
+                    error_type TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (bucket, outcome, error_type)
+                )
+            """)
+        self.compact()
+
+    def record(self, success: bool, error_type: Optional[str] = None, count: int = 1):
+        """Dolicza zdarzenie (udane albo nieudane pobranie z typem błędu)."""
+        now = time.time()
+        outcome = 'ok' if success else 'failed'
+        error_type = '' if success else (error_type or '')
+        bucket = int(now // self.BUCKET_SECONDS) * self.BUCKET_SECONDS
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO metric_totals (outcome, error_type, count, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (outcome, error_type) DO UPDATE SET "
+                "count = count + excluded.count, updated_at = excluded.updated_at",
+                (outcome, error_type, count, now)
+            )
+            self._conn.execute(
+                "INSERT INTO metric_buckets (bucket, outcome, error_type, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (bucket, outcome, error_type) DO UPDATE SET count = count + excluded.count",
+                (bucket, outcome, error_type, count)
+            )
+        if now - self._compacted_at >= self.compact_interval:
+            self.compact()
+
+    def compact(self) -> int:
+        """Usuwa kubełki starsze niż `retention`. Zwraca liczbę usuniętych wierszy."""
+        now = time.time()
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                "DELETE FROM metric_buckets WHERE bucket < ?", (now - self.retention,)
+            ).rowcount
+        self._compacted_at = now
+        return removed
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM metric_totals LIMIT 1").fetchone() is None
+
+    def import_totals(self, metrics: dict):
+        """Przenosi liczniki ze starego formatu (klucz 'metrics' w pliku statusu)."""
+        failed = metrics.get('failed_downloads', 0)
+        typed = metrics.get('error_types') or {}
+        rows = [('ok', '', metrics.get('successful_downloads', 0))]
+        rows += [('failed', error_type, count) for error_type, count in typed.items()]
+        rows.append(('failed', '', failed - sum(typed.values())))
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO metric_totals (outcome, error_type, count, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (outcome, error_type) DO UPDATE SET count = count + excluded.count",
+                [(outcome, error_type, count, now) for outcome, error_type, count in rows if count > 0]
+            )
+
+    @staticmethod
+    def _summary(rows) -> dict:
+        successful = sum(count for outcome, _, count in rows if outcome == 'ok')
+        failed = sum(count for outcome, _, count in rows if outcome != 'ok')
+        total = successful + failed
+        error_types = {}
+        for outcome, error_type, count in rows:
+            if outcome != 'ok' and error_type:
+                error_types[error_type] = error_types.get(error_type, 0) + count
+        return {
+            'total_attempts': total,
+            'successful_downloads': successful,
+            'failed_downloads': failed,
+            'error_types': error_types,
+            'success_rate': (successful / total) * 100 if total else 0.0,
+        }
+
+    def totals(self) -> dict:
+        """Liczniki od początku historii (ten sam kształt co dawny słownik 'metrics')."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT outcome, error_type, count FROM metric_totals"
+            ).fetchall()
+            updated = self._conn.execute("SELECT MAX(updated_at) FROM metric_totals").fetchone()[0]
+        summary = self._summary(rows)
+        summary['last_updated'] = updated
+        return summary
+
+    def window(self, seconds: float) -> dict:
+        """Liczniki z ostatnich `seconds` sekund (z dokładnością do kubełka)."""
+        since = time.time() - seconds
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT outcome, error_type, SUM(count) FROM metric_buckets "
+                "WHERE bucket >= ? GROUP BY outcome, error_type",
+                (int(since // self.BUCKET_SECONDS) * self.BUCKET_SECONDS,)
+            ).fetchall()
+        return self._summary(rows)
+
+    def stats(self) -> dict:
+        """Liczniki łączne oraz okna 'hour' i 'day'."""
+        stats = self.totals()
+        stats['windows'] = {name: self.window(seconds) for name, seconds in self.WINDOWS.items()}
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class BatchJournal:
+    """Dziennik wsadu odporny na awarie procesu.
+
+    Każdy URL wsadu ma stan: pending, downloading, transcoding, done lub
+    failed. Każda zmiana stanu to osobna transakcja SQLite, więc po
+    przerwaniu (OOM, zerwane SSH, uśpienie) dziennik zawsze jest spójny.
+    Wznowienie odczytuje wyłącznie niezakończone wpisy (indeks na stanie),
+    więc jego koszt zależy od pozostałej pracy, a nie od długości listy.
+    """
+
+    STATES = ('pending', 'downloading', 'transcoding', 'done', 'failed')
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = connect(self.db_path)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    batch_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    url TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    source TEXT,
+                    output TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (batch_id, position)
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (batch_id, state)"
+            )
+
+    @staticmethod
+    def batch_id(urls: list, profile: str) -> str:
+        """Identyfikator wsadu: skrót listy URL-i i profilu wyjściowego."""
+        digest = hashlib.sha1(profile.encode('utf-8'))
+        for url in urls:
+            digest.update(b'\n')
+            digest.update(url.encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def begin(self, batch_id: str, urls: list, resume: bool = False) -> dict:
+        """Rozpoczyna lub wznawia wsad.
+
+        Zwraca słownik {pozycja: {'state', 'source'}} dla pracy do wykonania.
+        Pozycje nieobecne w słowniku są już ukończone.
+        """
+        with self._lock:
+            if resume:
+                exists = self._conn.execute(
+                    "SELECT 1 FROM jobs WHERE batch_id = ? LIMIT 1", (batch_id,)
+                ).fetchone()
+                if exists:
+                    return {
+                        position: {'state': state, 'source': source}
+                        for position, state, source in self._conn.execute(
+                            "SELECT position, state, source FROM jobs "
+                            "WHERE batch_id = ? AND state != 'done' ORDER BY position",
+                            (batch_id,)
+                        )
+                    }
+            now = time.time()
+            with self._conn:
+                self._conn.execute("DELETE FROM jobs WHERE batch_id = ?", (batch_id,))
+                self._conn.executemany(
+                    "INSERT INTO jobs (batch_id, position, url, state, updated_at) "
+                    "VALUES (?, ?, ?, 'pending', ?)",
+                    [(batch_id, position, url, now) for position, url in enumerate(urls)]
+                )
+            return {position: {'state': 'pending', 'source': None} for position in range(len(urls))}
+
+    def add(self, batch_id: str, position: int, url: str) -> dict:
+        """Dopisuje pozycję wsadu rozwijanego w locie (np. z playlisty).
+
+        Jeśli pozycja już istnieje (wznowienie), zwraca jej zapisany stan
+        zamiast go nadpisywać.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, source FROM jobs WHERE batch_id = ? AND position = ? AND url = ?",
+                (batch_id, position, url)
+            ).fetchone()
+            if row:
+                return {'state': row[0], 'source': row[1]}
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO jobs (batch_id, position, url, state, updated_at) "
+                    "VALUES (?, ?, ?, 'pending', ?)",
+                    (batch_id, position, url, time.time())
+                )
+            return {'state': 'pending', 'source': None}
+
+    def update(self, batch_id: str, position: int, state: str, source: Optional[str] = None,
+               output: Optional[str] = None, error: Optional[str] = None):
+        """Atomowo zapisuje nowy stan pozycji wsadu."""
+        if state not in self.STATES:
+            raise ValueError(f"Nieznany stan dziennika: {state}")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, source = COALESCE(?, source), "
+                "output = COALESCE(?, output), error = ?, updated_at = ? "
+                "WHERE batch_id = ? AND position = ?",
+                (state, source, output, error, time.time(), batch_id, position)
+            )
+
+    def update_many(self, batch_id: str, positions: list, state: str):
+        """Zapisuje ten sam stan dla wielu pozycji w jednej transakcji."""
+        if state not in self.STATES:
+            raise ValueError(f"Nieznany stan dziennika: {state}")
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE batch_id = ? AND position = ?",
+                [(state, now, batch_id, position) for position in positions]
+            )
+
+    def remaining(self, batch_id: str) -> int:
+        """Liczba niezakończonych pozycji wsadu."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE batch_id = ? AND state != 'done'", (batch_id,)
+            ).fetchone()[0]
+
+    def clear(self, batch_id: str):
+        """Usuwa w pełni ukończony wsad z dziennika."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE batch_id = ?", (batch_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """Trwała kolejka zadań usługi `ytdl_wav serve`.
+
+    Zadanie ma stan: queued, running, done, failed lub cancelled. Po
+    restarcie usługi zadania przerwane w trakcie (running) wracają do
+    kolejki, więc nic nie ginie przy awarii procesu.
+    """
+
+    STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+    FINAL_STATES = ('done', 'failed', 'cancelled')
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path else default_cache_dir() / 'service.sqlite'
+        self._lock = threading.Lock()
+        self._conn = connect(self.db_path)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS service_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    parent INTEGER,
+                    output TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS service_jobs_state ON service_jobs (state, id)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS service_jobs_parent ON service_jobs (parent, id)"
+            )
+            requeued = self._conn.execute(
+                "UPDATE service_jobs SET state = 'queued', updated_at = ? WHERE state = 'running'",
+                (time.time(),)
+            ).rowcount
+        self.requeued = requeued
+
+    @staticmethod
+    def _row(row) -> dict:
+        job_id, url, options, state, parent, output, error, created_at, updated_at = row
+        return {
+            'id': job_id,
+            'url': url,
+            'options': json.loads(options),
+            'state': state,
+            'parent': parent,
+            'output': output,
+            'error': error,
+            'created_at': created_at,
+            'updated_at': updated_at,
+        }
+
+    def add(self, urls: list, options: dict, parent: Optional[int] = None) -> list:
+        """Dodaje zadania w jednej transakcji. Zwraca ich identyfikatory."""
+        now = time.time()
+        encoded = json.dumps(options, sort_keys=True)
+        ids = []
+        with self._lock, self._conn:
+            for url in urls:
+                cursor = self._conn.execute(
+                    "INSERT INTO service_jobs (url, options, state, parent, created_at, updated_at) "
+                    "VALUES (?, ?, 'queued', ?, ?, ?)",
+                    (url, encoded, parent, now, now)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def claim(self) -> Optional[dict]:
+        """Pobiera najstarsze oczekujące zadanie i oznacza je jako running."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT * FROM service_jobs WHERE state = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE service_jobs SET state = 'running', updated_at = ? WHERE id = ?",
+                (time.time(), row[0])
+            )
+        job = self._row(row)
+        job['state'] = 'running'
+        return job
+
+    def update(self, job_id: int, state: str, output: Optional[str] = None,
+               error: Optional[str] = None):
+        if state not in self.STATES:
+            raise ValueError(f"Nieznany stan zadania: {state}")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE service_jobs SET state = ?, output = COALESCE(?, output), error = ?, "
+                "updated_at = ? WHERE id = ?",
+                (state, output, error, time.time(), job_id)
+            )
+
+    def get(self, job_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM service_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def list(self, state: Optional[str] = None, limit: int = 100) -> list:
+        """Ostatnie zadania (najnowsze pierwsze), opcjonalnie w danym stanie."""
+        with self._lock:
+            if state:
+                rows = self._conn.execute(
+                    "SELECT * FROM service_jobs WHERE state = ? ORDER BY id DESC LIMIT ?",
+                    (state, limit)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM service_jobs ORDER BY id DESC LIMIT ?", (limit,)
+                ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def children(self, parent: int) -> list:
+        """Zadania utworzone z rozwinięcia playlisty/kanału `parent`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM service_jobs WHERE parent = ? ORDER BY id", (parent,)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def counts(self) -> dict:
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT state, COUNT(*) FROM service_jobs GROUP BY state"
+            ).fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
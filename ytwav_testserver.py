@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+YTWAV - Lokalny serwer plików z obsługą Range
+Wspólny dla benchmarku i testów: odpowiada 206 na zapytania Range
+i opcjonalnie dławi każde połączenie, jak serwery ograniczające
+pojedynczy strumień.
+
+Autor: Senior Python Developer
+Licencja: MIT
+"""
+
+import os
+import re
+import time
+from http.server import SimpleHTTPRequestHandler
+
+
+RANGE_RE = re.compile(r'bytes=(\d+)-(\d*)')
+# Porcja wysyłana przez serwer między kontrolami limitu przepustowości
+SEND_CHUNK_SIZE = 64 * 1024
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Serwer plików bez logowania każdego zapytania, z obsługą Range.
+
+    `rate` (bajty/s, 0 - bez limitu) dławi każde połączenie osobno.
+    `remaining` to liczba bajtów bieżącej odpowiedzi na zakres (None
+    dla zwykłej odpowiedzi 200).
+    """
+    rate = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        self.remaining = None
+        match = RANGE_RE.fullmatch(self.headers.get('Range', ''))
+        path = self.translate_path(self.path)
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        start = int(match.group(1))
+        end = min(size - 1, int(match.group(2))) if match.group(2) else size - 1
+        if start >= size:
+            self.send_error(416)
+            return None
+        source = open(path, 'rb')
+        source.seek(start)
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        self.remaining = end - start + 1
+        return source
+
+    def copyfile(self, source, outputfile):
+        remaining = self.remaining
+        started = time.perf_counter()
+        sent = 0
+        try:
+            while remaining is None or remaining > 0:
+                chunk = source.read(SEND_CHUNK_SIZE if remaining is None else min(SEND_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                outputfile.write(chunk)
+                sent += len(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+                if self.rate:
+                    ahead = sent / self.rate - (time.perf_counter() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            # Klient zamknął połączenie (np. skrócony segment) - to nie błąd serwera
+            pass
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+YTWAV - Aktualizacja yt-dlp w tle i bezpiecznik extractora
+Gdy extractor przestaje działać, aktualizacja yt-dlp rusza co najwyżej raz
+na wsad, w osobnym wątku - czekają na nią tylko URL-e, które jej potrzebują.
+Moduł yt_dlp zaimportowany w procesie zostaje w starej wersji, dlatego po
+aktualizacji pobieranie idzie przez świeże procesy robocze
+(`python ytwav_update.py fetch URL`), które ładują nowy extractor.
+Bezpiecznik wstrzymuje nowe próby, gdy extractor jest uszkodzony.
+
+Autor: Senior Python Developer
+Licencja: MIT
+"""
+
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+
+# Kolejne URL-e z wyczerpanymi próbami, po których bezpiecznik się otwiera
+BREAKER_THRESHOLD = 3
+# Po tym czasie otwarty bezpiecznik przepuszcza jedną próbę kontrolną
+BREAKER_COOLDOWN = 300.0
+# Jak często czekający wątek sprawdza anulowanie
+WAIT_POLL_INTERVAL = 0.5
+# Skrypt procesu roboczego (ten plik)
+WORKER_SCRIPT = Path(__file__).resolve()
+
+
+class ExtractorBroken(Exception):
+    """Bezpiecznik otwarty - extractor yt-dlp jest uznany za uszkodzony."""
+
+
+class ExtractorGuard:
+    """Single-flight aktualizacja yt-dlp i bezpiecznik extractora dla wsadu.
+
+    Każdy URL przechodzi przez `acquire()` przed pierwszą próbą i kończy
+    `release(success)`: True - extractor zadziałał, False - wyczerpane
+    próby z błędem extractora, None - wynik nic o extractorze nie mówi
+    (anulowanie, błąd konwersji, blokada 403/429).
+
+    Po `threshold` kolejnych porażkach bezpiecznik się otwiera: nowe URL-e
+    czekają na trwającą aktualizację, a bez niej są od razu odrzucane.
+    Po `cooldown` sekundach przechodzi jedna próba kontrolna (half-open).
+    Udana aktualizacja zamyka bezpiecznik i ustawia `updated` - od tej
+    chwili pobieranie musi iść przez świeży proces roboczy.
+
+    Strażnik żyje tyle co downloader (wspólny dla GUI i usługi); `reset()`
+    na starcie wsadu czyści bezpiecznik, gdy nic innego go nie używa.
+    """
+
+    def __init__(self, updater: Callable[[], bool], threshold: int = BREAKER_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN, clock: Callable[[], float] = time.monotonic):
+        self.updater = updater
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.open = False
+        self.opened_at = 0.0
+        self.trial = False
+        # URL-e dopuszczone przez acquire() i jeszcze niezwolnione
+        self.active = 0
+        # Stan aktualizacji: None (nie było), 'running', 'ok' albo 'failed'
+        self.update_state = None
+        self._changed = threading.Condition()
+
+    @property
+    def updated(self) -> bool:
+        return self.update_state == 'ok'
+
+    def acquire(self, check: Optional[Callable[[], None]] = None) -> bool:
+        """Zgoda na próby dla URL-a. Zwraca True, gdy to próba kontrolna.
+
+        Przy otwartym bezpieczniku czeka na trwającą aktualizację (`check`
+        jest wołane co chwilę, np. do obsługi anulowania), a jeśli jej
+        nie ma - rzuca ExtractorBroken.
+        """
+        with self._changed:
+            while self.open and self.update_state == 'running':
+                self._changed.wait(WAIT_POLL_INTERVAL)
+                if check is not None:
+                    check()
+            if not self.open:
+                self.active += 1
+                return False
+            if self.trial or self.clock() < self.opened_at + self.cooldown:
+                raise ExtractorBroken(
+                    f"extractor yt-dlp uszkodzony (kolejne niepowodzenia: {self.failures}), "
+                    "bezpiecznik otwarty"
+                )
+            self.trial = True
+            self.active += 1
+            return True
+
+    def release(self, success: Optional[bool], trial: bool = False):
+        """Wynik URL-a dopuszczonego przez `acquire`."""
+        with self._changed:
+            self.active = max(0, self.active - 1)
+            if trial:
+                self.trial = False
+            if success is True:
+                self.failures = 0
+                self.open = False
+            elif success is False:
+                self.failures += 1
+                if trial or (not self.open and self.failures >= self.threshold):
+                    self.open = True
+                    self.opened_at = self.clock()
+            self._changed.notify_all()
+
+    def reset(self) -> bool:
+        """Czysty bezpiecznik na nowy wsad; nieudana aktualizacja może ruszyć ponownie.
+
+        Udana aktualizacja zostaje - zaimportowany yt_dlp jest nadal stary.
+        Gdy inne URL-e są w toku albo trwa aktualizacja, nic nie zmienia
+        i zwraca False.
+        """
+        with self._changed:
+            if self.active or self.update_state == 'running':
+                return False
+            self.failures = 0
+            self.open = False
+            self.opened_at = 0.0
+            self.trial = False
+            if self.update_state == 'failed':
+                self.update_state = None
+            self._changed.notify_all()
+            return True
+
+    def request_update(self) -> bool:
+        """Uruchamia aktualizację w tle, jeśli w tym wsadzie jeszcze jej nie było.
+
+        Zwraca True, gdy aktualizacja trwa albo się udała (warto na nią
+        czekać), False - gdy już zawiodła.
+        """
+        with self._changed:
+            if self.update_state is None:
+                self.update_state = 'running'
+                threading.Thread(target=self._run_update, name="ytwav-ytdlp-update", daemon=True).start()
+            return self.update_state in ('running', 'ok')
+
+    def _run_update(self):
+        try:
+            ok = bool(self.updater())
+        except Exception:
+            ok = False
+        with self._changed:
+            self.update_state = 'ok' if ok else 'failed'
+            if ok:
+                # Nowy extractor dostaje czystą kartę
+                self.failures = 0
+                self.open = False
+            self._changed.notify_all()
+
+    def wait_update(self, check: Optional[Callable[[], None]] = None) -> bool:
+        """Czeka na koniec trwającej aktualizacji. Zwraca True, gdy się udała."""
+        with self._changed:
+            while self.update_state == 'running':
+                self._changed.wait(WAIT_POLL_INTERVAL)
+                if check is not None:
+                    check()
+            return self.updated
+
+
+def fetch_worker(url: str, opts: dict) -> dict:
+    """Pobiera źródło świeżo zaimportowanym yt-dlp (wywoływane w procesie roboczym)."""
+    import yt_dlp
+    from ytwav_store import MetadataCache
+
+    opts = {**opts, 'quiet': True, 'noprogress': True, 'consoletitle': False}
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=True)
+        downloads = (info or {}).get('requested_downloads') or []
+        if downloads and downloads[0].get('filepath'):
+            source = downloads[0]['filepath']
+        elif info:
+            source = ydl.prepare_filename(info)
+        else:
+            source = None
+    if source is None or not Path(source).exists():
+        raise yt_dlp.DownloadError(f"Plik źródłowy nie został pobrany: {url}")
+    return {
+        'filepath': source,
+        'metadata': MetadataCache.summarize(info),
+        'yt_dlp_version': yt_dlp.version.__version__,
+    }
+
+
+def worker_main(argv: list) -> int:
+    """`fetch URL` - opcje yt-dlp (JSON) na stdin, wynik (JSON) w ostatniej linii stdout."""
+    if len(argv) != 2 or argv[0] != 'fetch':
+        print("Użycie: ytwav_update.py fetch URL  (opcje yt-dlp jako JSON na stdin)", file=sys.stderr)
+        return 2
+    try:
+        result = fetch_worker(argv[1], json.load(sys.stdin))
+    except Exception as e:
+        print(f"{type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(worker_main(sys.argv[1:]))